@@ -1,20 +1,91 @@
+import argparse
+import asyncio
+import atexit
 import logging
-import sys
 
-from airhockey.controller import Controller
+from airhockey.calibration import load_calibration
+from airhockey.controller import AsyncController, ParallelHandler
 from airhockey.handlers.await_video import AwaitVideoHandler
 from airhockey.handlers.check_network import CheckNetworkHandler
 from airhockey.handlers.detect_players import DetectPlayersHandler
 from airhockey.handlers.detect_table import DetectTableHandler
 from airhockey.handlers.failed import FailedHandler
 from airhockey.handlers.play_game import PlayGameHandler
+from airhockey.handlers.restore_calibration import RestoreCalibrationHandler
 from airhockey.handlers.test_moves import TestMovesHandler
-from airhockey.robot import Robot
-from airhockey.vision.video import ScreenCapture, VideoStream
+from airhockey.metrics import latency
+from airhockey.robot import LEGACY, PLANS, CoalescingRobot, RobotLink
+from airhockey.simulator.endpoint import SimulatorEndpoint
+from airhockey.simulator.physics import TableSimulation
+from airhockey.simulator.reader import SimulatedFrameReader
+from airhockey.strategy import (InterceptionStrategy, InterceptionTable,
+                                LookupTableStrategy, Strategy)
+from airhockey.vision.session import ReplayFrameReader, SessionWriter
+from airhockey.vision.video import (
+    FrameReader, GrabbingFrameReader, ScreenCapture, VideoStream)
 from airhockey.vision.color import ColorRange
 from airhockey.vision.query import QueryContext
-from airhockey.translate import WorldToFrameTranslator
-from airhockey.debug import DebugWindow
+from airhockey.translate import LensModel, WorldToFrameTranslator
+from airhockey.debug import (DebugSink, DebugWindow, MemoryDebugSink,
+                             NullDebugSink, VideoDebugSink)
+
+parser = argparse.ArgumentParser(prog="airhockey")
+parser.add_argument("source", nargs="?", default="capture",
+                    choices=["capture", "video", "replay", "sim"])
+parser.add_argument("--session",
+                    help="session file to replay")
+parser.add_argument("--speed", type=float, default=1.0,
+                    help="replay or simulation speed, 0 runs every frame "
+                         "unthrottled")
+parser.add_argument("--record",
+                    help="record grabbed frames into a session file")
+parser.add_argument("--lens",
+                    help="npz file with camera_matrix and dist_coeffs of "
+                         "the camera lens")
+parser.add_argument("--pipelined", action="store_true",
+                    help="run detection, estimation and robot moves in "
+                         "separate threads")
+parser.add_argument("--debug-fps", type=float, default=15,
+                    help="refresh rate cap of the debug window, 0 shows "
+                         "every frame")
+parser.add_argument("--debug-thread", action="store_true",
+                    help="compose the debug view on a separate thread")
+parser.add_argument("--headless", action="store_true",
+                    help="run without the debug window")
+parser.add_argument("--debug-video",
+                    help="headless: encode the debug view into a video file")
+parser.add_argument("--debug-ring",
+                    help="headless: keep the last camera frames in memory "
+                         "and save them as a replayable session on exit")
+parser.add_argument("--debug-ring-size", type=int, default=300,
+                    help="number of debug frames kept by --debug-ring")
+parser.add_argument("--seed", type=int,
+                    help="random seed of the simulated table")
+parser.add_argument("--strategy-table",
+                    help="interception table built by airhockey.strategy, "
+                         "looked up instead of solving the trajectory")
+parser.add_argument("--robot-protocol", default=LEGACY,
+                    choices=[LEGACY, PLANS],
+                    help="bare '<ii' moves, or numbered and timestamped "
+                         "waypoint plans")
+parser.add_argument("--move-delta", type=float, default=5.0,
+                    help="robot moves closer than this to the last one "
+                         "sent are dropped")
+parser.add_argument("--max-send-rate", type=float, default=100.0,
+                    help="robot moves per second, 0 sends every move")
+parser.add_argument("--latency", type=float,
+                    help="seconds from frame capture to the pusher moving, "
+                         "the puck position is predicted that far ahead "
+                         "(default: the cached value, else half the cached "
+                         "robot round trip time, else 0)")
+parser.add_argument("--calibration", default="calibration.json",
+                    help="calibration cache verified on start instead of "
+                         "detecting the table, empty to disable")
+args = parser.parse_args()
+if (args.debug_video or args.debug_ring) and not args.headless:
+    parser.error("--debug-video and --debug-ring need --headless")
+if args.source == "replay" and args.session is None:
+    parser.error("replay needs a --session file")
 
 logger = logging.getLogger("airhockey")
 logger.setLevel(logging.INFO)
@@ -24,21 +95,24 @@ console = logging.StreamHandler()
 console.setFormatter(formatter)
 logger.addHandler(console)
 logger.info("Welcome")
+atexit.register(latency.log_summary, logger)
 
 robot_host = 'localhost'
 robot_port = 1133
-robot = Robot(host=robot_host, port=robot_port)
+robot_link = RobotLink(host=robot_host, port=robot_port)
+robot = CoalescingRobot(host=robot_host, port=robot_port,
+                        protocol=args.robot_protocol,
+                        link=robot_link,
+                        min_delta=args.move_delta,
+                        max_rate=args.max_send_rate)
+atexit.register(lambda: logger.info(
+    "Robot moves sent %s, suppressed %s", robot.sent, robot.suppressed))
 
 puck_radius = 20
 table_size = (1200, 600)
 video_size = (1280, 720)
 puck_workspace = table_size
 
-video_stream = VideoStream(0, video_size) \
-    if 'video' in sys.argv else ScreenCapture(video_size)
-
-translator = WorldToFrameTranslator(video_size, table_size)
-
 table_markers_color_range = ColorRange(name="Table Markers",
                                        h_low=84,
                                        h_high=92,
@@ -54,29 +128,112 @@ robot_pusher_color_range = ColorRange(name="Robot Pusher",
                                       h_high=30,
                                       sv_low=53)
 
-debug_window = DebugWindow(name="game",
-                           log="airhockey",
-                           translator=translator,
-                           table_size=table_size,
-                           color_ranges=[table_markers_color_range,
-                                         puck_color_range,
-                                         robot_pusher_color_range])
+color_ranges = [table_markers_color_range,
+                puck_color_range,
+                robot_pusher_color_range]
+
+calibration = load_calibration(args.calibration)
+latency_compensation = args.latency
+if latency_compensation is None:
+    latency_compensation = calibration.estimated_latency() \
+        if calibration else 0.0
+logger.info("Latency compensation %.3fs.", latency_compensation)
+
+lens = LensModel.load(args.lens, video_size) if args.lens else None
+translator = WorldToFrameTranslator(video_size, table_size, lens)
+expected_markers = [(400, -15), (400, 615)]
+
+video_stream: FrameReader
+if args.source == "video":
+    video_stream = VideoStream(0, video_size)
+elif args.source == "replay":
+    video_stream = ReplayFrameReader(args.session, speed=args.speed)
+elif args.source == "sim":
+    simulation = TableSimulation(table_size=table_size,
+                                 puck_radius=puck_radius, seed=args.seed)
+    endpoint = SimulatorEndpoint(simulation, host=robot_host,
+                                 port=robot_port).start()
+    atexit.register(endpoint.stop)
+    atexit.register(lambda: logger.info(
+        "Simulated %.1fs: %s rallies, %s hits, %s goals conceded, "
+        "%s goals scored", simulation.time, simulation.rallies,
+        simulation.hits, simulation.goals_conceded, simulation.goals_scored))
+    video_stream = SimulatedFrameReader(
+        simulation,
+        video_size=video_size,
+        translator=WorldToFrameTranslator(video_size, table_size),
+        puck_color_range=puck_color_range,
+        pusher_color_range=robot_pusher_color_range,
+        markers_color_range=table_markers_color_range,
+        markers=expected_markers,
+        speed=args.speed,
+        endpoint=endpoint)
+else:
+    video_stream = ScreenCapture(video_size)
+
+if args.record:
+    if not isinstance(video_stream, GrabbingFrameReader):
+        parser.error("only grabbed video can be recorded")
+    recorder = SessionWriter(args.record)
+    video_stream.recorder = recorder
+
+    def stop_recording():
+        # The grab thread must not write after the recorder is closed.
+        video_stream.stop()
+        recorder.close()
+
+    atexit.register(stop_recording)
+
+debug_options = dict(log="airhockey",
+                     translator=translator,
+                     table_size=table_size,
+                     color_ranges=color_ranges,
+                     max_fps=args.debug_fps,
+                     threaded=args.debug_thread)
+debug_window: DebugSink
+if not args.headless:
+    debug_window = DebugWindow(name="game", **debug_options)
+elif args.debug_video:
+    debug_window = VideoDebugSink(path=args.debug_video,
+                                  fps=args.debug_fps or 30,
+                                  **debug_options)
+elif args.debug_ring:
+    debug_window = MemoryDebugSink(size=args.debug_ring_size,
+                                   **debug_options)
+    atexit.register(debug_window.save, args.debug_ring)
+else:
+    debug_window = NullDebugSink()
+atexit.register(debug_window.close)
 
 vision_query_context = QueryContext(translator=translator,
                                     frame_reader=video_stream,
-                                    debug_window=debug_window)
+                                    debug_window=debug_window,
+                                    color_ranges=color_ranges)
 
 await_video_handler = AwaitVideoHandler(video_stream=video_stream, timeout=10)
 
 detect_table_handler = DetectTableHandler(
-    expected_markers=[(400, -15), (400, 615)],
+    expected_markers=expected_markers,
     color_range=table_markers_color_range,
     vision_query_context=vision_query_context,
     tries=500,
     delay=1,
-    success_retries=1
+    success_retries=1,
+    translator=translator
     )
 
+restore_calibration_handler = RestoreCalibrationHandler(
+    calibration=calibration,
+    path=args.calibration,
+    detect_table=detect_table_handler,
+    translator=translator,
+    color_ranges=color_ranges,
+    video_size=video_size,
+    latency=args.latency,
+    link=robot_link)
+# Keeps color ranges tuned in the debug window for the next start.
+atexit.register(restore_calibration_handler.save)
+
 detect_players_handler = DetectPlayersHandler(
     vision_query_context=vision_query_context,
     puck_color_range=puck_color_range,
@@ -87,6 +244,7 @@ detect_players_handler = DetectPlayersHandler(
 check_network_handler = CheckNetworkHandler(
     host=robot_host,
     port=robot_port,
+    link=robot_link,
     tries=500,
     delay=5
 )
@@ -107,17 +265,37 @@ test_moves_handler = TestMovesHandler(
     delay=3
 )
 
+strategy: Strategy
+if args.strategy_table:
+    try:
+        table = InterceptionTable.load(args.strategy_table,
+                                       workspace=puck_workspace,
+                                       puck_radius=puck_radius)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    strategy = LookupTableStrategy(table)
+else:
+    strategy = InterceptionStrategy()
+
 play_game_handler = PlayGameHandler(
     robot=robot,
     vision_query_context=vision_query_context,
     puck_color_range=puck_color_range,
     pusher_color_range=robot_pusher_color_range,
-    puck_workspace=puck_workspace
+    puck_workspace=puck_workspace,
+    puck_radius=puck_radius,
+    tracking=True,
+    latency_compensation=latency_compensation,
+    pipelined=args.pipelined,
+    link=robot_link,
+    safe_position=(50, table_size[1] / 2),
+    strategy=strategy
 )
 
 failed_handler = FailedHandler()
 
 FAILED_STATE = "FAILED_STATE"
+STARTUP = "STARTUP"
 AWAIT_VIDEO = "AWAIT_VIDEO"
 DETECT_TABLE = "DETECT_TABLE"
 DETECT_PLAYERS = "DETECT_PLAYERS"
@@ -125,19 +303,26 @@ CHECK_NETWORK = "CHECK_NETWORK"
 TEST_MOVES = "TEST_MOVES"
 PLAY_GAME = "PLAY_GAME"
 
+# The vision checks and the network check are independent, so they run
+# concurrently and the game starts once both passed.
+startup_handler = ParallelHandler([
+    [
+        (AWAIT_VIDEO, await_video_handler, await_video_handler.SUCCESS),
+        (DETECT_TABLE, restore_calibration_handler,
+         restore_calibration_handler.SUCCESS),
+        (DETECT_PLAYERS, detect_players_handler,
+         detect_players_handler.SUCCESS),
+    ],
+    [
+        (CHECK_NETWORK, check_network_handler, check_network_handler.SUCCESS),
+    ],
+])
+
 state_transitions = {
     FAILED_STATE: (failed_handler, {}),
-    AWAIT_VIDEO: (await_video_handler, {
-        await_video_handler.SUCCESS: DETECT_TABLE,
-        await_video_handler.TIMEOUT: FAILED_STATE,
-    }),
-    DETECT_TABLE: (detect_table_handler, {
-        detect_table_handler.SUCCESS: DETECT_PLAYERS,
-        detect_table_handler.FAIL: FAILED_STATE,
-    }),
-    DETECT_PLAYERS: (detect_players_handler, {
-        detect_players_handler.SUCCESS: CHECK_NETWORK,
-        detect_players_handler.FAIL: FAILED_STATE,
+    STARTUP: (startup_handler, {
+        startup_handler.SUCCESS: PLAY_GAME,
+        startup_handler.FAIL: FAILED_STATE,
     }),
     CHECK_NETWORK: (check_network_handler, {
         check_network_handler.SUCCESS: PLAY_GAME,
@@ -149,13 +334,18 @@ state_transitions = {
     # }),
     PLAY_GAME: (play_game_handler, {
         play_game_handler.SUCCESS: FAILED_STATE,
-        play_game_handler.FAIL: FAILED_STATE
+        play_game_handler.FAIL: FAILED_STATE,
+        play_game_handler.LINK_LOST: CHECK_NETWORK
     })
 }
 
-controller = Controller(AWAIT_VIDEO, FAILED_STATE)
+robot_link.start()
+atexit.register(robot_link.stop)
+atexit.register(robot_link.log_summary, logger)
+
+controller = AsyncController(STARTUP, FAILED_STATE)
 for state in state_transitions:
     handler, result_map = state_transitions[state]
     controller.register_handler(state, handler, result_map)
 
-controller.run()
+asyncio.run(controller.run())
@@ -0,0 +1,249 @@
+"""
+Offline benchmarks of the vision and trajectory hot path.
+
+Runs the detectors, queries, translator and trajectory over synthetic
+frames at several resolutions and, optionally, over recorded sessions.
+Per-frame latency percentiles and throughput are printed and can be saved
+as JSON to compare runs across commits:
+
+    python -m airhockey.benchmark --resolutions 640x360 1280x720 \\
+        --session game.bin --output bench.json
+"""
+import argparse
+import datetime
+import json
+import math
+import platform
+import subprocess
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from airhockey.trajectory import Trajectory
+from airhockey.translate import WorldToFrameTranslator
+from airhockey.vision.color import ColorRange, ColorDetector
+from airhockey.vision.query import PositionQuery, VerifyPositionQuery
+from airhockey.vision.segmentation import ColorSegmenter
+from airhockey.vision.session import Session
+from airhockey.vision.synthetic import render_frame
+from airhockey.vision.tracking import RegionTracker
+
+TABLE_SIZE = (1200, 600)
+PUCK_RADIUS = 20
+EXPECTED_MARKERS = [(400, -15), (400, 615)]
+
+TABLE_MARKERS = ColorRange(name="Table Markers", h_low=84, h_high=92,
+                           sv_low=53)
+PUCK = ColorRange(name="Puck", h_low=49, h_high=69, sv_low=53)
+PUSHER = ColorRange(name="Robot Pusher", h_low=20, h_high=30, sv_low=53)
+COLOR_RANGES = [TABLE_MARKERS, PUCK, PUSHER]
+
+
+def puck_path(frames: int) -> List[Tuple[float, float]]:
+    """
+    Positions of a puck bouncing off the table sides, one per frame.
+    """
+    width, height = TABLE_SIZE
+    x, y = width * 0.8, height * 0.3
+    vx, vy = -23.0, 17.0
+    path = []
+    for _ in range(frames):
+        path.append((x, y))
+        x, y = x + vx, y + vy
+        if not PUCK_RADIUS <= x <= width - PUCK_RADIUS:
+            vx = -vx
+        if not PUCK_RADIUS <= y <= height - PUCK_RADIUS:
+            vy = -vy
+    return path
+
+
+def synthetic_frames(video_size: Tuple[int, int], frames: int):
+    translator = WorldToFrameTranslator(video_size, TABLE_SIZE)
+    result = []
+    for position in puck_path(frames):
+        blobs: List[Tuple[ColorRange, Tuple[float, float], float]] = [
+            (TABLE_MARKERS, m, 10) for m in EXPECTED_MARKERS]
+        blobs.append((PUCK, position, PUCK_RADIUS))
+        blobs.append((PUSHER, (100, TABLE_SIZE[1] / 2), 25))
+        result.append(render_frame(video_size, translator, blobs))
+    return translator, result
+
+
+def measure(
+        name: str,
+        source: str,
+        video_size: Tuple[int, int],
+        items: list,
+        function: Callable
+) -> Dict:
+    durations = np.zeros(len(items))
+    for index, item in enumerate(items):
+        started = time.perf_counter()
+        function(item)
+        durations[index] = time.perf_counter() - started
+
+    ms = durations * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    total = durations.sum()
+    return {
+        "case": name,
+        "source": source,
+        "resolution": "{0}x{1}".format(*video_size),
+        "frames": len(items),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(ms.max()),
+        "throughput_fps": float(len(items) / total) if total else math.inf,
+    }
+
+
+def run_cases(
+        source: str,
+        video_size: Tuple[int, int],
+        translator: WorldToFrameTranslator,
+        frames: list
+) -> List[Dict]:
+    hsv_frames = [cv2.cvtColor(f, cv2.COLOR_BGR2HSV) for f in frames]
+    segmenter = ColorSegmenter(COLOR_RANGES)
+    puck_detector = ColorDetector(color_range=PUCK)
+    tracking_detector = ColorDetector(color_range=PUCK,
+                                      tracker=RegionTracker())
+    tracker = RegionTracker()
+
+    def segment(hsv):
+        segmentation = segmenter.segment(hsv)
+        for color_range in COLOR_RANGES:
+            segmentation.get_positions(color_range, 2)
+
+    def position_query(hsv):
+        PositionQuery(PUCK).execute(hsv, translator, None)
+
+    def tracked_position_query(hsv):
+        PositionQuery(PUCK, tracker).execute(
+            segmenter.segment(hsv), translator, None)
+
+    def verify_position_query(hsv):
+        VerifyPositionQuery(TABLE_MARKERS, EXPECTED_MARKERS).execute(
+            hsv, translator, None)
+
+    cases = [
+        ("hsv_convert", frames,
+         lambda f: cv2.cvtColor(f, cv2.COLOR_BGR2HSV)),
+        ("color_detector", hsv_frames,
+         lambda hsv: puck_detector.get_positions(hsv, 1)),
+        ("color_detector_tracking", hsv_frames,
+         lambda hsv: tracking_detector.get_positions(hsv, 1)),
+        ("segmentation", hsv_frames, segment),
+        ("position_query", hsv_frames, position_query),
+        ("position_query_tracking", hsv_frames, tracked_position_query),
+        ("verify_position_query", hsv_frames, verify_position_query),
+    ]
+    return [measure(name, source, video_size, items, function)
+            for name, items, function in cases]
+
+
+def run_geometry_cases(video_size: Tuple[int, int], frames: int) -> List[Dict]:
+    translator = WorldToFrameTranslator(video_size, TABLE_SIZE)
+    path = puck_path(frames)
+    frame_points = [translator.w2f(p) for p in path]
+    trajectory = Trajectory(TABLE_SIZE)
+
+    def register_and_intercept(position):
+        trajectory.register_position(position)
+        trajectory.calculate_interception_points()
+
+    return [
+        measure("translator_w2f", "synthetic", video_size, path,
+                translator.w2f),
+        measure("translator_f2w", "synthetic", video_size, frame_points,
+                translator.f2w),
+        measure("trajectory", "synthetic", video_size, path,
+                register_and_intercept),
+    ]
+
+
+def run(
+        *,
+        resolutions: List[Tuple[int, int]],
+        frames: int,
+        sessions: List[str],
+        session_frames: Optional[int] = None
+) -> Dict:
+    results = []
+    for video_size in resolutions:
+        translator, synthetic = synthetic_frames(video_size, frames)
+        results += run_cases("synthetic", video_size, translator, synthetic)
+        results += run_geometry_cases(video_size, frames)
+
+    for path in sessions:
+        session = Session(path)
+        height, width = session.shape[:2]
+        video_size = (width, height)
+        translator = WorldToFrameTranslator(video_size, TABLE_SIZE)
+        images = list(session.images[:session_frames])
+        if session.shape[2] == 4:
+            images = [cv2.cvtColor(i, cv2.COLOR_BGRA2BGR) for i in images]
+        results += run_cases(path, video_size, translator, images)
+
+    return {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "results": results,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_resolution(value: str) -> Tuple[int, int]:
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def print_report(report: Dict):
+    print("{case:<26}{source:<16}{resolution:>10}{p50:>9}{p95:>9}{p99:>9}"
+          "{fps:>11}".format(case="case", source="source",
+                             resolution="size", p50="p50 ms", p95="p95 ms",
+                             p99="p99 ms", fps="fps"))
+    for r in report["results"]:
+        print("{case:<26}{source:<16}{resolution:>10}{p50_ms:>9.3f}"
+              "{p95_ms:>9.3f}{p99_ms:>9.3f}{throughput_fps:>11.1f}".format(
+                  **dict(r, source=r["source"][-15:])))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="airhockey.benchmark")
+    parser.add_argument("--resolutions", nargs="*", type=parse_resolution,
+                        default=[(640, 360), (1280, 720)])
+    parser.add_argument("--frames", type=int, default=200,
+                        help="number of synthetic frames per resolution")
+    parser.add_argument("--session", action="append", default=[],
+                        help="recorded session to benchmark on")
+    parser.add_argument("--session-frames", type=int,
+                        help="use only the first N frames of sessions")
+    parser.add_argument("--output", help="save results as JSON")
+    args = parser.parse_args(argv)
+
+    report = run(resolutions=args.resolutions, frames=args.frames,
+                 sessions=args.session, session_frames=args.session_frames)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
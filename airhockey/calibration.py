@@ -0,0 +1,150 @@
+"""
+Calibration cache: the world to frame matrix, the tuned color ranges and the
+robot latency parameters of a run are saved in a versioned JSON file, so the
+next start only verifies them on a frame instead of detecting the table
+again. The latency parameters are the last --latency given and the round
+trip time and jitter RobotLink measured. Each of them is optional.
+"""
+import json
+import logging
+import os
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from airhockey.robot import LinkStats
+from airhockey.translate import WorldToFrameTranslator
+from airhockey.vision.color import ColorRange
+
+VERSION = 2
+
+logger = logging.getLogger(__name__)
+
+
+class Calibration(NamedTuple):
+    video_size: Tuple[int, int]
+    # World positions of the table markers the matrix was fitted to.
+    markers: List[Tuple[float, float]]
+    world_to_frame: List[List[float]]
+    # (h_low, h_high, sv_low) by color range name
+    color_ranges: Dict[str, Tuple[int, int, int]]
+    # Seconds from frame capture to the pusher moving, as last given with
+    # --latency.
+    latency: Optional[float] = None
+    # Seconds, as measured by RobotLink.
+    link_rtt: Optional[float] = None
+    link_jitter: Optional[float] = None
+
+    @classmethod
+    def capture(
+            cls,
+            *,
+            translator: WorldToFrameTranslator,
+            color_ranges: Sequence[ColorRange],
+            markers: Sequence[Tuple[float, float]],
+            video_size: Tuple[int, int],
+            latency: Optional[float] = None,
+            link_stats: Optional[LinkStats] = None
+    ) -> "Calibration":
+        return cls(
+            video_size=(int(video_size[0]), int(video_size[1])),
+            markers=[(float(x), float(y)) for x, y in markers],
+            world_to_frame=translator.world_to_frame.tolist(),
+            color_ranges={c.name: (int(c.h_low), int(c.h_high),
+                                   int(c.sv_low)) for c in color_ranges},
+            latency=_optional_float(latency),
+            link_rtt=_optional_float(link_stats and link_stats.rtt),
+            link_jitter=_optional_float(link_stats and link_stats.jitter))
+
+    def estimated_latency(self) -> float:
+        """
+        The cached latency, otherwise half the measured round trip time of
+        the robot link, which is the least the pusher lags behind a frame.
+        """
+        if self.latency is not None:
+            return self.latency
+        if self.link_rtt is not None:
+            return self.link_rtt / 2
+        return 0.0
+
+    def matches(
+            self,
+            *,
+            video_size: Tuple[int, int],
+            markers: Sequence[Tuple[float, float]]
+    ) -> bool:
+        """
+        Whether the calibration was made for this video size and markers.
+        """
+        return tuple(self.video_size) == tuple(video_size) and \
+            [tuple(m) for m in self.markers] == \
+            [(float(x), float(y)) for x, y in markers]
+
+    def apply(
+            self,
+            *,
+            translator: WorldToFrameTranslator,
+            color_ranges: Sequence[ColorRange]
+    ):
+        """
+        Sets the translator matrix and the bounds of the color ranges with a
+        cached value. Color ranges missing from the cache are kept.
+        """
+        translator.set_world_to_frame(self.world_to_frame)
+        for color_range in color_ranges:
+            bounds = self.color_ranges.get(color_range.name)
+            if bounds is not None:
+                color_range.set_h_low(bounds[0])
+                color_range.set_h_high(bounds[1])
+                color_range.set_sv_low(bounds[2])
+
+    def save(self, path: str):
+        # Written next to the target and renamed, an interrupted save keeps
+        # the previous file.
+        temporary = path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump(dict(version=VERSION, **self._asdict()), f, indent=2)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str) -> "Calibration":
+        with open(path) as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError(f"{path} is not a calibration file")
+        if data.get("version") != VERSION:
+            raise ValueError(
+                f"Calibration version {data.get('version')} is not "
+                f"supported")
+        try:
+            width, height = data["video_size"]
+            return cls(
+                video_size=(int(width), int(height)),
+                markers=[(float(x), float(y)) for x, y in data["markers"]],
+                world_to_frame=[[float(v) for v in row]
+                                for row in data["world_to_frame"]],
+                color_ranges={
+                    name: (int(h_low), int(h_high), int(sv_low))
+                    for name, (h_low, h_high, sv_low)
+                    in data["color_ranges"].items()},
+                latency=_optional_float(data.get("latency")),
+                link_rtt=_optional_float(data.get("link_rtt")),
+                link_jitter=_optional_float(data.get("link_jitter")))
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            raise ValueError(f"{path} is not a calibration file") from e
+
+
+def _optional_float(value) -> Optional[float]:
+    return None if value is None else float(value)
+
+
+def load_calibration(path: Optional[str]) -> Optional[Calibration]:
+    """
+    Returns the calibration cached in path, or None when there is none or it
+    cannot be used.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return Calibration.load(path)
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring calibration cache: %s", e)
+        return None
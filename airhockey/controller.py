@@ -1,3 +1,10 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Sequence, Tuple
+
+
 class IllegalStateSwitchException(Exception):
     pass
 
@@ -16,12 +23,114 @@ class HandlerWrapper(object):
     def __call__(self, *args, **kwargs):
         return self.next_states.get(self.handler(*args, **kwargs))
 
+    async def call_async(self):
+        """
+        Awaits the run_async() coroutine of the handler, or the handler
+        itself when it is a coroutine function. Other handlers are blocking
+        and run in a thread of their own. Cancelling the call does not stop
+        a blocking handler, it runs on to its end in the background, so
+        handlers that may be cancelled while waiting provide run_async().
+        """
+        run_async = getattr(self.handler, "run_async", None)
+        if run_async is not None:
+            returned = await run_async()
+        elif asyncio.iscoroutinefunction(self.handler):
+            returned = await self.handler()
+        else:
+            returned = await run_in_thread(self.handler)
+        return self.next_states.get(returned)
+
+
+def run_in_thread(function, *args) -> asyncio.Future:
+    """
+    Runs a blocking function in a daemon thread. Unlike the default
+    executor of the event loop, a handler that never returns does not keep
+    the process alive after the loop is gone.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def resolve(result, error):
+        if not future.done():
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def run():
+        result, error = None, None
+        try:
+            result = function(*args)
+        except BaseException as e:
+            error = e
+        try:
+            loop.call_soon_threadsafe(resolve, result, error)
+        except RuntimeError:
+            # The loop is closed, nobody waits for the result anymore.
+            pass
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+class ParallelHandler(object):
+    """
+    Join point of independent stages. Every branch is a sequence of
+    (name, handler, success result) stages run one after another, and the
+    branches run concurrently. Returns SUCCESS once every branch passed all
+    of its stages, or FAIL as soon as a stage returns anything else, in
+    which case the other branches are cancelled (see
+    HandlerWrapper.call_async for what that means for blocking stages).
+    The time every stage took is logged and kept in timings.
+    """
+    SUCCESS = "SUCCESS"
+    FAIL = "FAIL"
+
+    def __init__(self, branches: Sequence[Sequence[Tuple[str, Any, Any]]]):
+        self.branches = branches
+        self.timings: Dict[str, float] = {}
+        self.logger = logging.getLogger(__name__)
+
+    def __call__(self):
+        return asyncio.run(self.run_async())
+
+    async def run_async(self):
+        self.timings = {}
+        tasks = [asyncio.ensure_future(self._run_branch(stages))
+                 for stages in self.branches]
+        try:
+            for branch in asyncio.as_completed(tasks):
+                if not await branch:
+                    return self.FAIL
+        finally:
+            for task in tasks:
+                task.cancel()
+        return self.SUCCESS
+
+    async def _run_branch(self, stages) -> bool:
+        for name, handler, success in stages:
+            started = time.monotonic()
+            passed = await HandlerWrapper(handler, {success: True}) \
+                .call_async()
+            self.timings[name] = time.monotonic() - started
+            self.logger.info("Stage %s %s in %.2fs.", name,
+                             "passed" if passed else "failed",
+                             self.timings[name])
+            if not passed:
+                return False
+        return True
+
 
 class Controller(object):
     def __init__(self, initial_state, terminal_state):
         self._state = initial_state
         self._terminal_state = terminal_state
         self._handlers = {}
+        # (state, seconds) of every state run so far
+        self.timings: List[Tuple[Any, float]] = []
+        self.logger = logging.getLogger(__name__)
+        self._started = 0.0
+        self._state_started = 0.0
 
     def get_state(self):
         return self._state
@@ -35,21 +144,59 @@ class Controller(object):
     def run(self):
         while True:
             next_state = None
-            handlers = self._handlers.get(self._state)
-            if handlers is None:
-                raise Exception(
-                    "No handlers registered for the '{state}' state".format(
-                        state=self._state))
-            for handler in handlers:
-                returned_state = handler()
-                if next_state is not None and returned_state is not None:
-                    raise RunHandlerException(
-                        "Trying to change the state of controller by multiple "
-                        "handlers")
-                next_state = returned_state
-
-            if self._state == self._terminal_state:
+            self._enter()
+            for handler in self._state_handlers():
+                next_state = self._merge(next_state, handler())
+            if not self._advance(next_state):
                 break
 
-            if next_state is not None:
-                self._state = next_state
+    def _state_handlers(self):
+        handlers = self._handlers.get(self._state)
+        if handlers is None:
+            raise Exception(
+                "No handlers registered for the '{state}' state".format(
+                    state=self._state))
+        return handlers
+
+    @staticmethod
+    def _merge(next_state, returned_state):
+        if next_state is not None and returned_state is not None:
+            raise RunHandlerException(
+                "Trying to change the state of controller by multiple "
+                "handlers")
+        return returned_state
+
+    def _enter(self):
+        self._state_started = time.monotonic()
+        if not self.timings:
+            self._started = self._state_started
+
+    def _advance(self, next_state):
+        now = time.monotonic()
+        self.timings.append((self._state, now - self._state_started))
+        self.logger.info("State %s took %.2fs, %.2fs since start.",
+                         self._state, now - self._state_started,
+                         now - self._started)
+        if self._state == self._terminal_state:
+            return False
+        if next_state is not None:
+            self._state = next_state
+        return True
+
+
+class AsyncController(Controller):
+    """
+    Controller running on an asyncio event loop, see
+    HandlerWrapper.call_async for how handlers are run. Waiting handlers
+    await instead of polling, so the loop idles between their events.
+    """
+
+    async def run(self):
+        while True:
+            next_state = None
+            self._enter()
+            for handler in self._state_handlers():
+                next_state = self._merge(next_state,
+                                         await handler.call_async())
+            if not self._advance(next_state):
+                break
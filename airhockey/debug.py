@@ -1,10 +1,16 @@
+import collections
 import logging
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
 import cv2
 import numpy as np
 from airhockey.vision.color import ColorRange
 import textwrap
 
+from airhockey.pipeline import LatestQueue, QueueClosed
+from airhockey.vision.session import SessionWriter
 from airhockey.vision.video import FrameReader
 
 
@@ -19,9 +25,9 @@ class DebugWindowLogHandler(logging.Handler):
 
     def draw(self, frame, y_start):
         if len(self.messages) > 3:
-            self.messages.pop(0)
+            del self.messages[:-3]
         line_num = 0
-        for m in self.messages:
+        for m in list(self.messages):
             for index, line in enumerate(textwrap.wrap(m, 90)):
                 cv2.putText(frame, line,
                             (500, y_start + line_num * 40 - index * 15 + 40),
@@ -30,48 +36,109 @@ class DebugWindowLogHandler(logging.Handler):
                 line_num += 1
 
 
-class DebugWindow(object):
-    def __init__(self, *, name, log, translator, table_size,
-                 color_ranges: list['ColorRange']):
-        self.name = name
+def color_preview(color_range: ColorRange, width, height, channels=3):
+    """
+    Returns a BGR tile with the hue range of color_range along the x axis
+    and its saturation and value range along the y axis.
+    """
+    r = color_range
+    h = r.h_low + (r.h_high - r.h_low) / width * np.arange(width)
+    sv = r.sv_low + (255 - r.sv_low) / height * np.arange(height)
+    preview_hsv = np.empty((height, width, 3), np.uint8)
+    preview_hsv[:, :, 0] = h[None, :]
+    preview_hsv[:, :, 1] = sv[:, None]
+    preview_hsv[:, :, 2] = sv[:, None]
+    return cv2.cvtColor(preview_hsv, cv2.COLOR_HSV2BGR, dstCn=channels)
+
+
+class DebugSnapshot(NamedTuple):
+    frame: np.ndarray
+    circles: List[Tuple[list, Tuple[int, int, int]]]
+    frames_grabbed: int
+    stream_fps: float
+    frames_read: int
+    read_fps: float
+    timestamp: float
+
+
+class DebugSink(object):
+    """
+    Receives the frame and query overlays from QueryContext. The base class
+    discards them, which is what a headless run without recording needs.
+    """
+
+    def set_frame(self, frame, hsv):
+        ...
+
+    def draw(self, queries: list, frame_reader: FrameReader):
+        ...
+
+    def draw_circle(self, world_coordinates, color):
+        ...
+
+    def draw_circles(self, world_coordinates, color):
+        ...
+
+    def close(self):
+        ...
+
+
+class NullDebugSink(DebugSink):
+    pass
+
+
+class DebugRenderer(DebugSink):
+    """
+    Renders the frame with query overlays, logs, color previews and fps
+    and hands the result to show().
+
+    draw() only records what the queries want to show together with the
+    frame, rendering happens in render(). With max_fps at most that many
+    frames per second are rendered and skipped frames cost nothing. With
+    threaded=True snapshots are composed on a separate thread, only the
+    latest pending one is kept, so slow rendering never holds up the
+    control loop.
+    """
+    # Whether show() has to run on the thread calling draw() and close().
+    # HighGUI is not thread safe, a window is only composed off-thread.
+    show_in_caller = False
+
+    def __init__(self, *, log, translator, table_size,
+                 color_ranges: list['ColorRange'],
+                 max_fps: Optional[float] = None,
+                 threaded: bool = False):
         self.translator = translator
         self.table_size = table_size
         self.color_ranges = color_ranges
-        cv2.namedWindow(self.name, cv2.WINDOW_NORMAL)
-        cv2.resizeWindow(self.name, 1000, 1000)
-        # self.frame = None
-        # self.hsv = None
+        self.max_fps = max_fps
+        self.threaded = threaded
+        self.circles: List[Tuple[list, Tuple[int, int, int]]] = []
+        self.canvas: Optional[np.ndarray] = None
+        self._next_draw = 0.0
+        self._snapshots = LatestQueue()
+        self._canvases = LatestQueue()
+        self._renderer: Optional[threading.Thread] = None
+        self._previews: Dict[int, Tuple[tuple, np.ndarray]] = {}
 
         self.log_handler = DebugWindowLogHandler()
         formatter = logging.Formatter(
             '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
         self.log_handler.setFormatter(formatter)
         self.log_handler.setLevel(logging.INFO)
-        logger = logging.getLogger(log)
-        logger.addHandler(self.log_handler)
-
-        for r in color_ranges:
-            cv2.createTrackbar(f'{r.name} H Low', self.name,
-                               r.h_low, 179, r.set_h_low)
-            cv2.createTrackbar(f'{r.name} H High', self.name,
-                               r.h_high, 179, r.set_h_high)
-            cv2.createTrackbar(f'{r.name} SV Low', self.name,
-                               r.sv_low, 255, r.set_sv_low)
+        self.logger = logging.getLogger(log)
+        self.logger.addHandler(self.log_handler)
 
     def draw_color_previews(self, target, y_start):
         width = 200
         height = 50
         for index, r in enumerate(self.color_ranges):
-            preview_hsv = np.zeros((height, width, 3), np.uint8)
-
-            for row in range(0, height):
-                sv = r.sv_low + (255 - r.sv_low) / height * row
-                for col in range(0, width):
-                    h = r.h_low + (r.h_high - r.h_low) / width * col
-                    preview_hsv[row, col] = [h, sv, sv]
-
-            preview = cv2.cvtColor(preview_hsv, cv2.COLOR_HSV2BGR,
-                                   dstCn=target.shape[2])
+            key = (r.bounds, target.shape[2])
+            cached = self._previews.get(id(r))
+            if cached is None or cached[0] != key:
+                cached = (key, color_preview(r, width, height,
+                                             target.shape[2]))
+                self._previews[id(r)] = cached
+            preview = cached[1]
 
             offset = (y_start + index * (height + 10), 0)
             target[offset[0]:offset[0] + preview.shape[0],
@@ -82,41 +149,199 @@ class DebugWindow(object):
         self.hsv = hsv
 
     def draw(self, queries: list, frame_reader: FrameReader):
+        if self.max_fps:
+            now = time.monotonic()
+            if now < self._next_draw:
+                return
+            interval = 1 / self.max_fps
+            self._next_draw += interval
+            if self._next_draw <= now:
+                self._next_draw = now + interval
+
+        self.circles = []
         for query in queries:
             query.draw(self)
-        cv2.rectangle(self.frame, self.translator.w2f((0, 0)),
+        # The frame is a leased view of a capture slot, which is written
+        # again once this thread reads the next frame, so the snapshot
+        # keeps its own copy.
+        frame = self.frame.copy()
+        snapshot = DebugSnapshot(frame, self.circles,
+                                 frame_reader.frames_grabbed,
+                                 frame_reader.stream_fps(),
+                                 frame_reader.frames_read,
+                                 frame_reader.read_fps(),
+                                 time.monotonic())
+        if not self.threaded:
+            self.render(snapshot)
+            return
+        if self._renderer is None:
+            self._renderer = threading.Thread(
+                target=self._render_snapshots, name="debug-renderer",
+                daemon=True)
+            self._renderer.start()
+        self._snapshots.put(snapshot)
+        if self.show_in_caller:
+            self._show_composed()
+
+    def render(self, snapshot: DebugSnapshot):
+        self.show(self.compose(snapshot))
+
+    def compose(self, snapshot: DebugSnapshot) -> np.ndarray:
+        h, w, d = snapshot.frame.shape
+        target = self.canvas
+        if target is None or target.shape != (h + 300, w + 300, d):
+            target = np.zeros((h + 300, w + 300, d), np.uint8)
+            # A canvas handed to another thread is not drawn over again.
+            if not self.threaded:
+                self.canvas = target
+        else:
+            target[h:] = 0
+            target[:h, w:] = 0
+        target[0:h, 0:w] = snapshot.frame
+        for points, color in snapshot.circles:
+            for c in self.translator.w2f_many(points).tolist():
+                cv2.circle(target, (c[0], c[1]), 10, color, -1)
+        cv2.rectangle(target, self.translator.w2f((0, 0)),
                       self.translator.w2f(self.table_size),
                       (0, 255, 255), 2)
-        h, w, d = self.frame.shape
-        target = np.zeros((h + 300, w + 300, d), np.uint8)
-        target[0:h, 0:w] = self.frame
         self.log_handler.draw(target, h)
         self.draw_color_previews(target, h)
-        self.draw_fps(target, frame_reader)
-        cv2.imshow(self.name, target)
+        self.draw_fps(target, snapshot)
+        return target
 
-        # for r in self.color_ranges:
-        #     lower_color = np.array([r.h_low, r.sv_low, r.sv_low])
-        #     upper_color = np.array([r.h_high, 255, 255])
-        #     mask = cv2.inRange(self.hsv, lower_color, upper_color)
-        #     cv2.imshow(r.name, mask)
-        cv2.waitKey(1)
+    def show(self, canvas):
+        raise NotImplementedError
+
+    def close(self):
+        self._snapshots.close()
+        if self._renderer is not None:
+            self._renderer.join()
+            self._renderer = None
+            if self.show_in_caller:
+                self._show_composed()
+        self.logger.removeHandler(self.log_handler)
 
     def draw_circle(self, world_coordinates, color):
+        self.draw_circles([world_coordinates], color)
+
+    def draw_circles(self, world_coordinates, color):
+        if len(world_coordinates) == 0:
+            return
         hsv_color = np.uint8([[color]])
         bgr_color = cv2.cvtColor(hsv_color, cv2.COLOR_HSV2BGR)[0][0]
         bgr_color = (int(bgr_color[0]), int(bgr_color[1]), int(bgr_color[2]))
-        c = self.translator.w2f(world_coordinates)
-        cv2.circle(self.frame, c, 10, bgr_color, -1)
+        self.circles.append((list(world_coordinates), bgr_color))
 
-    def draw_fps(self, target, frame_reader: FrameReader):
+    def draw_fps(self, target, snapshot: DebugSnapshot):
         cv2.putText(target, str("Stream: {0}/{1:.2f} fps".format(
-            frame_reader.frames_grabbed, frame_reader.stream_fps())), (10, 45),
+            snapshot.frames_grabbed, snapshot.stream_fps)), (10, 45),
                     cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), thickness=2)
         cv2.putText(target, str("Processed: {0}/{1:.2f} fps".format(
-            frame_reader.frames_read, frame_reader.read_fps())), (430, 45),
+            snapshot.frames_read, snapshot.read_fps)), (430, 45),
                     cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), thickness=2)
 
+    def _render_snapshots(self):
+        try:
+            while True:
+                snapshot = self._snapshots.get()
+                if snapshot is None:
+                    continue
+                if self.show_in_caller:
+                    self._canvases.put(self.compose(snapshot))
+                else:
+                    self.render(snapshot)
+        except QueueClosed:
+            pass
+
+    def _show_composed(self):
+        canvas = self._canvases.get(timeout=0)
+        if canvas is not None:
+            self.show(canvas)
+
+
+class DebugWindow(DebugRenderer):
+    """
+    Shows the rendered frames in a window with trackbars for tuning the
+    color ranges. The window belongs to the thread that creates it, draw()
+    and close() are called from that thread only.
+    """
+    show_in_caller = True
+
+    def __init__(self, *, name, **kwargs):
+        super().__init__(**kwargs)
+        self.name = name
+        cv2.namedWindow(self.name, cv2.WINDOW_NORMAL)
+        cv2.resizeWindow(self.name, 1000, 1000)
+
+        for r in self.color_ranges:
+            cv2.createTrackbar(f'{r.name} H Low', self.name,
+                               r.h_low, 179, r.set_h_low)
+            cv2.createTrackbar(f'{r.name} H High', self.name,
+                               r.h_high, 179, r.set_h_high)
+            cv2.createTrackbar(f'{r.name} SV Low', self.name,
+                               r.sv_low, 255, r.set_sv_low)
+
+    def show(self, canvas):
+        cv2.imshow(self.name, canvas)
+
+        # for r in self.color_ranges:
+        #     lower_color = np.array([r.h_low, r.sv_low, r.sv_low])
+        #     upper_color = np.array([r.h_high, 255, 255])
+        #     mask = cv2.inRange(self.hsv, lower_color, upper_color)
+        #     cv2.imshow(r.name, mask)
+        cv2.waitKey(1)
+
+
+class VideoDebugSink(DebugRenderer):
+    """
+    Encodes the rendered frames into a video file.
+    """
+
+    def __init__(self, *, path: str, fps: float = 15.0,
+                 fourcc: str = "MJPG", **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.fps = fps
+        self.fourcc = fourcc
+        self.writer: Optional[cv2.VideoWriter] = None
+
+    def show(self, canvas):
+        if self.writer is None:
+            h, w = canvas.shape[:2]
+            self.writer = cv2.VideoWriter(
+                self.path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps,
+                (w, h))
+        if canvas.shape[2] == 4:
+            canvas = cv2.cvtColor(canvas, cv2.COLOR_BGRA2BGR)
+        self.writer.write(canvas)
+
+    def close(self):
+        super().close()
+        if self.writer is not None:
+            self.writer.release()
+            self.writer = None
+
+
+class MemoryDebugSink(DebugRenderer):
+    """
+    Keeps the last camera frames drawn in memory, for a post-mortem look at
+    what the bot saw. save() writes them as a camera session, replaying it
+    draws the overlays again.
+    """
+
+    def __init__(self, *, size: int = 300, **kwargs):
+        super().__init__(**kwargs)
+        self.frames: collections.deque = collections.deque(maxlen=size)
+
+    def render(self, snapshot: DebugSnapshot):
+        # Kept well past the snapshot, so it must not share its image.
+        self.frames.append((snapshot.frame.copy(), snapshot.timestamp))
+
+    def save(self, path: str):
+        with SessionWriter(path) as writer:
+            for canvas, timestamp in list(self.frames):
+                writer.write(canvas, timestamp)
+
 
 class Debug(object):
     def __init__(self, translator, robot):
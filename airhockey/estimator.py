@@ -0,0 +1,133 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+from airhockey import vecmath
+
+Vector = vecmath.Vector
+
+
+class PuckStateEstimator(object):
+    """
+    Constant-velocity Kalman filter over the puck position in world units.
+
+    The state is [x, y, vx, vy] with velocity in units per second. Every
+    measurement is weighted against the prediction from the previous state
+    using the capture timestamps, so a dropped or late frame only widens the
+    covariance instead of producing a velocity spike. A measurement that is
+    far outside the predicted covariance (the puck bounced or was hit)
+    resets the velocity uncertainty so the filter follows the new direction
+    within a couple of frames.
+    """
+
+    def __init__(
+            self,
+            *,
+            measurement_noise: float = 3.0,
+            acceleration_noise: float = 2000.0,
+            initial_speed_sigma: float = 3000.0,
+            outlier_threshold: float = 16.0,
+            max_gap: float = 0.5
+    ):
+        self.measurement_noise = measurement_noise
+        self.acceleration_noise = acceleration_noise
+        self.initial_speed_sigma = initial_speed_sigma
+        self.outlier_threshold = outlier_threshold
+        self.max_gap = max_gap
+        self.state = np.zeros(4)
+        self.covariance = np.eye(4)
+        self.timestamp: Optional[float] = None
+        self._measurement = np.eye(2, 4)
+        self._measurement_covariance = np.eye(2) * measurement_noise ** 2
+
+    @property
+    def initialized(self) -> bool:
+        return self.timestamp is not None
+
+    @property
+    def position(self) -> Optional[Vector]:
+        if not self.initialized:
+            return None
+        return float(self.state[0]), float(self.state[1])
+
+    @property
+    def velocity(self) -> Optional[Vector]:
+        if not self.initialized:
+            return None
+        return float(self.state[2]), float(self.state[3])
+
+    @property
+    def speed(self) -> float:
+        return vecmath.length((self.state[2], self.state[3]))
+
+    def reset(self):
+        self.timestamp = None
+
+    def update(self, position: Optional[Vector], timestamp: float):
+        """
+        Registers a measured position captured at timestamp. A None position
+        (puck not detected) leaves the state to be extrapolated.
+        """
+        last = self.timestamp
+        if last is not None and timestamp - last > self.max_gap:
+            self.reset()
+            last = None
+
+        if position is None:
+            return
+        if last is None:
+            self._initialize(position, timestamp)
+            return
+
+        state, covariance = self._predict(timestamp - last)
+        h = self._measurement
+        innovation = np.asarray(position, dtype=float) - h @ state
+        innovation_covariance = h @ covariance @ h.T + \
+            self._measurement_covariance
+        inverse = np.linalg.inv(innovation_covariance)
+
+        if innovation @ inverse @ innovation > self.outlier_threshold:
+            covariance[2:, 2:] = np.eye(2) * self.initial_speed_sigma ** 2
+            innovation_covariance = h @ covariance @ h.T + \
+                self._measurement_covariance
+            inverse = np.linalg.inv(innovation_covariance)
+
+        gain = covariance @ h.T @ inverse
+        self.state = state + gain @ innovation
+        self.covariance = (np.eye(4) - gain @ h) @ covariance
+        self.timestamp = timestamp
+
+    def predict(self, timestamp: float) -> Optional[Tuple[Vector, Vector]]:
+        """
+        Returns the (position, velocity) extrapolated to timestamp.
+        """
+        if self.timestamp is None:
+            return None
+        dt = timestamp - self.timestamp
+        x, y, vx, vy = self.state
+        return (float(x + vx * dt), float(y + vy * dt)), \
+            (float(vx), float(vy))
+
+    def _initialize(self, position: Vector, timestamp: float):
+        self.state = np.array([position[0], position[1], 0.0, 0.0])
+        self.covariance = np.diag([
+            self.measurement_noise ** 2,
+            self.measurement_noise ** 2,
+            self.initial_speed_sigma ** 2,
+            self.initial_speed_sigma ** 2,
+        ])
+        self.timestamp = timestamp
+
+    def _predict(self, dt: float):
+        transition = np.eye(4)
+        transition[0, 2] = transition[1, 3] = dt
+
+        q = self.acceleration_noise ** 2
+        noise = np.zeros((4, 4))
+        noise[:2, :2] = np.eye(2) * q * dt ** 3 / 3
+        noise[:2, 2:] = noise[2:, :2] = np.eye(2) * q * dt ** 2 / 2
+        noise[2:, 2:] = np.eye(2) * q * dt
+
+        state = transition @ self.state
+        covariance = transition @ self.covariance @ transition.T + noise
+        return state, covariance
@@ -1,7 +1,5 @@
+import asyncio
 import logging
-import time
-
-from airhockey.utils import Timeout
 
 
 class AwaitVideoHandler(object):
@@ -16,13 +14,18 @@ class AwaitVideoHandler(object):
 
     def __call__(self, *args, **kwargs):
         self.logger.info("Waiting for video stream...")
-        t = Timeout(self.timeout)
         self.video_stream.start()
-        while not self.video_stream.has_frame():
-            if t.timeout():
-                self.logger.info("Video stream timeout.")
-                return self.TIMEOUT
-            time.sleep(0.1)
+        return self._result(self.video_stream.read_next(0, self.timeout))
+
+    async def run_async(self):
+        self.logger.info("Waiting for video stream...")
+        self.video_stream.start()
+        return self._result(await asyncio.to_thread(
+            self.video_stream.read_next, 0, self.timeout))
 
+    def _result(self, frame):
+        if frame is None:
+            self.logger.info("Video stream timeout.")
+            return self.TIMEOUT
         self.logger.info("Video stream OK.")
         return self.SUCCESS
@@ -1,38 +1,72 @@
+import asyncio
 import logging
 import select
 import socket
+from typing import Optional
+
+from airhockey.robot import RobotLink
 
 
 class CheckNetworkHandler(object):
     SUCCESS = "SUCCESS"
     FAIL = "FAIL"
 
-    def __init__(self, *, host, port: int, tries, delay):
+    def __init__(
+            self,
+            *,
+            host,
+            port: int,
+            tries,
+            delay,
+            link: Optional[RobotLink] = None
+    ):
+        """
+        link: wait for the heartbeat of the robot link to report it healthy
+        instead of pinging the robot from a new socket.
+        """
         self.host = host
         self.port = port
         self.tries = tries
         self.delay = delay
+        self.link = link
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.INFO)
 
     def __call__(self, *args, **kwargs):
         for i in range(self.tries):
-            self.logger.info(f"Pinging {self.host}:{self.port}...")
-            client = socket.socket(family=socket.AF_INET,
-                                   type=socket.SOCK_DGRAM)
+            if self._attempt():
+                return self.SUCCESS
+        return self.FAIL
+
+    async def run_async(self):
+        """
+        Pings one try at a time in a worker thread. A cancelled check stops
+        after the try in flight instead of running through all the tries.
+        """
+        for i in range(self.tries):
+            if await asyncio.to_thread(self._attempt):
+                return self.SUCCESS
+        return self.FAIL
+
+    def _attempt(self) -> bool:
+        self.logger.info(f"Pinging {self.host}:{self.port}...")
+        if self.link is not None:
+            if self.link.wait_healthy(self.delay):
+                self.logger.info("Ping OK.")
+                return True
+            self.logger.info("Failed.")
+            return False
+
+        client = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)
+        try:
             client.sendto(b"ping", (self.host, self.port))
             r, _, _ = select.select([client], [], [], self.delay)
             if r:
                 message, address = client.recvfrom(1024)
-                if message != b"pong airhockey":
-                    self.logger.info("Failed.")
-                else:
+                if message == b"pong airhockey":
                     self.logger.info("Ping OK.")
-                    client.close()
-                    return self.SUCCESS
-            else:
-                self.logger.info("Failed.")
-
+                    return True
+            self.logger.info("Failed.")
+            return False
+        finally:
             client.close()
-
-        return self.FAIL
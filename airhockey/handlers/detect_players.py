@@ -1,4 +1,7 @@
+import asyncio
 import logging
+import time
+from typing import Optional
 
 from airhockey.utils import Timeout
 from airhockey.vision.query import VerifyPresenceQuery
@@ -26,32 +29,45 @@ class DetectPlayersHandler(object):
         self.logger.setLevel(logging.INFO)
 
     def __call__(self, *args, **kwargs):
-        t = Timeout(self.delay)
-        i = 0
+        self._start()
         while True:
-            with self.vision_query_context:
-                puck = self.vision_query_context.query(
-                    VerifyPresenceQuery(self.puck_color_range))
-                robot_pusher = self.vision_query_context.query(
-                    VerifyPresenceQuery(self.robot_pusher_color_range))
+            result = self._attempt()
+            if result is not None:
+                return result
+            time.sleep(self._timer.remaining())
 
-                if not t.timeout():
-                    continue
+    async def run_async(self):
+        self._start()
+        while True:
+            result = await asyncio.to_thread(self._attempt)
+            if result is not None:
+                return result
+            await asyncio.sleep(self._timer.remaining())
+
+    def _start(self):
+        self._timer = Timeout(self.delay)
+        self._attempts = 0
 
-                self.logger.info("Detecting a puck and a robot pusher...")
-                if puck == VerifyPresenceQuery.NOT_PRESENT:
-                    self.logger.info("Puck not found.")
+    def _attempt(self) -> Optional[str]:
+        self._timer.start()
+        with self.vision_query_context:
+            puck = self.vision_query_context.query(
+                VerifyPresenceQuery(self.puck_color_range))
+            robot_pusher = self.vision_query_context.query(
+                VerifyPresenceQuery(self.robot_pusher_color_range))
 
+            self.logger.info("Detecting a puck and a robot pusher...")
+            if puck == VerifyPresenceQuery.NOT_PRESENT:
+                self.logger.info("Puck not found.")
+            else:
+                self.logger.info("Puck OK.")
+                if robot_pusher == VerifyPresenceQuery.NOT_PRESENT:
+                    self.logger.info("Robot pusher not found.")
                 else:
-                    self.logger.info("Puck OK.")
-                    if robot_pusher == VerifyPresenceQuery.NOT_PRESENT:
-                        self.logger.info("Robot pusher not found.")
-                    else:
-                        self.logger.info("Robot pusher OK.")
-                        return self.SUCCESS
-
-                i += 1
-                if i >= self.tries:
-                    break
-
-        return self.FAIL
+                    self.logger.info("Robot pusher OK.")
+                    return self.SUCCESS
+
+            self._attempts += 1
+            if self._attempts >= self.tries:
+                return self.FAIL
+        return None
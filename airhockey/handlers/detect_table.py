@@ -1,4 +1,9 @@
+import asyncio
 import logging
+import time
+from typing import Optional
+
+from airhockey.translate import WorldToFrameTranslator
 from airhockey.vision.query import QueryContext, VerifyPositionQuery
 from airhockey.vision.color import ColorRange
 from airhockey.utils import Timeout
@@ -15,7 +20,8 @@ class DetectTableHandler(object):
             vision_query_context: QueryContext,
             tries: int,
             delay: int,
-            success_retries: int
+            success_retries: int,
+            translator: Optional[WorldToFrameTranslator] = None
     ) -> None:
         self.max_success_retries = success_retries
         self.expected_markers = expected_markers
@@ -25,40 +31,76 @@ class DetectTableHandler(object):
         self.vision_query_context = vision_query_context
         self.tries = tries
         self.delay = delay
+        self.translator = translator
 
     def __call__(self):
-        i = 0
-        t = Timeout(self.delay)
-        success_retries = 0
+        self._start()
+        while True:
+            result = self._attempt()
+            if result is not None:
+                return result
+            time.sleep(self._timer.remaining())
+
+    async def run_async(self):
+        """
+        Sleeps between the attempts without holding the event loop, the
+        detection itself runs in a worker thread.
+        """
+        self._start()
         while True:
-            with self.vision_query_context as context:
-                result = context.query(VerifyPositionQuery(
-                    self.color_range,
-                    self.expected_markers))
+            result = await asyncio.to_thread(self._attempt)
+            if result is not None:
+                return result
+            await asyncio.sleep(self._timer.remaining())
 
-                if not t.timeout():
-                    continue
+    def _start(self):
+        self._timer = Timeout(self.delay)
+        self._attempts = 0
+        self._successes = 0
 
-                i += 1
-                if i > self.tries:
-                    break
+    def _attempt(self) -> Optional[str]:
+        self._timer.start()
+        with self.vision_query_context as context:
+            query = VerifyPositionQuery(self.color_range,
+                                        self.expected_markers)
+            result = context.query(query)
 
-                self.logger.info("Detecting table...")
-                if result == VerifyPositionQuery.SUCCESS:
-                    self.logger.info("Table markers detected.")
-                    success_retries += 1
-                    if success_retries >= self.max_success_retries:
-                        return self.SUCCESS
-                    else:
-                        continue
+            self._attempts += 1
+            if self._attempts > self.tries:
+                return self.FAIL
 
-                elif result == VerifyPositionQuery.OUT_OF_POSITION:
-                    self.logger.info("Table markers are out of position.")
-                elif result == VerifyPositionQuery.NOT_DETECTED:
-                    self.logger.info("Could not see table markers.")
-                else:
-                    raise RuntimeError(
-                        "Query result {result} is not supported".format(
-                            result=result))
+            self.logger.info("Detecting table...")
+            if result == VerifyPositionQuery.SUCCESS:
+                self.logger.info("Table markers detected.")
+                self._successes += 1
+                if self._successes >= self.max_success_retries:
+                    return self.SUCCESS
+            elif result == VerifyPositionQuery.OUT_OF_POSITION:
+                self.logger.info("Table markers are out of position.")
+                self.calibrate(query)
+            elif result == VerifyPositionQuery.NOT_DETECTED:
+                self.logger.info("Could not see table markers.")
+            else:
+                raise RuntimeError(
+                    "Query result {result} is not supported".format(
+                        result=result))
+        return None
 
-        return self.FAIL
+    def calibrate(self, query: VerifyPositionQuery):
+        """
+        Fits the translator to the detected markers, the next detection
+        verifies the new calibration.
+        """
+        if self.translator is None:
+            return
+        frame_positions = query.matched_frame_positions()
+        if frame_positions is None:
+            return
+        error = self.translator.calibrate(self.expected_markers,
+                                          frame_positions)
+        if error is None:
+            self.logger.info("Could not calibrate table from markers.")
+        else:
+            self.logger.info(
+                "Table calibrated from markers, error {e:.1f}px.".format(
+                    e=error))
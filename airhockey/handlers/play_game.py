@@ -1,16 +1,35 @@
 import logging
-import math
-from typing import Tuple
+from typing import List, NamedTuple, Optional, Tuple
 
-from airhockey.robot import Robot
+from airhockey.metrics import latency, TRAJECTORY
+from airhockey.pipeline import Pipeline
+from airhockey.robot import Robot, RobotLink, Waypoint
+from airhockey.strategy import InterceptionStrategy, Strategy
 from airhockey.trajectory import Trajectory
 from airhockey.vision.color import ColorRange
 from airhockey.vision.query import QueryContext, PositionQuery
+from airhockey.vision.tracking import RegionTracker
+
+
+class Observation(NamedTuple):
+    puck_position: Optional[Tuple[float, float]]
+    pusher_position: Optional[Tuple[float, float]]
+    # None when no new frame was grabbed and the last one was reused.
+    frame_timestamp: Optional[float]
+    frame_sequence: int
+
+
+class Move(NamedTuple):
+    # None when there is nothing new to go for.
+    waypoints: Optional[List[Waypoint]]
+    frame_timestamp: Optional[float]
+    frame_sequence: int
 
 
 class PlayGameHandler:
     SUCCESS = 'SUCCESS'
     FAIL = 'FAIL'
+    LINK_LOST = 'LINK_LOST'
 
     def __init__(
             self,
@@ -19,14 +38,40 @@ class PlayGameHandler:
             vision_query_context: QueryContext,
             puck_color_range: ColorRange,
             pusher_color_range: ColorRange,
-            puck_workspace: Tuple[float, float]
+            puck_workspace: Tuple[float, float],
+            puck_radius: float = 0.0,
+            tracking: bool = False,
+            latency_compensation: float = 0.0,
+            pipelined: bool = False,
+            strategy: Optional[Strategy] = None,
+            link: Optional[RobotLink] = None,
+            safe_position: Optional[Tuple[float, float]] = None
     ):
+        """
+        pipelined: detect, estimate and move the pusher in separate threads
+        so the work on consecutive frames overlaps. Stages hand over only
+        the latest result, stale ones are dropped.
+        link: the game stops with LINK_LOST when the robot link degrades,
+        after sending the pusher to safe_position. It stops with SUCCESS
+        once the video source runs out of frames, e.g. a replayed session.
+        """
         self.robot = robot
         self.vision_query_context = vision_query_context
         self.puck_color_range = puck_color_range
         self.pusher_color_range = pusher_color_range
         self.logger = logging.getLogger(__name__)
-        self.trajectory = Trajectory(puck_workspace)
+        self.pipelined = pipelined
+        self.strategy = strategy or InterceptionStrategy()
+        self.link = link
+        self.safe_position = safe_position
+        self.trajectory = Trajectory(puck_workspace,
+                                     latency=latency_compensation,
+                                     puck_radius=puck_radius)
+        self.puck_tracker: Optional[RegionTracker] = None
+        self.pusher_tracker: Optional[RegionTracker] = None
+        if tracking:
+            self.puck_tracker = RegionTracker()
+            self.pusher_tracker = RegionTracker()
 
     def __call__(self, *args, **kwargs):
         """
@@ -39,28 +84,71 @@ class PlayGameHandler:
         self.logger.info("Starting game")
 
         with self.robot:
-            while True:
-                with self.vision_query_context as context:
-                    puck_position = context.query(
-                        PositionQuery(color_range=self.puck_color_range)
-                    )
-                    pusher_position = context.query(
-                        PositionQuery(color_range=self.pusher_color_range)
-                    )
-                    self.trajectory.register_position(puck_position)
-
-                    interception_points = self.trajectory.\
-                        calculate_interception_points()
-                    if interception_points:
-                        dx = puck_position[0] - pusher_position[0]
-                        dy = puck_position[1] - pusher_position[1]
-                        distance_to_puck = math.sqrt(pow(dx, 2) + pow(dy, 2))
-
-                        if (distance_to_puck < 200):
-                            self.robot.move(
-                                (int(pusher_position[0] + dx * 4),
-                                 int(pusher_position[1] + dy * 4)))
-                        else:
-                            self.robot.move(interception_points[0])
-
-        return self.FAIL
+            if self.pipelined:
+                def observe() -> Optional[Observation]:
+                    if not self._playing():
+                        pipeline.stop()
+                        return None
+                    return self._observe()
+
+                pipeline = Pipeline(observe, [
+                    ("estimate", self._estimate),
+                    ("actuate", self._act),
+                ])
+                pipeline.run()
+            else:
+                while self._playing():
+                    self._act(self._estimate(self._observe()))
+
+            if self._video_finished():
+                self.logger.info("Video ended, stopping the game.")
+            else:
+                self.logger.warning("Robot link lost, stopping the game.")
+            if self.safe_position is not None:
+                self.robot.move(self.safe_position)
+                self.robot.flush(force=True)
+
+        return self.SUCCESS if self._video_finished() else self.LINK_LOST
+
+    def _playing(self) -> bool:
+        return self._link_healthy() and not self._video_finished()
+
+    def _link_healthy(self) -> bool:
+        return self.link is None or self.link.healthy
+
+    def _video_finished(self) -> bool:
+        return self.vision_query_context.frame_reader.finished
+
+    def _observe(self) -> Observation:
+        with self.vision_query_context as context:
+            puck_position = context.query(
+                PositionQuery(color_range=self.puck_color_range,
+                              tracker=self.puck_tracker)
+            )
+            pusher_position = context.query(
+                PositionQuery(color_range=self.pusher_color_range,
+                              tracker=self.pusher_tracker)
+            )
+            return Observation(puck_position, pusher_position,
+                               context.frame_timestamp,
+                               context.frame_sequence)
+
+    def _estimate(self, observation: Observation) -> Move:
+        puck_position, pusher_position, frame_timestamp, frame_sequence = \
+            observation
+        if frame_timestamp is None:
+            # A reused frame holds no new puck position.
+            return Move(None, frame_timestamp, frame_sequence)
+        with latency.measure(TRAJECTORY):
+            self.trajectory.register_position(puck_position, frame_timestamp)
+            waypoints = self.strategy.plan(
+                self.trajectory, puck_position, pusher_position)
+        return Move(waypoints, frame_timestamp, frame_sequence)
+
+    def _act(self, move: Move):
+        if move.waypoints is None:
+            # Sends the move the robot held back, if any.
+            self.robot.flush()
+            return
+        self.robot.follow(move.waypoints, move.frame_timestamp,
+                          move.frame_sequence)
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+from typing import Optional, Sequence, Tuple
+
+from airhockey.calibration import Calibration
+from airhockey.handlers.detect_table import DetectTableHandler
+from airhockey.robot import RobotLink
+from airhockey.translate import WorldToFrameTranslator
+from airhockey.vision.color import ColorRange
+from airhockey.vision.query import VerifyPositionQuery
+
+
+class RestoreCalibrationHandler(object):
+    """
+    Applies the cached calibration and verifies it on a single frame. The
+    table is detected with detect_table when there is no cache or the
+    markers are not where the cached calibration puts them. Once the table
+    is calibrated the calibration is saved to path, and save() stores it
+    again with the color ranges tuned since then. Saved calibrations keep
+    the latency given, or else the cached one, and the link round trip
+    time measured so far, or else the cached one.
+    """
+    SUCCESS = "SUCCESS"
+    FAIL = "FAIL"
+
+    def __init__(
+            self,
+            *,
+            calibration: Optional[Calibration],
+            path: Optional[str],
+            detect_table: DetectTableHandler,
+            translator: WorldToFrameTranslator,
+            color_ranges: Sequence[ColorRange],
+            video_size: Tuple[int, int],
+            latency: Optional[float] = None,
+            link: Optional[RobotLink] = None
+    ) -> None:
+        self.calibration = calibration
+        self.path = path
+        self.detect_table = detect_table
+        self.translator = translator
+        self.color_ranges = color_ranges
+        self.video_size = video_size
+        self.latency = latency
+        self.link = link
+        self.calibrated = False
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.INFO)
+
+    def __call__(self):
+        if self.restore():
+            return self._done(DetectTableHandler.SUCCESS)
+        return self._done(self.detect_table())
+
+    async def run_async(self):
+        if await asyncio.to_thread(self.restore):
+            return self._done(DetectTableHandler.SUCCESS)
+        return self._done(await self.detect_table.run_async())
+
+    def restore(self) -> bool:
+        if self.calibration is None:
+            self.logger.info("No calibration cache.")
+            return False
+        markers = self.detect_table.expected_markers
+        if not self.calibration.matches(video_size=self.video_size,
+                                        markers=markers):
+            self.logger.info("Calibration cache is for another setup.")
+            return False
+        if not self.translator.plausible(self.calibration.world_to_frame):
+            self.logger.info("Calibration cache is implausible.")
+            return False
+
+        previous = self._capture()
+        self.calibration.apply(translator=self.translator,
+                               color_ranges=self.color_ranges)
+        with self.detect_table.vision_query_context as context:
+            result = context.query(VerifyPositionQuery(
+                self.detect_table.color_range, markers))
+        if result == VerifyPositionQuery.SUCCESS:
+            self.logger.info("Calibration restored.")
+            return True
+
+        self.logger.info("Table does not match the calibration cache.")
+        previous.apply(translator=self.translator,
+                       color_ranges=self.color_ranges)
+        return False
+
+    def save(self):
+        if not self.calibrated or not self.path:
+            return
+        self._capture().save(self.path)
+        self.logger.info("Calibration saved to {path}.".format(
+            path=self.path))
+
+    def _done(self, result):
+        if result != DetectTableHandler.SUCCESS:
+            return self.FAIL
+        self.calibrated = True
+        self.save()
+        return self.SUCCESS
+
+    def _capture(self) -> Calibration:
+        cached = self.calibration
+        latency = self.latency
+        if latency is None and cached is not None:
+            latency = cached.latency
+        calibration = Calibration.capture(
+            translator=self.translator,
+            color_ranges=self.color_ranges,
+            markers=self.detect_table.expected_markers,
+            video_size=self.video_size,
+            latency=latency,
+            link_stats=self.link.stats() if self.link is not None else None)
+        if calibration.link_rtt is None and cached is not None:
+            calibration = calibration._replace(
+                link_rtt=cached.link_rtt, link_jitter=cached.link_jitter)
+        return calibration
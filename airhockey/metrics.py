@@ -0,0 +1,92 @@
+import time
+from contextlib import contextmanager
+from threading import Lock
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+
+GRAB = "grab"
+HSV = "hsv"
+DETECT = "detect"
+TRAJECTORY = "trajectory"
+SEND = "send"
+END_TO_END = "end_to_end"
+RTT = "rtt"
+
+STAGES = [GRAB, HSV, DETECT, TRAJECTORY, SEND, END_TO_END, RTT]
+
+
+class LatencyStats(object):
+    """
+    Keeps the latest samples of every pipeline stage in fixed-size buffers
+    and reports their percentiles in milliseconds.
+    """
+
+    def __init__(self, window: int = 4096):
+        self.window = window
+        self._samples: Dict[str, np.ndarray] = {}
+        self._counts: Dict[str, int] = {}
+        self._lock = Lock()
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = np.zeros(self.window)
+                self._samples[stage] = samples
+                self._counts[stage] = 0
+            count = self._counts[stage]
+            samples[count % self.window] = seconds
+            self._counts[stage] = count + 1
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(stage, time.monotonic() - started)
+
+    def count(self, stage: str) -> int:
+        return self._counts.get(stage, 0)
+
+    def percentiles(self, stage: str) -> Optional[Dict[str, float]]:
+        with self._lock:
+            count = self._counts.get(stage, 0)
+            if count == 0:
+                return None
+            samples = self._samples[stage][:min(count, self.window)] * 1000
+
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        return {
+            "count": count,
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+            "max": float(samples.max()),
+        }
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        stages = [s for s in STAGES if s in self._counts] + \
+            [s for s in self._counts if s not in STAGES]
+        result = {}
+        for stage in stages:
+            p = self.percentiles(stage)
+            if p is not None:
+                result[stage] = p
+        return result
+
+    def log_summary(self, logger):
+        for stage, p in self.summary().items():
+            logger.info(
+                "Latency {stage}: p50={p50:.2f}ms p95={p95:.2f}ms "
+                "p99={p99:.2f}ms max={max:.2f}ms ({count} samples)".format(
+                    stage=stage, **p))
+
+    def reset(self):
+        with self._lock:
+            self._samples = {}
+            self._counts = {}
+
+
+latency = LatencyStats()
@@ -0,0 +1,128 @@
+import collections
+import logging
+import threading
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+
+class QueueClosed(Exception):
+    pass
+
+
+class LatestQueue(object):
+    """
+    Bounded queue between pipeline stages that drops the oldest item when
+    full, so a slow consumer always works on the latest data instead of a
+    growing backlog.
+    """
+
+    def __init__(self, maxsize: int = 1):
+        self._items: collections.deque = collections.deque(maxlen=maxsize)
+        self._condition = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self._condition:
+            if self._closed:
+                raise QueueClosed()
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._condition.notify()
+
+    def get(self, timeout: Optional[float] = None):
+        """
+        Returns the oldest item, None when the timeout runs out. Raises
+        QueueClosed once the queue is closed and drained.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._items or self._closed, timeout)
+            if self._items:
+                return self._items.popleft()
+            if self._closed:
+                raise QueueClosed()
+            return None
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class Pipeline(object):
+    """
+    Runs source in the calling thread and every stage in its own thread,
+    connected by LatestQueues. Each stage gets the output of the previous
+    one; returning None passes nothing on. The pipeline runs until stop()
+    is called or a stage raises, the exception is then re-raised by run().
+    """
+
+    def __init__(
+            self,
+            source: Callable[[], Any],
+            stages: Sequence[Tuple[str, Callable[[Any], Any]]],
+            queue_size: int = 1
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.source = source
+        self.stages = list(stages)
+        self.queues = [LatestQueue(queue_size) for _ in self.stages]
+        self._stopped = threading.Event()
+        self._errors: List[BaseException] = []
+
+    def run(self):
+        threads = [
+            threading.Thread(target=self._run_stage, args=(index,),
+                             name=name, daemon=True)
+            for index, (name, _) in enumerate(self.stages)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            while not self._stopped.is_set():
+                item = self.source()
+                if item is not None and self.queues:
+                    self.queues[0].put(item)
+        except QueueClosed:
+            pass
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self.stop()
+            for thread in threads:
+                thread.join()
+
+        for name, queue in zip(self.stages, self.queues):
+            if queue.dropped:
+                self.logger.info("Stage %s skipped %s stale items",
+                                 name[0], queue.dropped)
+        if self._errors:
+            raise self._errors[0]
+
+    def stop(self):
+        self._stopped.set()
+        for queue in self.queues:
+            queue.close()
+
+    def _run_stage(self, index: int):
+        _, function = self.stages[index]
+        source = self.queues[index]
+        target = self.queues[index + 1] \
+            if index + 1 < len(self.queues) else None
+        try:
+            while True:
+                item = source.get()
+                if item is None:
+                    continue
+                result = function(item)
+                if result is not None and target is not None:
+                    target.put(result)
+        except QueueClosed:
+            pass
+        except BaseException as e:
+            self._fail(e)
+
+    def _fail(self, error: BaseException):
+        self._errors.append(error)
+        self.stop()
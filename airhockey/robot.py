@@ -1,31 +1,403 @@
+import collections
+import logging
+import math
+import select
 import socket
 import struct
+import threading
+import time
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from airhockey import vecmath
+from airhockey.metrics import latency, SEND, END_TO_END, RTT
+
+LEGACY = "legacy"
+PLANS = "plans"
+
+PLAN_MAGIC = b"AH"
+PLAN_VERSION = 1
+PLAN_HEADER = struct.Struct("<2sBxIdH")
+WAYPOINT = struct.Struct("<iiff")
+MAX_WAYPOINTS = 64
+
+
+class Waypoint(NamedTuple):
+    position: Tuple[float, float]
+    # Seconds after the plan was sent to arrive at the position, 0 for as
+    # soon as possible.
+    time: float = 0.0
+    # Speed limit on the way to the position in world units per second,
+    # 0 for the robot maximum.
+    max_speed: float = 0.0
+
+
+class Plan(NamedTuple):
+    sequence: int
+    # time.monotonic() of the sender when the plan was sent
+    timestamp: float
+    waypoints: List[Waypoint]
+
+
+def encode_plan(plan: Plan) -> bytes:
+    """
+    Packs a plan into a datagram: a header with the magic, protocol
+    version, sequence number, send timestamp and number of waypoints,
+    followed by the waypoints as int32 world coordinates and float32 time
+    and speed limit, all little-endian.
+    """
+    if not 0 < len(plan.waypoints) <= MAX_WAYPOINTS:
+        raise ValueError(
+            f"A plan needs 1 to {MAX_WAYPOINTS} waypoints")
+    return PLAN_HEADER.pack(PLAN_MAGIC, PLAN_VERSION, plan.sequence,
+                            plan.timestamp, len(plan.waypoints)) + \
+        b"".join(WAYPOINT.pack(int(w.position[0]), int(w.position[1]),
+                               w.time, w.max_speed)
+                 for w in plan.waypoints)
+
+
+def decode_plan(message: bytes) -> Plan:
+    if len(message) < PLAN_HEADER.size:
+        raise ValueError("Message is too short for a plan")
+    magic, version, sequence, timestamp, count = \
+        PLAN_HEADER.unpack_from(message)
+    if magic != PLAN_MAGIC:
+        raise ValueError("Message is not a plan")
+    if version != PLAN_VERSION:
+        raise ValueError(f"Plan version {version} is not supported")
+    if len(message) != PLAN_HEADER.size + count * WAYPOINT.size:
+        raise ValueError("Plan length does not match its waypoints")
+    waypoints = [
+        Waypoint((x, y), t, max_speed) for x, y, t, max_speed in
+        WAYPOINT.iter_unpack(message[PLAN_HEADER.size:])]
+    return Plan(sequence, timestamp, waypoints)
+
+
+class LinkStats(NamedTuple):
+    # Seconds, averaged over the answered pings of the window.
+    rtt: Optional[float]
+    # Mean difference of consecutive round trip times in seconds.
+    jitter: Optional[float]
+    # Fraction of the pings of the window that were not answered.
+    loss: float
+    # Seconds since the last answered ping.
+    silence: float
+    pings: int
+
+
+class RobotLink(object):
+    """
+    Long-lived UDP session with the robot. Robots sending through the link
+    share its socket, and a background heartbeat pings the robot every
+    interval seconds on it, keeping round trip time, jitter and loss over
+    the last window pings.
+
+    The link is healthy once a ping was answered and while loss, average
+    round trip time and silence stay within max_loss, max_rtt and
+    max_silence. Callbacks passed to on_change are called from the
+    heartbeat thread with the new health.
+    """
+
+    def __init__(
+            self,
+            *,
+            host,
+            port,
+            interval: float = 0.1,
+            timeout: float = 0.25,
+            window: int = 50,
+            max_loss: float = 0.3,
+            max_rtt: float = 0.05,
+            max_silence: float = 1.0
+    ):
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.timeout = timeout
+        self.max_loss = max_loss
+        self.max_rtt = max_rtt
+        self.max_silence = max_silence
+        self.logger = logging.getLogger(__name__)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.healthy = False
+        self.pings = 0
+        self._results: collections.deque = collections.deque(maxlen=window)
+        self._last_answer = time.monotonic()
+        self._listeners: List[Callable[[bool], None]] = []
+        self._lock = threading.Lock()
+        self._health_changed = threading.Condition(self._lock)
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def on_change(self, callback: Callable[[bool], None]):
+        self._listeners.append(callback)
+
+    def start(self):
+        self._last_answer = time.monotonic()
+        self._thread = threading.Thread(target=self._heartbeat,
+                                        name="robot-link", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.sock.close()
+
+    def wait_healthy(self, timeout: Optional[float] = None) -> bool:
+        with self._health_changed:
+            return self._health_changed.wait_for(lambda: self.healthy,
+                                                 timeout)
+
+    def stats(self) -> LinkStats:
+        with self._lock:
+            results = list(self._results)
+            pings = self.pings
+            silence = time.monotonic() - self._last_answer
+        rtts = [r for r in results if r is not None]
+        rtt = sum(rtts) / len(rtts) if rtts else None
+        jitter = sum(abs(b - a) for a, b in zip(rtts, rtts[1:])) / \
+            (len(rtts) - 1) if len(rtts) > 1 else None
+        loss = 1 - len(rtts) / len(results) if results else 0.0
+        return LinkStats(rtt, jitter, loss, silence, pings)
+
+    def log_summary(self, logger):
+        stats = self.stats()
+        logger.info(
+            "Robot link: %s pings, rtt %s, jitter %s, %.0f%% lost.",
+            stats.pings, _milliseconds(stats.rtt),
+            _milliseconds(stats.jitter), stats.loss * 100)
+
+    def _heartbeat(self):
+        while not self._stopped.is_set():
+            started = time.monotonic()
+            self._record(self._ping())
+            self._update_health()
+            self._stopped.wait(
+                max(0.0, self.interval - (time.monotonic() - started)))
+
+    def _ping(self) -> Optional[float]:
+        # Answers to pings that already timed out are dropped first, so
+        # they are not taken for the answer to this one.
+        while select.select([self.sock], [], [], 0)[0]:
+            try:
+                self.sock.recv(1024)
+            except OSError:
+                pass
+        sent = time.monotonic()
+        try:
+            self.sock.sendto(b"ping", (self.host, self.port))
+        except OSError:
+            return None
+        deadline = sent + self.timeout
+        while True:
+            left = deadline - time.monotonic()
+            if left <= 0 or not select.select([self.sock], [], [], left)[0]:
+                return None
+            try:
+                message = self.sock.recv(1024)
+            except OSError:
+                # ICMP port unreachable while nothing listens on the port.
+                continue
+            if message == b"pong airhockey":
+                return time.monotonic() - sent
+
+    def _record(self, rtt: Optional[float]):
+        with self._lock:
+            self.pings += 1
+            self._results.append(rtt)
+            if rtt is not None:
+                self._last_answer = time.monotonic()
+        if rtt is not None:
+            latency.record(RTT, rtt)
+
+    def _update_health(self):
+        stats = self.stats()
+        healthy = stats.rtt is not None and stats.loss <= self.max_loss \
+            and stats.rtt <= self.max_rtt and stats.silence <= self.max_silence
+        if healthy == self.healthy:
+            return
+        with self._health_changed:
+            self.healthy = healthy
+            self._health_changed.notify_all()
+        if healthy:
+            self.logger.info("Robot link is up, rtt %.1fms.", stats.rtt * 1000)
+        else:
+            self.logger.warning(
+                "Robot link degraded: rtt %s, loss %.0f%%, silent %.1fs.",
+                _milliseconds(stats.rtt), stats.loss * 100, stats.silence)
+        for callback in self._listeners:
+            callback(healthy)
+
+
+def _milliseconds(seconds: Optional[float]) -> str:
+    return "-" if seconds is None else "{:.1f}ms".format(seconds * 1000)
 
 
 class Robot(object):
-    def __init__(self, *, host, port):
+    link: Optional[RobotLink] = None
+
+    def __init__(
+            self,
+            *,
+            host,
+            port,
+            protocol: str = LEGACY,
+            link: Optional[RobotLink] = None
+    ):
+        """
+        protocol: LEGACY sends every move as a bare "<ii" datagram, PLANS
+        sends numbered and timestamped waypoint plans (see encode_plan).
+        link: send through the socket of the robot link instead of opening
+        one for every session.
+        """
+        if protocol not in (LEGACY, PLANS):
+            raise ValueError(f"Unknown robot protocol {protocol}")
         self.host = host
         self.port = port
-        self.destination = None
+        self.protocol = protocol
+        self.link = link
+        self.sequence = 0
+        self.destination: Optional[Tuple[float, float]] = None
+        # Sequence number of the frame the last move was decided on.
+        self.frame_sequence: Optional[int] = None
         self.can_move = False
 
     def __enter__(self):
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if self.link is not None:
+            self.sock = self.link.sock
+        else:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.can_move = True
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.can_move = False
-        self.sock.close()
+        if self.link is None:
+            self.sock.close()
 
     def delta(self, delta):
         pass
 
-    def move(self, dst):
+    def flush(self, force: bool = False):
+        """
+        Sends a move held back by the robot, if any. A robot holding moves
+        to cap its send rate keeps it until that allows another send,
+        unless forced.
+        """
+
+    def move(
+            self,
+            dst,
+            frame_timestamp: Optional[float] = None,
+            frame_sequence: Optional[int] = None
+    ):
+        """
+        Sends the pusher to dst. frame_timestamp and frame_sequence are the
+        capture time and sequence number of the frame the move was decided
+        on, the timestamp is used for latency accounting.
+        """
+        self.follow([Waypoint(dst)], frame_timestamp, frame_sequence)
+
+    def follow(
+            self,
+            waypoints: Sequence[Waypoint],
+            frame_timestamp: Optional[float] = None,
+            frame_sequence: Optional[int] = None
+    ):
+        """
+        Sends the pusher through the waypoints. The legacy protocol has no
+        plans, only the first waypoint is sent.
+        """
         if not self.can_move:
             raise RuntimeError(
                 'Cannot move robot when the context is not active')
-        x, y = dst
-        self.destination = dst
-        self.sock.sendto(
-            struct.pack('<ii', int(x), int(y)), (self.host, self.port))
+        self.destination = waypoints[-1].position
+        self.frame_sequence = frame_sequence
+        if self.protocol == PLANS:
+            self.sequence += 1
+            message = encode_plan(
+                Plan(self.sequence, time.monotonic(), list(waypoints)))
+        else:
+            x, y = waypoints[0].position
+            message = struct.pack('<ii', int(x), int(y))
+        with latency.measure(SEND):
+            self.sock.sendto(message, (self.host, self.port))
+        if frame_timestamp is not None:
+            latency.record(END_TO_END, time.monotonic() - frame_timestamp)
+
+
+class CoalescingRobot(Robot):
+    """
+    Robot that skips redundant moves, plans are compared by their final
+    destination. A destination closer than min_delta to the last one sent
+    is dropped, and moves are sent at most max_rate
+    times per second, except that a destination at least significant_delta
+    away from the last one sent goes out immediately. Counts the moves that
+    were sent and suppressed.
+    """
+
+    def __init__(
+            self,
+            *,
+            host,
+            port,
+            protocol: str = LEGACY,
+            link: Optional[RobotLink] = None,
+            min_delta: float = 5.0,
+            significant_delta: float = 50.0,
+            max_rate: Optional[float] = 100.0,
+            clock: Callable[[], float] = time.monotonic
+    ):
+        super().__init__(host=host, port=port, protocol=protocol, link=link)
+        self.min_delta = min_delta
+        self.significant_delta = significant_delta
+        self.min_interval = 1 / max_rate if max_rate else 0.0
+        self.clock = clock
+        self.sent = 0
+        self.suppressed = 0
+        # Held back waypoints, frame sequence and when they were held.
+        self.pending: Optional[Tuple[List[Waypoint], Optional[int],
+                                     float]] = None
+        self._last_sent_at = -math.inf
+
+    def follow(
+            self,
+            waypoints: Sequence[Waypoint],
+            frame_timestamp: Optional[float] = None,
+            frame_sequence: Optional[int] = None
+    ):
+        dst = waypoints[-1].position
+        now = self.clock()
+        if self.destination is not None:
+            delta = vecmath.distance(dst, self.destination)
+            if delta < self.min_delta or (
+                    delta < self.significant_delta and
+                    now - self._last_sent_at < self.min_interval):
+                self.suppressed += 1
+                self.pending = (list(waypoints), frame_sequence, now) \
+                    if delta >= self.min_delta else None
+                return
+        super().follow(waypoints, frame_timestamp, frame_sequence)
+        self.sent += 1
+        self.pending = None
+        self._last_sent_at = now
+
+    def flush(self, force: bool = False):
+        if self.pending is None:
+            return
+        now = self.clock()
+        if not force and now - self._last_sent_at < self.min_interval:
+            return
+        waypoints, frame_sequence, held_at = self.pending
+        self.pending = None
+        # Waypoint times count from sending, the hold has used up part of
+        # them.
+        waypoints = [w._replace(time=max(w.time - (now - held_at), 0.0))
+                     for w in waypoints]
+        # The age of the frame says nothing about the pipeline when the
+        # move was held back, it is left out of END_TO_END.
+        super().follow(waypoints, frame_sequence=frame_sequence)
+        self.sent += 1
+        self._last_sent_at = now
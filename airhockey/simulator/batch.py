@@ -0,0 +1,318 @@
+import argparse
+import itertools
+import math
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from airhockey.simulator.physics import (
+    DAMPING, GOAL_WIDTH, PUCK_RADIUS, PUSHER_RADIUS, PUSHER_SPEED,
+    RESTITUTION, SERVE_SPEED, bounce, decay, in_goal_mouth)
+from airhockey.strategy import InterceptionRules
+from airhockey.trajectory import interception_points
+
+
+class BatchResult(NamedTuple):
+    episodes: int
+    hits: int
+    goals_conceded: int
+    # Seconds from the serve to the first hit, one per hit episode.
+    intercept_times: np.ndarray
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.episodes if self.episodes else 0.0
+
+    @property
+    def conceded_rate(self) -> float:
+        return self.goals_conceded / self.episodes if self.episodes else 0.0
+
+    def summary(self) -> Dict:
+        times = self.intercept_times
+        return dict(
+            episodes=self.episodes,
+            hit_rate=self.hit_rate,
+            conceded_rate=self.conceded_rate,
+            intercept_p50=float(np.median(times)) if len(times) else None,
+            intercept_p95=float(np.percentile(times, 95))
+            if len(times) else None,
+        )
+
+    @classmethod
+    def merge(cls, results: List["BatchResult"]) -> "BatchResult":
+        return cls(
+            episodes=sum(r.episodes for r in results),
+            hits=sum(r.hits for r in results),
+            goals_conceded=sum(r.goals_conceded for r in results),
+            intercept_times=np.concatenate(
+                [r.intercept_times for r in results]))
+
+
+class BatchSimulation(object):
+    """
+    Plays many independent serves at once, each one episode of a puck
+    served towards the robot goal. The table physics is the one of
+    TableSimulation on arrays. The pusher is driven by InterceptionRules
+    from trajectory.interception_points on the puck state seen latency
+    seconds ago and, like the plans of InterceptionStrategy, is due at the
+    interception point margin seconds ahead of the puck.
+
+    An episode ends with the first hit of the puck, a conceded goal or
+    after duration seconds.
+    """
+
+    def __init__(
+            self,
+            *,
+            episodes: int = 1000,
+            table_size: Tuple[float, float] = (1200, 600),
+            puck_radius: float = PUCK_RADIUS,
+            pusher_radius: float = PUSHER_RADIUS,
+            goal_width: float = GOAL_WIDTH,
+            restitution: float = RESTITUTION,
+            damping: float = DAMPING,
+            pusher_speed: float = PUSHER_SPEED,
+            serve_speed: Tuple[float, float] = SERVE_SPEED,
+            fps: float = 60,
+            latency: float = 0.0,
+            latency_compensation: float = 0.0,
+            margin: float = 0.1,
+            min_speed: float = 100.0,
+            noise: float = 0.0,
+            duration: float = 3.0,
+            seed=None
+    ):
+        """
+        latency: seconds from the table state to the decision acting on it.
+        latency_compensation: seconds the puck is extrapolated ahead, like
+        Trajectory(latency=...).
+        margin: seconds the pusher is due at the interception point ahead
+        of the puck, like InterceptionStrategy(margin=...).
+        noise: standard deviation of the observed positions.
+        """
+        self.episodes = episodes
+        self.table_size = table_size
+        self.puck_radius = puck_radius
+        self.pusher_radius = pusher_radius
+        self.goal_width = goal_width
+        self.restitution = restitution
+        self.damping = damping
+        self.pusher_speed = pusher_speed
+        self.serve_speed = serve_speed
+        self.fps = fps
+        self.latency = latency
+        self.latency_compensation = latency_compensation
+        self.margin = margin
+        self.min_speed = min_speed
+        self.noise = noise
+        self.duration = duration
+        self.random = np.random.default_rng(seed)
+
+    def run(self, rules: InterceptionRules) -> BatchResult:
+        n = self.episodes
+        width, height = self.table_size
+        dt = 1 / self.fps
+
+        puck, puck_velocity = self._serve(n)
+        pusher = np.tile([self.pusher_radius * 2, height / 2], (n, 1))
+        target = pusher.copy()
+        # Simulation time the pusher is due at its target.
+        arrive_at = np.zeros(n)
+        active = np.ones(n, dtype=bool)
+        hit_time = np.full(n, np.nan)
+        conceded = np.zeros(n, dtype=bool)
+
+        lag = int(round(self.latency * self.fps))
+        history = [(puck.copy(), puck_velocity.copy(), pusher.copy())] * \
+            (lag + 1)
+
+        time = 0.0
+        while time < self.duration and active.any():
+            seen_puck, seen_velocity, seen_pusher = history[0]
+            self._decide(rules, seen_puck, seen_velocity, seen_pusher,
+                         target, arrive_at, active, time)
+
+            fastest = max(self.pusher_speed,
+                          float(np.hypot(*puck_velocity.T).max()))
+            substeps = max(1, math.ceil(fastest * dt / (self.puck_radius / 2)))
+            h = dt / substeps
+            for _ in range(substeps):
+                pusher_velocity = self._move_pusher(
+                    pusher, target, arrive_at - time, h)
+                goals = self._move_puck(puck, puck_velocity, h) & active
+                conceded |= goals
+                active &= ~goals
+                hits = self._collide(puck, puck_velocity, pusher,
+                                     pusher_velocity) & active
+                hit_time[hits] = time
+                active &= ~hits
+                time += h
+            puck_velocity[~active] = 0
+
+            history.append((puck.copy(), puck_velocity.copy(), pusher.copy()))
+            history.pop(0)
+
+        hit = ~np.isnan(hit_time)
+        return BatchResult(episodes=n, hits=int(hit.sum()),
+                           goals_conceded=int(conceded.sum()),
+                           intercept_times=hit_time[hit])
+
+    def _serve(self, n: int):
+        width, height = self.table_size
+        margin = self.puck_radius * 2
+        start = np.stack([
+            self.random.uniform(width * 0.6, width - margin, n),
+            self.random.uniform(margin, height - margin, n)], axis=-1)
+        aim = np.stack([np.zeros(n), self.random.uniform(0, height, n)],
+                       axis=-1)
+        speed = self.random.uniform(*self.serve_speed, n)
+        direction = aim - start
+        direction /= np.hypot(*direction.T)[:, None]
+        return start, direction * speed[:, None]
+
+    def _decide(self, rules, puck, velocity, pusher, target, arrive_at,
+                active, time):
+        width, height = self.table_size
+        if self.noise:
+            puck = puck + self.random.normal(0, self.noise, puck.shape)
+            pusher = pusher + self.random.normal(0, self.noise, pusher.shape)
+        position = puck + velocity * self.latency_compensation
+        position = np.clip(position, 0, self.table_size)
+
+        xs, ys, times = interception_points(position, velocity,
+                                            self.table_size,
+                                            puck_radius=self.puck_radius)
+        moving = np.hypot(*velocity.T) >= self.min_speed
+        times[~moving] = np.nan
+        destinations, arrivals, has = rules.waypoints(
+            puck, pusher, xs, ys, times, self.margin)
+        move = has & active
+        r = self.pusher_radius
+        target[move] = np.clip(destinations[move], (r, r),
+                               (width / 2 - r, height - r))
+        arrive_at[move] = time + arrivals[move]
+
+    def _move_pusher(self, pusher, target, remaining, dt):
+        delta = target - pusher
+        distance = np.hypot(*delta.T)
+        # Like TableSimulation, the pusher paces itself to arrive on time.
+        speed = np.where(remaining > dt,
+                         np.minimum(self.pusher_speed,
+                                    distance / np.maximum(remaining, dt)),
+                         self.pusher_speed)
+        reach = speed * dt
+        scale = np.where(distance <= reach, 1.0,
+                         reach / np.maximum(distance, 1e-9))
+        step = delta * scale[:, None]
+        pusher += step
+        return step / dt
+
+    def _move_puck(self, puck, velocity, dt):
+        width, height = self.table_size
+        r = self.puck_radius
+        velocity *= decay(dt, self.damping)
+        puck += velocity * dt
+        puck[:, 1], velocity[:, 1] = bounce(
+            puck[:, 1], velocity[:, 1], r, height - r, self.restitution)
+
+        goals = (puck[:, 0] < r) & \
+            in_goal_mouth(puck[:, 1], height, self.goal_width, r)
+        puck[:, 0], velocity[:, 0] = bounce(
+            puck[:, 0], velocity[:, 0], r, width - r, self.restitution)
+        return goals
+
+    def _collide(self, puck, velocity, pusher, pusher_velocity):
+        delta = puck - pusher
+        distance = np.hypot(*delta.T)
+        reach = self.puck_radius + self.pusher_radius
+        touching = (distance < reach) & (distance > 0)
+        if not touching.any():
+            return touching
+
+        normal = delta[touching] / distance[touching, None]
+        puck[touching] = pusher[touching] + normal * reach
+        relative = velocity[touching] - pusher_velocity[touching]
+        approaching = np.sum(relative * normal, axis=1)
+        impulse = (1 + self.restitution) * np.minimum(approaching, 0)
+        velocity[touching] -= impulse[:, None] * normal
+        hits = np.zeros_like(touching)
+        hits[touching] = approaching < 0
+        return hits
+
+
+def _run_chunk(options: Dict, rules: InterceptionRules) -> BatchResult:
+    return BatchSimulation(**options).run(rules)
+
+
+def run_batch(
+        rules: InterceptionRules,
+        *,
+        episodes: int = 1000,
+        workers: int = 1,
+        seed: Optional[int] = None,
+        **options
+) -> BatchResult:
+    """
+    Runs BatchSimulation split into a chunk per worker process and merges
+    the results.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    sizes = [episodes // workers + (i < episodes % workers)
+             for i in range(workers)]
+    chunks = [dict(options, episodes=size, seed=s)
+              for size, s in zip(sizes, seeds) if size]
+    if workers == 1:
+        return BatchResult.merge([_run_chunk(c, rules) for c in chunks])
+    with ProcessPoolExecutor(workers) as executor:
+        return BatchResult.merge(list(executor.map(
+            _run_chunk, chunks, [rules] * len(chunks))))
+
+
+def print_report(rows: List[Tuple[InterceptionRules, Dict]]):
+    print("{:>9}{:>6}{:>7}{:>10}{:>10}{:>11}{:>11}".format(
+        "distance", "gain", "index", "hit", "conceded", "p50 s", "p95 s"))
+    for rules, s in rows:
+        print("{:>9.0f}{:>6.1f}{:>7}{:>10.1%}{:>10.1%}{:>11}{:>11}".format(
+            rules.strike_distance, rules.strike_gain,
+            rules.interception_index, s["hit_rate"], s["conceded_rate"],
+            _seconds(s["intercept_p50"]), _seconds(s["intercept_p95"])))
+
+
+def _seconds(value: Optional[float]) -> str:
+    return "-" if value is None else "{:.3f}".format(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="airhockey.simulator.batch")
+    parser.add_argument("--episodes", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--latency-compensation", type=float, default=0.0)
+    parser.add_argument("--margin", type=float, default=0.1)
+    parser.add_argument("--noise", type=float, default=0.0)
+    parser.add_argument("--strike-distance", type=float, nargs="+",
+                        default=[InterceptionRules().strike_distance])
+    parser.add_argument("--strike-gain", type=float, nargs="+",
+                        default=[InterceptionRules().strike_gain])
+    parser.add_argument("--interception-index", type=int, nargs="+",
+                        default=[InterceptionRules().interception_index])
+    args = parser.parse_args(argv)
+
+    rows = []
+    for distance, gain, index in itertools.product(
+            args.strike_distance, args.strike_gain,
+            args.interception_index):
+        rules = InterceptionRules(distance, gain, index)
+        result = run_batch(rules, episodes=args.episodes,
+                           workers=args.workers, seed=args.seed,
+                           latency=args.latency,
+                           latency_compensation=args.latency_compensation,
+                           margin=args.margin, noise=args.noise)
+        rows.append((rules, result.summary()))
+    print_report(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import logging
+import select
+import socket
+import struct
+import threading
+from typing import Optional
+
+from airhockey.robot import PLAN_MAGIC, decode_plan
+from airhockey.simulator.physics import TableSimulation
+
+# Plans this many sequence numbers behind the newest one are stale, ones
+# further behind come from a restarted sender.
+STALE_WINDOW = 1024
+
+
+class SimulatorEndpoint(object):
+    """
+    UDP endpoint standing in for the robot: answers b"ping" with
+    b"pong airhockey" and moves the simulated pusher to the "<ii" world
+    coordinates of the legacy protocol or through the waypoints of plans.
+    Plans arriving out of order are dropped.
+
+    Datagrams are either handled by the endpoint thread, once start() was
+    called, or by poll(); an endpoint serves in one of the two modes only.
+    """
+
+    def __init__(
+            self,
+            simulation: TableSimulation,
+            *,
+            host: str = "localhost",
+            port: int = 1133
+    ):
+        self.simulation = simulation
+        self.logger = logging.getLogger(__name__)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.sock.bind((host, port))
+        self.address = self.sock.getsockname()
+        self.moves_received = 0
+        self.stale_plans = 0
+        self.last_sequence: Optional[int] = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._polled = False
+
+    def start(self):
+        assert not self._polled, "endpoint is already polled"
+        self._thread = threading.Thread(target=self._serve,
+                                        name="simulator-endpoint",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.sock.close()
+
+    def poll(self, timeout: float = 0.0):
+        """
+        Handles every datagram that has arrived, waiting up to timeout for
+        the first one.
+        """
+        assert self._thread is None, "endpoint thread is running"
+        self._polled = True
+        self._receive(timeout)
+
+    def advance(self, dt: float):
+        """
+        Steps the simulation by dt. A polled endpoint handles the datagrams
+        that arrived first, so the robot reacts in lockstep, the endpoint
+        thread applies them between steps.
+        """
+        if self._thread is None:
+            self.poll()
+        with self._lock:
+            self.simulation.step(dt)
+
+    def _receive(self, timeout: float):
+        r, _, _ = select.select([self.sock], [], [], timeout)
+        if not r:
+            return
+        with self._lock:
+            while True:
+                try:
+                    message, address = self.sock.recvfrom(1024)
+                except (BlockingIOError, OSError):
+                    return
+                self.handle(message, address)
+
+    def handle(self, message: bytes, address):
+        if message == b"ping":
+            self.sock.sendto(b"pong airhockey", address)
+        elif len(message) == 8:
+            x, y = struct.unpack("<ii", message)
+            self.simulation.set_pusher_target((x, y))
+            self.moves_received += 1
+        elif message.startswith(PLAN_MAGIC):
+            try:
+                plan = decode_plan(message)
+            except ValueError as e:
+                self.logger.warning("Bad plan from %s: %s", address, e)
+                return
+            if self.last_sequence is not None and \
+                    0 <= self.last_sequence - plan.sequence < STALE_WINDOW:
+                self.stale_plans += 1
+                return
+            self.last_sequence = plan.sequence
+            self.simulation.follow_plan(
+                [(w.position, w.time, w.max_speed) for w in plan.waypoints])
+            self.moves_received += 1
+        else:
+            self.logger.warning("Unknown message from %s: %r",
+                                address, message)
+
+    def _serve(self):
+        while not self._stopped.is_set():
+            self._receive(0.1)
@@ -0,0 +1,215 @@
+import math
+import random
+from typing import List, Optional, Sequence, Tuple
+
+Vector = Tuple[float, float]
+
+PUCK_RADIUS = 25
+PUSHER_RADIUS = 25
+GOAL_WIDTH = 200
+RESTITUTION = 0.9
+DAMPING = 0.9
+PUSHER_SPEED = 3000
+SERVE_SPEED = (600, 1500)
+
+
+def decay(dt: float, damping: float) -> float:
+    """
+    Share of the puck velocity left after dt seconds of linear damping.
+    """
+    return 1 / (1 + dt * damping)
+
+
+def bounce(position, velocity, low, high, restitution):
+    """
+    Reflects a coordinate that went past the rail at low or high back onto
+    the table and reverses its velocity, keeping the restitution share of
+    the speed. Works on floats and on arrays alike.
+    """
+    below, above = position < low, position > high
+    position = position + 2 * (below * (low - position) +
+                               above * (high - position))
+    velocity = velocity * (1 - (below | above) * (1 + restitution))
+    return position, velocity
+
+
+def in_goal_mouth(y, height: float, goal_width: float, radius: float):
+    return abs(y - height / 2) < goal_width / 2 - radius
+
+
+class TableSimulation(object):
+    """
+    Air hockey table in world units (the same 1200x600 table the vision
+    works with) with the robot defending the goal at x = 0.
+
+    The puck slides with linear damping and bounces off the rails. The
+    robot pusher follows a plan of timed waypoints at a limited speed and
+    is not deflected by the puck. A puck that enters a goal, or stalls,
+    ends the rally and a new one is served towards the robot from the far
+    half.
+    """
+
+    def __init__(
+            self,
+            *,
+            table_size: Tuple[float, float] = (1200, 600),
+            puck_radius: float = PUCK_RADIUS,
+            pusher_radius: float = PUSHER_RADIUS,
+            goal_width: float = GOAL_WIDTH,
+            restitution: float = RESTITUTION,
+            damping: float = DAMPING,
+            pusher_speed: float = PUSHER_SPEED,
+            serve_speed: Tuple[float, float] = SERVE_SPEED,
+            stall_time: float = 2.0,
+            seed: Optional[int] = None
+    ):
+        self.table_size = table_size
+        self.puck_radius = puck_radius
+        self.pusher_radius = pusher_radius
+        self.goal_width = goal_width
+        self.restitution = restitution
+        self.damping = damping
+        self.pusher_speed = pusher_speed
+        self.serve_speed = serve_speed
+        self.stall_time = stall_time
+        self.random = random.Random(seed)
+
+        width, height = table_size
+        self.time = 0.0
+        self.pusher_position: Vector = (pusher_radius * 2, height / 2)
+        self.pusher_velocity: Vector = (0.0, 0.0)
+        self.pusher_target: Vector = self.pusher_position
+        # (target, simulation time to arrive, speed limit or 0)
+        self.plan: List[Tuple[Vector, float, float]] = []
+        self.puck_position: Vector = (width * 0.75, height / 2)
+        self.puck_velocity: Vector = (0.0, 0.0)
+
+        self.rallies = 0
+        self.hits = 0
+        self.goals_conceded = 0
+        self.goals_scored = 0
+        self._stalled_since: Optional[float] = None
+        self._last_hit = -math.inf
+        self.serve()
+
+    def set_pusher_target(self, target: Vector):
+        self.follow_plan([(target, 0.0, 0.0)])
+
+    def follow_plan(self, waypoints: Sequence[Tuple[Vector, float, float]]):
+        """
+        Replaces the pusher plan with waypoints of (target, seconds from now
+        to arrive, speed limit). The pusher moves at the speed that gets it
+        to each target on time, within the limits.
+        """
+        width, height = self.table_size
+        r = self.pusher_radius
+        self.plan = [
+            ((min(max(x, r), width / 2 - r), min(max(y, r), height - r)),
+             self.time + t, max_speed)
+            for (x, y), t, max_speed in waypoints]
+        self.pusher_target = self.plan[0][0]
+
+    def serve(self):
+        width, height = self.table_size
+        margin = self.puck_radius * 2
+        start = (self.random.uniform(width * 0.6, width - margin),
+                 self.random.uniform(margin, height - margin))
+        aim = (0.0, self.random.uniform(0, height))
+        speed = self.random.uniform(*self.serve_speed)
+        dx, dy = aim[0] - start[0], aim[1] - start[1]
+        n = math.hypot(dx, dy)
+        self.puck_position = start
+        self.puck_velocity = (dx / n * speed, dy / n * speed)
+        self.rallies += 1
+        self._stalled_since = None
+
+    def step(self, dt: float):
+        """
+        Advances the simulation by dt seconds. Fast objects are moved in
+        substeps of at most half a puck radius.
+        """
+        fastest = max(self.pusher_speed, math.hypot(*self.puck_velocity))
+        substeps = max(1, math.ceil(fastest * dt / (self.puck_radius / 2)))
+        h = dt / substeps
+        for _ in range(substeps):
+            self._move_pusher(h)
+            self._move_puck(h)
+            self._collide()
+            self.time += h
+
+    def _move_pusher(self, dt: float):
+        x, y = self.pusher_position
+        tx, ty = self.pusher_target
+        dx, dy = tx - x, ty - y
+        distance = math.hypot(dx, dy)
+        speed = self.pusher_speed
+        if self.plan:
+            _, arrive_at, max_speed = self.plan[0]
+            if max_speed:
+                speed = min(speed, max_speed)
+            if arrive_at - self.time > dt:
+                speed = min(speed, distance / (arrive_at - self.time))
+        reach = speed * dt
+        if distance <= reach + 1e-6:
+            self.pusher_position = (tx, ty)
+            if len(self.plan) > 1:
+                self.plan.pop(0)
+                self.pusher_target = self.plan[0][0]
+        else:
+            self.pusher_position = (x + dx / distance * reach,
+                                    y + dy / distance * reach)
+        self.pusher_velocity = ((self.pusher_position[0] - x) / dt,
+                                (self.pusher_position[1] - y) / dt)
+
+    def _move_puck(self, dt: float):
+        width, height = self.table_size
+        r = self.puck_radius
+        vx, vy = self.puck_velocity
+        k = decay(dt, self.damping)
+        vx, vy = vx * k, vy * k
+        x, y = self.puck_position[0] + vx * dt, self.puck_position[1] + vy * dt
+        y, vy = bounce(y, vy, r, height - r, self.restitution)
+
+        if in_goal_mouth(y, height, self.goal_width, r):
+            if x < r:
+                self.goals_conceded += 1
+                self.serve()
+                return
+            if x > width - r:
+                self.goals_scored += 1
+                self.serve()
+                return
+        x, vx = bounce(x, vx, r, width - r, self.restitution)
+
+        self.puck_position = (x, y)
+        self.puck_velocity = (vx, vy)
+
+        if math.hypot(vx, vy) < 20:
+            if self._stalled_since is None:
+                self._stalled_since = self.time
+            elif self.time - self._stalled_since > self.stall_time:
+                self.serve()
+        else:
+            self._stalled_since = None
+
+    def _collide(self):
+        px, py = self.puck_position
+        qx, qy = self.pusher_position
+        dx, dy = px - qx, py - qy
+        distance = math.hypot(dx, dy)
+        reach = self.puck_radius + self.pusher_radius
+        if distance >= reach or distance == 0:
+            return
+
+        nx, ny = dx / distance, dy / distance
+        self.puck_position = (qx + nx * reach, qy + ny * reach)
+        vx, vy = self.puck_velocity
+        rvx = vx - self.pusher_velocity[0]
+        rvy = vy - self.pusher_velocity[1]
+        approaching = rvx * nx + rvy * ny
+        if approaching < 0:
+            impulse = (1 + self.restitution) * approaching
+            self.puck_velocity = (vx - impulse * nx, vy - impulse * ny)
+            if self.time - self._last_hit > 0.1:
+                self.hits += 1
+            self._last_hit = self.time
@@ -0,0 +1,119 @@
+import time
+from typing import Optional, Sequence, Tuple
+
+from airhockey.simulator.endpoint import SimulatorEndpoint
+from airhockey.simulator.physics import TableSimulation
+from airhockey.translate import WorldToFrameTranslator
+from airhockey.vision.color import ColorRange
+from airhockey.vision.synthetic import render_frame
+from airhockey.vision.video import Frame, FrameReader, FrameRing
+
+
+class SimulatedFrameReader(FrameReader):
+    """
+    Serves rendered frames of a TableSimulation, advancing it by 1 / fps
+    of simulated time per frame.
+
+    Without a speed every read_next steps the simulation, so it runs as
+    fast as the reader processes frames. With a speed the frames are paced
+    against the wall clock (1.0 is real time). Frame timestamps follow the
+    simulated clock, which keeps velocities and latency compensation right
+    at any speed. When an endpoint is given the simulation is stepped
+    through it: commands of a polled endpoint are applied before each step,
+    so the robot reacts in lockstep, a started endpoint applies them as
+    they arrive. Frames are rendered into a FrameRing and handed out as
+    leased views, the same way a GrabbingFrameReader does.
+    """
+
+    def __init__(
+            self,
+            simulation: TableSimulation,
+            *,
+            video_size: Tuple[int, int],
+            translator: WorldToFrameTranslator,
+            puck_color_range: ColorRange,
+            pusher_color_range: ColorRange,
+            markers_color_range: ColorRange,
+            markers: Sequence[Tuple[float, float]],
+            fps: float = 60.0,
+            speed: Optional[float] = None,
+            endpoint: Optional[SimulatorEndpoint] = None
+    ):
+        super().__init__()
+        self.simulation = simulation
+        self.video_size = video_size
+        self.translator = translator
+        self.puck_color_range = puck_color_range
+        self.pusher_color_range = pusher_color_range
+        self.markers_color_range = markers_color_range
+        self.markers = markers
+        self.fps = fps
+        self.speed = speed if speed else None
+        self.endpoint = endpoint
+        self.ring = FrameRing()
+        self.time_started = time.time()
+        self._started = time.monotonic()
+        self._frame: Optional[Frame] = None
+
+    def start(self):
+        self.time_started = time.time()
+        self._started = time.monotonic()
+        if self._frame is None:
+            self._render()
+        return self
+
+    def stop(self):
+        ...
+
+    def has_frame(self):
+        return self._frame is not None
+
+    def read(self):
+        if self._frame is None:
+            self._render()
+        return self.ring.latest().image
+
+    def read_next(
+            self,
+            sequence: int,
+            timeout: Optional[float] = None
+    ) -> Optional[Frame]:
+        if self._frame is not None and self._frame.sequence > sequence:
+            self.frames_read += 1
+            return self.ring.latest()
+
+        if self.speed is not None:
+            due = self._started + \
+                (self.simulation.time + 1 / self.fps) / self.speed
+            wait = due - time.monotonic()
+            if timeout is not None and wait > timeout:
+                time.sleep(timeout)
+                return None
+            if wait > 0:
+                time.sleep(wait)
+
+        if self.endpoint is not None:
+            self.endpoint.advance(1 / self.fps)
+        else:
+            self.simulation.step(1 / self.fps)
+        self._render()
+        self.frames_read += 1
+        return self.ring.latest()
+
+    def stream_fps(self):
+        return self.frames_grabbed / (time.time() - self.time_started)
+
+    def read_fps(self):
+        return self.frames_read / (time.time() - self.time_started)
+
+    def _render(self):
+        width, height = self.video_size
+        s = self.simulation
+        blobs = [(self.markers_color_range, m, 10) for m in self.markers]
+        blobs.append((self.puck_color_range, s.puck_position, s.puck_radius))
+        blobs.append((self.pusher_color_range, s.pusher_position,
+                      s.pusher_radius))
+        target = self.ring.acquire((height, width, 3))
+        render_frame(self.video_size, self.translator, blobs, target)
+        self._frame = self.ring.commit(self._started + s.time)
+        self.frames_grabbed += 1
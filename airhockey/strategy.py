@@ -0,0 +1,379 @@
+"""
+Game strategies: where to send the pusher given the estimated puck state.
+
+Interception lookup table files start with a fixed-size header followed by
+a little-endian float32 array of pusher targets indexed by the quantized
+puck (x, y, direction, speed), NaN where the puck is not intercepted. The
+array is memory-mapped, so a table of any size loads instantly and a
+lookup only touches the page of its cell.
+"""
+import abc
+import argparse
+import math
+import struct
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from airhockey import vecmath
+from airhockey.robot import Waypoint
+from airhockey.trajectory import Trajectory, interception_points
+
+MAGIC = b"AHLUT\0\0\0"
+VERSION = 2
+HEADER_FORMAT = "<8sIIIIIddddd"
+HEADER_SIZE = 128
+
+Position = Tuple[float, float]
+
+
+def waiting_points(xs, ys, times, index: int) -> np.ndarray:
+    """
+    Picks the index-th reached interception point (the last one when there
+    are fewer) of every puck from the NxM arrays returned by
+    trajectory.interception_points. Returns Nx2 points, NaN for pucks that
+    reach none.
+    """
+    return waiting_interceptions(xs, ys, times, index)[0]
+
+
+def waiting_interceptions(
+        xs, ys, times, index: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    waiting_points() together with the N seconds until the puck gets to
+    each point, NaN for pucks that reach none.
+    """
+    reachable = ~np.isnan(times)
+    counts = reachable.sum(axis=1)
+    picked = np.minimum(index, counts - 1)
+    rank = np.cumsum(reachable, axis=1) - 1
+    column = np.argmax(reachable & (rank == picked[:, None]), axis=1)
+    rows = np.arange(len(column))
+    points = np.stack([xs[column], ys[rows, column]], axis=-1)
+    arrivals = times[rows, column]
+    points[counts == 0] = np.nan
+    arrivals[counts == 0] = np.nan
+    return points, arrivals
+
+
+class InterceptionRules(NamedTuple):
+    """
+    How the pusher destination is picked: a puck closer than
+    strike_distance is struck by moving strike_gain times the distance
+    towards it, otherwise the pusher waits at the interception point with
+    interception_index (the last one when there are fewer).
+    """
+    strike_distance: float = 200.0
+    strike_gain: float = 4.0
+    interception_index: int = 0
+
+    def destination(
+            self,
+            puck_position: Optional[Position],
+            pusher_position: Optional[Position],
+            interception_points: Optional[List[Position]]
+    ) -> Optional[Position]:
+        waypoint = self.waypoint(
+            puck_position, pusher_position,
+            None if interception_points is None
+            else [(point, 0.0) for point in interception_points])
+        return None if waypoint is None else waypoint.position
+
+    def waypoint(
+            self,
+            puck_position: Optional[Position],
+            pusher_position: Optional[Position],
+            interceptions: Optional[List[Tuple[Position, float]]],
+            margin: float = 0.0
+    ) -> Optional[Waypoint]:
+        """
+        destination() with the time to get there, from interceptions of
+        (point, seconds until the puck gets there). The pusher is at the
+        interception point margin seconds ahead of the puck, a strike goes
+        out at once.
+        """
+        if not interceptions or not puck_position or not pusher_position:
+            return None
+        dx = puck_position[0] - pusher_position[0]
+        dy = puck_position[1] - pusher_position[1]
+        if vecmath.length((dx, dy)) < self.strike_distance:
+            return Waypoint((int(pusher_position[0] + dx * self.strike_gain),
+                             int(pusher_position[1] + dy * self.strike_gain)))
+        index = min(self.interception_index, len(interceptions) - 1)
+        point, arrival = interceptions[index]
+        return Waypoint(point, max(arrival - margin, 0.0))
+
+    def destinations(self, puck_positions, pusher_positions, xs, ys, times):
+        """
+        destination() over N pucks at once, with the interception points
+        given as returned by trajectory.interception_points. Returns Nx2
+        destinations and a mask of the pucks that have one.
+        """
+        destinations, _, has = self.waypoints(
+            puck_positions, pusher_positions, xs, ys, times)
+        return destinations, has
+
+    def waypoints(self, puck_positions, pusher_positions, xs, ys, times,
+                  margin: float = 0.0):
+        """
+        waypoint() over N pucks at once, like destinations(). Returns Nx2
+        destinations, the N seconds to get there and a mask of the pucks
+        that have one.
+        """
+        waiting, arrivals = waiting_interceptions(
+            xs, ys, times, self.interception_index)
+        delta = puck_positions - pusher_positions
+        striking = np.hypot(delta[:, 0], delta[:, 1]) < self.strike_distance
+        struck = np.trunc(pusher_positions + delta * self.strike_gain)
+        return np.where(striking[:, None], struck, waiting), \
+            np.where(striking, 0.0, np.maximum(arrivals - margin, 0.0)), \
+            ~np.isnan(waiting[:, 0])
+
+
+class Strategy(abc.ABC):
+    @abc.abstractmethod
+    def destination(
+            self,
+            trajectory: Trajectory,
+            puck_position: Optional[Position],
+            pusher_position: Optional[Position]
+    ) -> Optional[Position]:
+        """
+        Returns where to move the pusher, None to leave it be. trajectory
+        holds the puck state estimated for the moment the move happens.
+        """
+        raise NotImplementedError
+
+    def plan(
+            self,
+            trajectory: Trajectory,
+            puck_position: Optional[Position],
+            pusher_position: Optional[Position]
+    ) -> Optional[List[Waypoint]]:
+        """
+        Returns the waypoints to send the pusher through, None to leave it
+        be. Goes to destination() as soon as possible unless the strategy
+        knows when the pusher is needed.
+        """
+        destination = self.destination(trajectory, puck_position,
+                                       pusher_position)
+        if destination is None:
+            return None
+        return [Waypoint(destination)]
+
+
+class InterceptionStrategy(Strategy):
+    """
+    Solves the puck trajectory every frame. Plans get the pusher to the
+    interception point margin seconds before the puck.
+    """
+
+    def __init__(
+            self,
+            rules: InterceptionRules = InterceptionRules(),
+            *,
+            margin: float = 0.1
+    ):
+        self.rules = rules
+        self.margin = margin
+
+    def destination(self, trajectory, puck_position, pusher_position):
+        return self.rules.destination(
+            puck_position, pusher_position,
+            trajectory.calculate_interception_points())
+
+    def plan(self, trajectory, puck_position, pusher_position):
+        waypoint = self.rules.waypoint(
+            puck_position, pusher_position,
+            trajectory.calculate_interceptions(), self.margin)
+        return None if waypoint is None else [waypoint]
+
+
+class InterceptionTable(object):
+    """
+    Interception targets precomputed over a grid of puck states: position
+    cells across the workspace, direction sectors and speed bands between
+    min_speed and max_speed, for a puck of puck_radius.
+    """
+
+    def __init__(
+            self,
+            targets: np.ndarray,
+            *,
+            workspace: Tuple[float, float],
+            min_speed: float,
+            max_speed: float,
+            puck_radius: float = 0.0
+    ):
+        if targets.ndim != 5 or targets.shape[-1] != 2:
+            raise ValueError("Targets must be an X x Y x A x S x 2 array")
+        self.targets = targets
+        self.workspace = workspace
+        self.min_speed = min_speed
+        self.max_speed = max_speed
+        self.puck_radius = puck_radius
+        self.shape = targets.shape[:4]
+
+    @classmethod
+    def build(
+            cls,
+            workspace: Tuple[float, float],
+            *,
+            shape: Tuple[int, int, int, int] = (60, 30, 64, 8),
+            min_speed: float = 100.0,
+            max_speed: float = 3000.0,
+            puck_radius: float = 0.0,
+            interception_index: int = 0,
+            reaction_time: float = 0.0
+    ) -> "InterceptionTable":
+        """
+        Solves the trajectory of a puck at the center of every cell.
+        Interception points the puck reaches sooner than reaction_time are
+        skipped.
+        """
+        nx, ny, na, ns = shape
+        xs = (np.arange(nx) + 0.5) * workspace[0] / nx
+        ys = (np.arange(ny) + 0.5) * workspace[1] / ny
+        angles = (np.arange(na) + 0.5) * 2 * math.pi / na - math.pi
+        speeds = min_speed + (np.arange(ns) + 0.5) * \
+            (max_speed - min_speed) / ns
+        directions = np.stack([np.cos(angles), np.sin(angles)], axis=-1)
+        velocities = (directions[:, None, :] * speeds[None, :, None]) \
+            .reshape(-1, 2)
+
+        targets = np.empty(shape + (2,), np.float32)
+        for i, x in enumerate(xs):
+            # One row of positions at a time keeps the solver arrays small.
+            positions = np.repeat(
+                np.stack([np.full(ny, x), ys], axis=-1), len(velocities),
+                axis=0)
+            lines, crossings, times = interception_points(
+                positions, np.tile(velocities, (ny, 1)), workspace,
+                puck_radius=puck_radius)
+            times[times < reaction_time] = np.nan
+            targets[i] = waiting_points(
+                lines, crossings, times, interception_index).reshape(
+                (ny, na, ns, 2))
+        return cls(targets, workspace=workspace, min_speed=min_speed,
+                   max_speed=max_speed, puck_radius=puck_radius)
+
+    @classmethod
+    def load(
+            cls,
+            path: str,
+            *,
+            workspace: Optional[Tuple[float, float]] = None,
+            puck_radius: Optional[float] = None
+    ) -> "InterceptionTable":
+        """
+        Maps the table in path. Raises ValueError when it was built for
+        another workspace or puck radius than the given ones.
+        """
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            raise ValueError(f"{path} is not an interception table")
+        magic, version, nx, ny, na, ns, width, height, min_speed, \
+            max_speed, radius = struct.unpack_from(HEADER_FORMAT, header)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an interception table")
+        if version != VERSION:
+            raise ValueError(
+                f"Interception table version {version} is not supported")
+        if workspace is not None and \
+                (width, height) != (float(workspace[0]), float(workspace[1])):
+            raise ValueError(
+                f"{path} is built for a {width:g}x{height:g} workspace, "
+                f"not {workspace[0]:g}x{workspace[1]:g}")
+        if puck_radius is not None and radius != float(puck_radius):
+            raise ValueError(
+                f"{path} is built for a puck radius of {radius:g}, "
+                f"not {puck_radius:g}")
+        targets = np.memmap(path, dtype="<f4", mode="r", offset=HEADER_SIZE,
+                            shape=(nx, ny, na, ns, 2))
+        return cls(targets, workspace=(width, height), min_speed=min_speed,
+                   max_speed=max_speed, puck_radius=radius)
+
+    def save(self, path: str):
+        header = struct.pack(HEADER_FORMAT, MAGIC, VERSION, *self.shape,
+                             *self.workspace, self.min_speed, self.max_speed,
+                             self.puck_radius)
+        with open(path, "wb") as f:
+            f.write(header.ljust(HEADER_SIZE, b"\0"))
+            f.write(np.ascontiguousarray(self.targets, "<f4").data)
+
+    def lookup(
+            self,
+            position: Position,
+            velocity: Tuple[float, float]
+    ) -> Optional[Position]:
+        nx, ny, na, ns = self.shape
+        width, height = self.workspace
+        speed = math.hypot(velocity[0], velocity[1])
+        if speed < self.min_speed:
+            return None
+        angle = math.atan2(velocity[1], velocity[0])
+        ix = min(max(int(position[0] / width * nx), 0), nx - 1)
+        iy = min(max(int(position[1] / height * ny), 0), ny - 1)
+        ia = int((angle + math.pi) / (2 * math.pi) * na) % na
+        band = (speed - self.min_speed) / (self.max_speed - self.min_speed)
+        is_ = min(int(band * ns), ns - 1)
+        x, y = self.targets[ix, iy, ia, is_]
+        if math.isnan(x):
+            return None
+        return float(x), float(y)
+
+
+class LookupTableStrategy(Strategy):
+    """
+    Looks the interception target up in a precomputed InterceptionTable
+    instead of solving the trajectory. Striking close pucks follows the
+    rules as in InterceptionStrategy.
+    """
+
+    def __init__(
+            self,
+            table: InterceptionTable,
+            rules: InterceptionRules = InterceptionRules()
+    ):
+        self.table = table
+        self.rules = rules
+
+    def destination(self, trajectory, puck_position, pusher_position):
+        if trajectory.direction is None:
+            return None
+        target = self.table.lookup(trajectory.position, trajectory.velocity)
+        if target is None:
+            return None
+        return self.rules.destination(puck_position, pusher_position,
+                                      [target])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="airhockey.strategy")
+    parser.add_argument("output", help="interception table file to write")
+    parser.add_argument("--shape", type=int, nargs=4,
+                        default=[60, 30, 64, 8],
+                        metavar=("X", "Y", "DIRECTIONS", "SPEEDS"))
+    parser.add_argument("--workspace", type=float, nargs=2,
+                        default=[1200, 600], metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--min-speed", type=float, default=100.0)
+    parser.add_argument("--max-speed", type=float, default=3000.0)
+    parser.add_argument("--puck-radius", type=float, default=20.0,
+                        help="radius of the puck the game tracks")
+    parser.add_argument("--interception-index", type=int, default=0)
+    parser.add_argument("--reaction-time", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    table = InterceptionTable.build(
+        tuple(args.workspace), shape=tuple(args.shape),
+        min_speed=args.min_speed, max_speed=args.max_speed,
+        puck_radius=args.puck_radius,
+        interception_index=args.interception_index,
+        reaction_time=args.reaction_time)
+    table.save(args.output)
+
+
+if __name__ == "__main__":
+    main()
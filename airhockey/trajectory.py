@@ -1,114 +1,186 @@
-import math
+import time
 from typing import Tuple, Optional
 
 import numpy as np
-from sklearn import preprocessing
 
+from airhockey import vecmath
+from airhockey.estimator import PuckStateEstimator
 
-def get_intersect(a1, a2, b1, b2):
+
+def fold(values, low: float, high: float):
+    """
+    Folds coordinates of the unfolded table (mirrored copies of [low, high]
+    laid end to end) back onto the table. Returns the folded coordinates
+    and the number of wall bounces needed to reach each of them.
     """
-    Returns the point of intersection of the lines passing through a2,a1 and
-    b2,b1.
-    a1: [x, y] a point on the first line
-    a2: [x, y] another point on the first line
-    b1: [x, y] a point on the second line
-    b2: [x, y] another point on the second line
+    values = np.asarray(values, dtype=float)
+    span = high - low
+    if span <= 0:
+        return np.full_like(values, (low + high) / 2), \
+            np.zeros(values.shape, dtype=int)
+    offset = values - low
+    bounces = np.abs(np.floor(offset / span)).astype(int)
+    offset = np.mod(offset, 2 * span)
+    folded = low + np.where(offset > span, 2 * span - offset, offset)
+    return folded, bounces
+
+
+def bank_shot(
+        position,
+        velocity,
+        xs,
+        y_range: Tuple[float, float]
+):
     """
+    Solves where and when a puck moving from position with constant
+    velocity crosses each of the vertical lines x = xs, bouncing off the
+    walls at y_range[0] and y_range[1] (the table sides shrunk by the puck
+    radius). Walls mirror the y motion only, so the crossing time is exact
+    and the y coordinate is found on the unfolded table.
 
-    s = np.vstack([a1, a2, b1, b2])  # s for stacked
-    h = np.hstack((s, np.ones((4, 1))))  # h for homogeneous
-    l1 = np.cross(h[0], h[1])  # get first line
-    l2 = np.cross(h[2], h[3])  # get second line
-    x, y, z = np.cross(l1, l2)  # point of intersection
-    if z == 0:  # lines are parallel
-        return (float('inf'), float('inf'))
+    Position and velocity may also be Nx2 arrays of pucks, the results are
+    then NxM for M lines.
 
-    return (x / z, y / z)
+    Returns arrays of y coordinates, arrival times and bounce counts, NaN
+    times (and y) for lines the puck never reaches.
+    """
+    xs = np.asarray(xs, dtype=float)
+    position = np.asarray(position, dtype=float)
+    velocity = np.asarray(velocity, dtype=float)
+    p_x, p_y = position[..., 0, None], position[..., 1, None]
+    v_x, v_y = velocity[..., 0, None], velocity[..., 1, None]
+    if position.ndim == 1:
+        p_x, p_y, v_x, v_y = p_x[0], p_y[0], v_x[0], v_y[0]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        times = (xs - p_x) / v_x
+    times = np.where((times < 0) | ~np.isfinite(times), np.nan, times)
+    ys, bounces = fold(p_y + v_y * np.nan_to_num(times), *y_range)
+    ys[np.isnan(times)] = np.nan
+    bounces[np.isnan(times)] = 0
+    return ys, times, bounces
+
+
+def interception_points(
+        position,
+        velocity,
+        workspace: Tuple[float, float],
+        *,
+        puck_radius: float = 0.0,
+        spacing: float = 100
+):
+    """
+    Crossings of the puck with vertical lines every spacing units across the
+    robot half of the workspace, up to half way to the puck. Works on a
+    single puck or Nx2 arrays of pucks like bank_shot.
+
+    Returns the line xs and the y coordinates and arrival times of the
+    crossings, NaN for lines that are not reached.
+    """
+    xs = np.arange(spacing, int(workspace[0] / 2), spacing)
+    y_range = (puck_radius, workspace[1] - puck_radius)
+    ys, times, _ = bank_shot(position, velocity, xs, y_range)
+    half_way = np.floor(np.asarray(position, dtype=float)[..., 0, None] / 2)
+    times[xs >= half_way] = np.nan
+    ys[xs >= half_way] = np.nan
+    return xs, ys, times
 
 
 class Trajectory:
-    def __init__(self, workspace: Tuple[float, float]):
+    def __init__(
+            self,
+            workspace: Tuple[float, float],
+            *,
+            latency: float = 0.0,
+            min_speed: float = 100.0,
+            puck_radius: float = 0.0,
+            estimator: Optional[PuckStateEstimator] = None
+    ):
+        """
+        latency: seconds between frame capture and the pusher acting on it,
+        the puck state is predicted that far ahead of the frame.
+        min_speed: slower pucks (world units per second) have no direction.
+        puck_radius: keeps the puck center that far from the walls.
+        """
         self.workspace = workspace
-        self.calculator = DirectionCalculator()
+        self.latency = latency
+        self.min_speed = min_speed
+        self.puck_radius = puck_radius
+        self.estimator = estimator or PuckStateEstimator()
         self.position: Optional[Tuple[float, float]] = None
-        self.direction = None
+        self.velocity: Optional[Tuple[float, float]] = None
+        self.direction: Optional[vecmath.Vector] = None
 
     def calculate_interception_points(self):
-        interception_points = []
+        interceptions = self.calculate_interceptions()
+        if interceptions is None:
+            return None
+        return [point for point, _ in interceptions]
 
+    def calculate_interceptions(self):
+        """
+        Returns the interception points with the seconds until the puck
+        gets there, as ((x, y), time) pairs.
+        """
         if self.direction is None:
-            return
-
-        x_distance_between_intersection_points = 100
-        x_start = 100
-        x_end = int(self.position[0] / 2)
-        for x in range(x_start, x_end, x_distance_between_intersection_points):
-            intersection = self.intersect_puck_trajectory_at_x(x)
-            if intersection is not None:
-                interception_points.append(intersection)
+            return None
 
-        return interception_points
+        xs, ys, times = interception_points(
+            self.position, self.velocity, self.workspace,
+            puck_radius=self.puck_radius)
+        reachable = ~np.isnan(times)
+        return list(zip(zip(xs[reachable].tolist(), ys[reachable].tolist()),
+                        times[reachable].tolist()))
+
+    def intercept(self, xs):
+        """
+        Returns the y coordinates, times of arrival (seconds after the
+        predicted state) and wall bounces of the puck crossing x = xs.
+        """
+        if self.position is None or self.velocity is None:
+            nan = np.full(np.shape(xs), np.nan)
+            return nan, nan.copy(), np.zeros(np.shape(xs), dtype=int)
+        y_range = (self.puck_radius, self.workspace[1] - self.puck_radius)
+        return bank_shot(self.position, self.velocity, xs, y_range)
 
     def intersect_puck_trajectory_at_x(self, x):
-        p_x, p_y = self.position
-        v_x, v_y = self.direction
-        intersection = get_intersect(
-            (x, 0), (x, 1),
-            self.position, (p_x + v_x, p_y + v_y)
-        )
-        i_x, i_y = intersection
-
-        if i_x == float('inf'):
+        """
+        Returns ((x, y), time of arrival) or None if the puck never gets
+        to x.
+        """
+        ys, times, _ = self.intercept([x])
+        if np.isnan(times[0]):
             return None
-
-        n = int(i_y / self.workspace[1])
-        if i_y < 0 or i_y > self.workspace[1]:
-            i_y = abs(i_y) - abs(n * self.workspace[1])
-
-            if n % 2 != 0:
-                i_y = self.workspace[1] - i_y
-
-        return i_x, i_y
+        return (float(x), float(ys[0])), float(times[0])
 
     def register_position(
             self,
-            position: Tuple[float, float]
+            position: Optional[Tuple[float, float]],
+            timestamp: Optional[float] = None
     ):
-        self.position = position
-        self.direction, speed = self.calculator.direction(position)
-
-
-class DirectionCalculator(object):
-    def __init__(self):
-        self.x = None
-        self.y = None
-        self.old_vector = None
-
-    def direction(
-            self,
-            position: Tuple[float, float]
-    ) -> Tuple:
-        x, y = position
-        if self.x is None:
-            self.x = x
-            self.y = y
-            return None, None
-
-        dx = x - self.x
-        dy = y - self.y
-
-        velocity_square = dx * dx + dy * dy
-
-        vector = preprocessing.normalize(
-            np.asarray([dx, dy]).reshape(1, -1)
-        )
-
-        if velocity_square > 3000:
-            self.old_vector = vector[0]
-            self.x = x
-            self.y = y
-
-        if self.old_vector is None:
-            return None, None
+        if timestamp is None:
+            timestamp = time.monotonic()
+        self.estimator.update(position, timestamp)
+        self.predict(timestamp + self.latency)
+
+    def predict(self, timestamp: float):
+        """
+        Moves position, velocity and direction to the puck state estimated
+        at timestamp. A puck predicted past a wall is reflected off it.
+        """
+        prediction = self.estimator.predict(timestamp)
+        if prediction is None:
+            self.position = self.velocity = self.direction = None
+            return
 
-        return self.old_vector, math.sqrt(velocity_square)
+        (x, y), (v_x, v_y) = prediction
+        r = self.puck_radius
+        x, x_bounces = fold(x, r, self.workspace[0] - r)
+        y, y_bounces = fold(y, r, self.workspace[1] - r)
+        self.position = (float(x), float(y))
+        self.velocity = (-v_x if x_bounces % 2 else v_x,
+                         -v_y if y_bounces % 2 else v_y)
+        if vecmath.length(self.velocity) < self.min_speed:
+            self.direction = None
+        else:
+            self.direction = vecmath.normalize(self.velocity)
@@ -1,9 +1,117 @@
-from typing import Tuple
+import math
+from typing import Optional, Tuple
+
+import cv2
 import numpy as np
 
 
+def transform(matrix: np.ndarray, points) -> np.ndarray:
+    """
+    Applies a 3x3 projective matrix to an Nx2 array of points.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    res = points @ matrix[:2, :2].T + matrix[:2, 2]
+    w = points @ matrix[2, :2] + matrix[2, 2]
+    return res / w[:, None]
+
+
+def estimate_world_to_frame(
+        world_points,
+        frame_points
+) -> Optional[np.ndarray]:
+    """
+    Estimates the 3x3 world to frame matrix from matching points: a full
+    homography from four or more points, a similarity (rotation, uniform
+    scale and translation) from two or three. Returns None when the points
+    are degenerate.
+    """
+    world = np.asarray(world_points, dtype=np.float32).reshape(-1, 2)
+    frame = np.asarray(frame_points, dtype=np.float32).reshape(-1, 2)
+    if len(world) != len(frame) or len(world) < 2:
+        raise ValueError("At least two matching points are needed")
+
+    if len(world) >= 4:
+        method = cv2.RANSAC if len(world) > 4 else 0
+        matrix, _ = cv2.findHomography(world, frame, method)
+    else:
+        affine, _ = cv2.estimateAffinePartial2D(world, frame)
+        matrix = None if affine is None else np.vstack([affine, [0, 0, 1]])
+
+    if matrix is None or not np.all(np.isfinite(matrix)) or \
+            abs(np.linalg.det(matrix)) < 1e-12:
+        return None
+    return matrix
+
+
+class LensModel(object):
+    """
+    Radial and tangential lens distortion (OpenCV camera model).
+
+    Undistorted positions of every frame pixel are precomputed once, so
+    correcting a detected point is a table lookup. Distorting is the
+    closed-form forward model.
+    """
+
+    def __init__(self, *, camera_matrix, dist_coeffs, video_size):
+        self.camera_matrix = np.asarray(camera_matrix, dtype=float)
+        self.dist_coeffs = np.zeros(5)
+        coeffs = np.asarray(dist_coeffs, dtype=float).ravel()[:5]
+        self.dist_coeffs[:len(coeffs)] = coeffs
+        self.video_size = video_size
+
+        width, height = video_size
+        xs, ys = np.meshgrid(np.arange(width), np.arange(height))
+        pixels = np.stack([xs, ys], axis=-1).reshape(-1, 1, 2)
+        undistorted = cv2.undistortPoints(
+            pixels.astype(np.float32), self.camera_matrix, self.dist_coeffs,
+            P=self.camera_matrix)
+        self.lookup = undistorted.reshape(height, width, 2)
+
+    @classmethod
+    def load(cls, path: str, video_size):
+        """
+        Loads camera_matrix and dist_coeffs saved with numpy.savez.
+        """
+        data = np.load(path)
+        return cls(camera_matrix=data["camera_matrix"],
+                   dist_coeffs=data["dist_coeffs"], video_size=video_size)
+
+    def undistort_points(self, points) -> np.ndarray:
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        height, width = self.lookup.shape[:2]
+        xs = np.clip(np.rint(points[:, 0]).astype(int), 0, width - 1)
+        ys = np.clip(np.rint(points[:, 1]).astype(int), 0, height - 1)
+        return self.lookup[ys, xs].astype(float)
+
+    def distort_points(self, points) -> np.ndarray:
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        fx, fy = self.camera_matrix[0, 0], self.camera_matrix[1, 1]
+        cx, cy = self.camera_matrix[0, 2], self.camera_matrix[1, 2]
+        k1, k2, p1, p2, k3 = self.dist_coeffs
+        x = (points[:, 0] - cx) / fx
+        y = (points[:, 1] - cy) / fy
+        r2 = x * x + y * y
+        radial = 1 + k1 * r2 + k2 * r2 * r2 + k3 * r2 * r2 * r2
+        xd = x * radial + 2 * p1 * x * y + p2 * (r2 + 2 * x * x)
+        yd = y * radial + p1 * (r2 + 2 * y * y) + 2 * p2 * x * y
+        return np.stack([xd * fx + cx, yd * fy + cy], axis=-1)
+
+
 class WorldToFrameTranslator(object):
-    def __init__(self, video_size, table_size):
+    def __init__(
+            self,
+            video_size,
+            table_size,
+            lens: Optional[LensModel] = None,
+            *,
+            max_offset: float = 120.0,
+            max_scale_change: float = 0.2,
+            max_rotation: float = math.radians(10)
+    ):
+        """
+        max_offset, max_scale_change and max_rotation: how far a calibrated
+        matrix may stray from the nominal one, see plausible().
+        """
         video_width, video_height = video_size
         table_width, table_height = table_size
         horizontal_margin = 32
@@ -13,18 +121,95 @@ class WorldToFrameTranslator(object):
 
         ratio = frame_width / table_width
 
-        self.world_to_frame = [
+        self.lens = lens
+        self.table_size = table_size
+        self.max_offset = max_offset
+        self.max_scale_change = max_scale_change
+        self.max_rotation = max_rotation
+        self.set_world_to_frame([
             [ratio,     0,  horizontal_margin],
             [0,     ratio,    vertical_margin],
             [0,         0,              1],
-        ]
+        ])
+        self.nominal = self.world_to_frame.copy()
 
+    def set_world_to_frame(self, matrix):
+        self.world_to_frame = np.array(matrix, dtype=float)
         self.frame_to_world = np.linalg.inv(self.world_to_frame)
+        # Plain float copies for the single point paths, indexing NumPy
+        # arrays element by element costs more than the arithmetic.
+        self._w2f = tuple(self.world_to_frame.ravel().tolist())
+        self._f2w = tuple(self.frame_to_world.ravel().tolist())
+
+    def calibrate(self, world_points, frame_points) -> Optional[float]:
+        """
+        Fits the world to frame matrix to markers detected at frame_points.
+        Returns the mean reprojection error in pixels, or None when the
+        markers are degenerate or the fit is not plausible() and the matrix
+        was kept.
+        """
+        frame = np.asarray(frame_points, dtype=float).reshape(-1, 2)
+        if self.lens is not None:
+            frame = self.lens.undistort_points(frame)
+        matrix = estimate_world_to_frame(world_points, frame)
+        if matrix is None or not self.plausible(matrix):
+            return None
+        self.set_world_to_frame(matrix)
+        error = transform(matrix, world_points) - frame
+        return float(np.mean(np.hypot(error[:, 0], error[:, 1])))
+
+    def plausible(self, matrix) -> bool:
+        """
+        Whether a world to frame matrix keeps the table center within
+        max_offset pixels, its scale within max_scale_change and its
+        rotation within max_rotation radians of the nominal matrix. Two
+        markers always fit a similarity exactly, so these limits are what
+        tells the table markers from other blobs of their color.
+        """
+        matrix = np.asarray(matrix, dtype=float)
+        center = np.asarray(self.table_size, dtype=float) / 2
+        offset = transform(matrix, center) - transform(self.nominal, center)
+        scale = math.sqrt(abs(np.linalg.det(matrix[:2, :2]) /
+                              np.linalg.det(self.nominal[:2, :2])))
+        rotation = math.atan2(matrix[1, 0], matrix[0, 0]) - \
+            math.atan2(self.nominal[1, 0], self.nominal[0, 0])
+        rotation = (rotation + math.pi) % (2 * math.pi) - math.pi
+        return float(np.hypot(*offset[0])) <= self.max_offset and \
+            abs(scale - 1) <= self.max_scale_change and \
+            abs(rotation) <= self.max_rotation
 
     def w2f(self, w: Tuple[float, float]) -> Tuple[int, int]:
-        res = np.matmul(self.world_to_frame, [w[0], w[1], 1])
-        return int(res[0]), int(res[1])
+        if self.lens is not None:
+            x, y = self.w2f_many([w])[0]
+            return int(x), int(y)
+        x, y = _apply(self._w2f, w[0], w[1])
+        return int(x), int(y)
 
     def f2w(self, f: Tuple[int, int]) -> Tuple[float, float]:
-        res = np.matmul(self.frame_to_world,  [f[0], f[1], 1])
-        return res[0], res[1]
+        if self.lens is not None:
+            x, y = self.f2w_many([f])[0]
+            return float(x), float(y)
+        return _apply(self._f2w, f[0], f[1])
+
+    def w2f_many(self, w) -> np.ndarray:
+        """
+        Translates an Nx2 array of world points into Nx2 int frame points.
+        """
+        f = transform(self.world_to_frame, w)
+        if self.lens is not None:
+            f = self.lens.distort_points(f)
+        return f.astype(int)
+
+    def f2w_many(self, f) -> np.ndarray:
+        """
+        Translates an Nx2 array of frame points into Nx2 world points.
+        """
+        if self.lens is not None:
+            f = self.lens.undistort_points(f)
+        return transform(self.frame_to_world, f)
+
+
+def _apply(m, x, y) -> Tuple[float, float]:
+    a, b, c, d, e, f, g, h, i = m
+    w = g * x + h * y + i
+    return (a * x + b * y + c) / w, (d * x + e * y + f) / w
@@ -14,3 +14,6 @@ class Timeout(object):
             self.t = time.time()
             return True
         return False
+
+    def remaining(self):
+        return max(0.0, self.delay - (time.time() - self.t))
@@ -0,0 +1,66 @@
+"""
+2D vector math on plain float tuples.
+
+The game loop works with one or two points per frame, where NumPy call
+overhead dominates the arithmetic, so these helpers stay in pure Python.
+"""
+import math
+from typing import Optional, Sequence, Tuple
+
+Vector = Tuple[float, float]
+
+
+def length(v: Sequence[float]) -> float:
+    return math.hypot(v[0], v[1])
+
+
+def distance(a: Sequence[float], b: Sequence[float]) -> float:
+    return math.hypot(a[0] - b[0], a[1] - b[1])
+
+
+def dot(a: Sequence[float], b: Sequence[float]) -> float:
+    return a[0] * b[0] + a[1] * b[1]
+
+
+def cross(a: Sequence[float], b: Sequence[float]) -> float:
+    return a[0] * b[1] - a[1] * b[0]
+
+
+def normalize(v: Sequence[float]) -> Optional[Vector]:
+    """
+    Returns the unit vector of v or None for a zero vector.
+    """
+    n = math.hypot(v[0], v[1])
+    if n == 0:
+        return None
+    return v[0] / n, v[1] / n
+
+
+def intersect(
+        a1: Sequence[float],
+        a2: Sequence[float],
+        b1: Sequence[float],
+        b2: Sequence[float]
+) -> Optional[Vector]:
+    """
+    Returns the point of intersection of the lines passing through a1, a2
+    and b1, b2 or None when the lines are parallel.
+    """
+    da = (a2[0] - a1[0], a2[1] - a1[1])
+    db = (b2[0] - b1[0], b2[1] - b1[1])
+    denominator = cross(da, db)
+    if denominator == 0:
+        return None
+    t = cross((b1[0] - a1[0], b1[1] - a1[1]), db) / denominator
+    return a1[0] + da[0] * t, a1[1] + da[1] * t
+
+
+def reflect(v: Sequence[float], normal: Sequence[float]) -> Vector:
+    """
+    Returns v reflected off a wall with the given normal.
+    """
+    n = normalize(normal)
+    if n is None:
+        raise ValueError("Wall normal must not be a zero vector")
+    d = 2 * dot(v, n)
+    return v[0] - d * n[0], v[1] - d * n[1]
@@ -1,8 +1,11 @@
-from typing import List
+from typing import List, Optional
 
 import cv2
 import numpy as np
 
+from airhockey.vision.segmentation import Segmentation, find_blobs
+from airhockey.vision.tracking import RegionTracker
+
 
 class ColorRange(object):
     def __init__(self, *, name: str, h_low, h_high, sv_low):
@@ -20,6 +23,10 @@ class ColorRange(object):
     def set_sv_low(self, v):
         self.sv_low = v
 
+    @property
+    def bounds(self):
+        return self.h_low, self.h_high, self.sv_low
+
     def __eq__(self, other):
         return self.h_low == other.h_low and self.h_high == other.h_high and \
                self.sv_low == other.sv_low
@@ -32,33 +39,48 @@ class ColorRange(object):
 
 
 class ColorDetector(object):
-    def __init__(self, *, color_range: ColorRange):
+    def __init__(
+            self,
+            *,
+            color_range: ColorRange,
+            tracker: Optional[RegionTracker] = None
+    ):
         self.color_range = color_range
+        self.tracker = tracker
 
     def get_positions(self, hsv, number_of_results) -> List:
+        if self.tracker is None or number_of_results != 1:
+            return self._detect(hsv, number_of_results)
+
+        frame = hsv.hsv if isinstance(hsv, Segmentation) else hsv
+        window = self.tracker.window(frame.shape)
+        if window is not None:
+            positions = self._detect(hsv, 1, window)
+            if positions:
+                self.tracker.update(positions[0], tracked=True)
+                return positions
+
+        positions = self._detect(hsv, 1)
+        if positions:
+            self.tracker.update(positions[0], tracked=False)
+        else:
+            self.tracker.lose()
+        return positions
+
+    def _detect(self, hsv, number_of_results, window=None) -> List:
+        if isinstance(hsv, Segmentation):
+            return hsv.get_positions(
+                self.color_range, number_of_results, window)
+
+        offset = (0, 0)
+        if window is not None:
+            x0, y0, x1, y1 = window
+            hsv = hsv[y0:y1, x0:x1]
+            offset = (x0, y0)
+
         lower_color = np.array([self.color_range.h_low,
                                 self.color_range.sv_low,
                                 self.color_range.sv_low])
         upper_color = np.array([self.color_range.h_high, 255, 255])
         mask = cv2.inRange(hsv, lower_color, upper_color)
-        contours, _ = cv2.findContours(mask, cv2.RETR_LIST,
-                                       cv2.CHAIN_APPROX_SIMPLE)
-        areas = []
-        for i, c in enumerate(contours):
-            area = cv2.contourArea(c)
-            areas.append(area)
-
-        sorted_contours = sorted(zip(areas, contours), key=lambda x: x[0],
-                                 reverse=True)
-
-        result = []
-        for i in range(number_of_results):
-            if i == len(sorted_contours):
-                break
-
-            M = cv2.moments(sorted_contours[i][1])
-            frameX = int(M["m10"] / (M["m00"] + 0.00001))
-            frameY = int(M["m01"] / (M["m00"] + 0.00001))
-            result.append((frameX, frameY))
-
-        return result
+        return find_blobs(mask, number_of_results, offset)
@@ -1,11 +1,16 @@
 import cv2
 import abc
+import logging
 
-from airhockey.debug import DebugWindow
+from airhockey import vecmath
+from airhockey.debug import DebugSink
+from airhockey.metrics import latency, HSV, DETECT
 from typing import Optional, Tuple, List, Any
 
 from airhockey.translate import WorldToFrameTranslator
 from airhockey.vision.color import ColorRange, ColorDetector
+from airhockey.vision.segmentation import ColorSegmenter
+from airhockey.vision.tracking import RegionTracker
 from airhockey.vision.video import FrameReader
 
 
@@ -25,9 +30,14 @@ class Query(object):
 
 
 class PositionQuery(Query):
-    def __init__(self, color_range: ColorRange):
+    def __init__(
+            self,
+            color_range: ColorRange,
+            tracker: Optional[RegionTracker] = None
+    ):
         self.color_range = color_range
-        self.detector = ColorDetector(color_range=self.color_range)
+        self.detector = ColorDetector(color_range=self.color_range,
+                                      tracker=tracker)
 
     def execute(self, hsv, translator: WorldToFrameTranslator, debug_window):
         positions = self.detector.get_positions(hsv, 1)
@@ -76,6 +86,7 @@ class VerifyPositionQuery(Query):
         self.color = color
         self.expected_positions = expected_positions
         self.detected_positions: List[Tuple[float, float]] = []
+        self.detected_frame_positions: List[Tuple[int, int]] = []
         self.detector = ColorDetector(color_range=self.color)
 
     def __eq__(self, other):
@@ -83,13 +94,11 @@ class VerifyPositionQuery(Query):
                self.expected_positions == other.expected_positions
 
     def execute(self, hsv, translator: WorldToFrameTranslator, debug_window):
+        self.detected_frame_positions = self.detector.get_positions(
+            hsv, len(self.expected_positions))
         self.detected_positions = [
-            translator.f2w(f)
-            for f in self.detector.get_positions(
-                hsv,
-                len(self.expected_positions)
-            )
-        ]
+            (x, y) for x, y in
+            translator.f2w_many(self.detected_frame_positions).tolist()]
 
         if len(self.detected_positions) != len(self.expected_positions):
             return self.NOT_DETECTED
@@ -111,33 +120,68 @@ class VerifyPositionQuery(Query):
                 return False
         return True
 
+    def matched_frame_positions(self) -> Optional[List[Tuple[int, int]]]:
+        """
+        Returns the detected frame positions ordered like the expected
+        positions (each matched to the closest detection in the world), or
+        None when the numbers of points differ.
+        """
+        if len(self.detected_positions) != len(self.expected_positions):
+            return None
+        remaining = list(range(len(self.detected_positions)))
+        matched = []
+        for e in self.expected_positions:
+            closest = min(remaining, key=lambda i: vecmath.distance(
+                e, self.detected_positions[i]))
+            remaining.remove(closest)
+            matched.append(self.detected_frame_positions[closest])
+        return matched
+
     def draw(self, debug_window):
-        for p in self.detected_positions:
-            debug_window.draw_circle(
-                world_coordinates=p,
-                color=((self.color.h_low + self.color.h_high) / 2,
-                       self.color.sv_low, 255))
-        for p in self.expected_positions:
-            debug_window.draw_circle(
-                world_coordinates=p,
-                color=((self.color.h_low + self.color.h_high) / 2,
-                       self.color.sv_low, 255))
+        debug_window.draw_circles(
+            world_coordinates=self.detected_positions +
+            list(self.expected_positions),
+            color=((self.color.h_low + self.color.h_high) / 2,
+                   self.color.sv_low, 255))
 
 
 class QueryContext(object):
     def __init__(self, *, translator, frame_reader: FrameReader,
-                 debug_window: Optional[DebugWindow]):
+                 debug_window: Optional[DebugSink],
+                 color_ranges: Optional[List[ColorRange]] = None,
+                 frame_timeout: float = 1.0):
         self.translator = translator
         self.frame_reader = frame_reader
+        self.frame_timeout = frame_timeout
+        self.frame_sequence = 0
+        self.frame_timestamp: Optional[float] = None
         self.frame = None
         self.frame_hsv = None
+        self.segmenter = ColorSegmenter(color_ranges) \
+            if color_ranges else None
+        self.segmentation = None
         self.debug_window = debug_window
         self.queries: List = []
         self.can_execute = False
 
     def __enter__(self):
-        self.frame = self.frame_reader.read()
-        self.frame_hsv = cv2.cvtColor(self.frame, cv2.COLOR_BGR2HSV)
+        frame = self.frame_reader.read_next(self.frame_sequence,
+                                            self.frame_timeout)
+        if frame is None:
+            logging.getLogger(__name__).warning(
+                "No new frame in %s seconds, reusing the last one.",
+                self.frame_timeout)
+            self.frame = self.frame_reader.read()
+            # The capture time of the reused frame was already accounted.
+            self.frame_timestamp = None
+        else:
+            self.frame = frame.image
+            self.frame_sequence = frame.sequence
+            self.frame_timestamp = frame.timestamp
+        with latency.measure(HSV):
+            self.frame_hsv = cv2.cvtColor(self.frame, cv2.COLOR_BGR2HSV)
+        if self.segmenter is not None:
+            self.segmentation = self.segmenter.segment(self.frame_hsv)
         self.queries = []
         if self.debug_window is not None:
             self.debug_window.set_frame(self.frame, self.frame_hsv)
@@ -150,11 +194,14 @@ class QueryContext(object):
             self.debug_window.draw(self.queries, self.frame_reader)
         self.frame = None
         self.frame_hsv = None
+        self.segmentation = None
 
     def query(self, query: Query) -> Any:
         if not self.can_execute:
             raise RuntimeError(
                 'Cannot execute a query from inactive context')
         self.queries.append(query)
-        return query.execute(
-            self.frame_hsv, self.translator, self.debug_window)
+        hsv = self.frame_hsv if self.segmentation is None \
+            else self.segmentation
+        with latency.measure(DETECT):
+            return query.execute(hsv, self.translator, self.debug_window)
@@ -0,0 +1,155 @@
+from typing import List, Optional, Tuple, TYPE_CHECKING
+
+import cv2
+import numpy as np
+
+if TYPE_CHECKING:
+    from airhockey.vision.color import ColorRange
+
+
+MAX_COLOR_RANGES = 8
+
+
+def find_blobs(
+        mask,
+        number_of_results,
+        offset: Tuple[int, int] = (0, 0)
+) -> List[Tuple[int, int]]:
+    """
+    Returns centers of the largest blobs of a binary mask, biggest first.
+    Any non-zero pixel of the mask is considered to be set. The offset is
+    added to every center, which is used when the mask covers only a window
+    of the frame.
+    """
+    contours, _ = cv2.findContours(mask, cv2.RETR_LIST,
+                                   cv2.CHAIN_APPROX_SIMPLE, offset=offset)
+    areas = []
+    for i, c in enumerate(contours):
+        area = cv2.contourArea(c)
+        areas.append(area)
+
+    sorted_contours = sorted(zip(areas, contours), key=lambda x: x[0],
+                             reverse=True)
+
+    result = []
+    for i in range(number_of_results):
+        if i == len(sorted_contours):
+            break
+
+        M = cv2.moments(sorted_contours[i][1])
+        frameX = int(M["m10"] / (M["m00"] + 0.00001))
+        frameY = int(M["m01"] / (M["m00"] + 0.00001))
+        result.append((frameX, frameY))
+
+    return result
+
+
+class ColorSegmenter(object):
+    """
+    Labels pixels of all registered color ranges in a single pass.
+
+    Every color range owns one bit of an 8-bit label. A per-channel lookup
+    table maps each H, S and V value to the set of ranges accepting it, so
+    a pixel belongs to a range when the bit is set for all three channels.
+    """
+
+    def __init__(self, color_ranges: List['ColorRange']):
+        if len(color_ranges) > MAX_COLOR_RANGES:
+            raise ValueError(
+                "At most {n} color ranges can be segmented at once".format(
+                    n=MAX_COLOR_RANGES))
+        self.color_ranges = color_ranges
+        self.lut = np.zeros((1, 256, 3), np.uint8)
+        self._lut_bounds: Optional[List[Tuple[int, int, int]]] = None
+
+    def segment(self, hsv) -> 'Segmentation':
+        self._update_lut()
+        return Segmentation(hsv, self)
+
+    def label(self, hsv):
+        channels = cv2.split(cv2.LUT(hsv, self.lut))
+        return cv2.bitwise_and(cv2.bitwise_and(channels[0], channels[1]),
+                               channels[2])
+
+    def flag(self, color_range: 'ColorRange') -> Optional[int]:
+        for index, r in enumerate(self.color_ranges):
+            if r is color_range:
+                return 1 << index
+        return None
+
+    def _update_lut(self):
+        bounds = [r.bounds for r in self.color_ranges]
+        if bounds == self._lut_bounds:
+            return
+
+        levels = np.arange(256)
+        self.lut.fill(0)
+        for index, (h_low, h_high, sv_low) in enumerate(bounds):
+            flag = np.uint8(1 << index)
+            self.lut[0, (levels >= h_low) & (levels <= h_high), 0] |= flag
+            self.lut[0, levels >= sv_low, 1] |= flag
+            self.lut[0, levels >= sv_low, 2] |= flag
+        self._lut_bounds = bounds
+
+
+class Segmentation(object):
+    """
+    Result of segmenting a single HSV frame. Labels are computed on the first
+    request and blobs are cached per color range, so any number of queries
+    for the same frame share one thresholding pass.
+    """
+
+    def __init__(self, hsv, segmenter: ColorSegmenter):
+        self.hsv = hsv
+        self.segmenter = segmenter
+        self._labels = None
+        self._blobs: List[Tuple['ColorRange', int, List]] = []
+
+    @property
+    def labels(self):
+        if self._labels is None:
+            self._labels = self.segmenter.label(self.hsv)
+        return self._labels
+
+    def mask(self, color_range: 'ColorRange', window=None):
+        hsv = self.hsv
+        labels = self._labels
+        if window is not None:
+            x0, y0, x1, y1 = window
+            hsv = hsv[y0:y1, x0:x1]
+            if labels is not None:
+                labels = labels[y0:y1, x0:x1]
+
+        flag = self.segmenter.flag(color_range)
+        if flag is None:
+            lower_color = np.array([color_range.h_low,
+                                    color_range.sv_low,
+                                    color_range.sv_low])
+            upper_color = np.array([color_range.h_high, 255, 255])
+            return cv2.inRange(hsv, lower_color, upper_color)
+
+        if labels is None:
+            if window is None:
+                labels = self.labels
+            else:
+                # Do not label the whole frame when only a window is needed.
+                labels = self.segmenter.label(hsv)
+        return np.bitwise_and(labels, flag)
+
+    def get_positions(
+            self,
+            color_range: 'ColorRange',
+            number_of_results,
+            window: Optional[Tuple[int, int, int, int]] = None
+    ) -> List[Tuple[int, int]]:
+        if window is not None:
+            return find_blobs(self.mask(color_range, window),
+                              number_of_results, offset=window[:2])
+
+        for r, n, blobs in self._blobs:
+            if r is color_range and n >= number_of_results:
+                return blobs[:number_of_results]
+
+        blobs = find_blobs(self.mask(color_range), number_of_results)
+        self._blobs.append((color_range, number_of_results, blobs))
+        return blobs
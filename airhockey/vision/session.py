@@ -0,0 +1,189 @@
+"""
+Recorded sessions of grabbed frames.
+
+A session file starts with a fixed-size header followed by fixed-size
+records, one per frame: a little-endian float64 capture timestamp and the
+raw uint8 frame pixels. Records have the same size, so the whole file can
+be memory-mapped and any frame is a zero-copy view. The number of frames
+is derived from the file size, which keeps a session readable even when
+the recording process was killed.
+"""
+import os
+import struct
+import time
+from typing import BinaryIO, Optional, Tuple
+
+import numpy as np
+
+from airhockey.vision.video import Frame, FrameReader
+
+MAGIC = b"AHSESS\0\0"
+VERSION = 1
+HEADER_FORMAT = "<8sIIII"
+HEADER_SIZE = 64
+
+
+def record_dtype(shape: Tuple[int, int, int]) -> np.dtype:
+    return np.dtype([("timestamp", "<f8"), ("image", np.uint8, shape)])
+
+
+class SessionWriter(object):
+    def __init__(self, path: str):
+        self.path = path
+        self.shape: Optional[Tuple[int, int, int]] = None
+        self.frames_written = 0
+        self.closed = False
+        self._file: Optional[BinaryIO] = None
+
+    def write(self, image: np.ndarray, timestamp: float):
+        if self.closed:
+            # Opening the file again would truncate the recording.
+            raise ValueError("Cannot write to a closed session")
+        f = self._file
+        if f is None:
+            f = self._open(image.shape)
+        elif image.shape != self.shape:
+            raise ValueError(
+                "Frame shape {actual} differs from session shape "
+                "{expected}".format(actual=image.shape, expected=self.shape))
+
+        f.write(struct.pack("<d", timestamp))
+        f.write(np.ascontiguousarray(image).data)
+        self.frames_written += 1
+
+    def close(self):
+        self.closed = True
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _open(self, shape) -> BinaryIO:
+        if len(shape) != 3:
+            raise ValueError("Only HxWxC frames can be recorded")
+        self.shape = shape
+        f = open(self.path, "wb", buffering=1 << 20)
+        header = struct.pack(HEADER_FORMAT, MAGIC, VERSION, *shape)
+        f.write(header.ljust(HEADER_SIZE, b"\0"))
+        self._file = f
+        return f
+
+
+class Session(object):
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            raise ValueError(f"{path} is not a session file")
+        magic, version, height, width, channels = struct.unpack_from(
+            HEADER_FORMAT, header)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a session file")
+        if version != VERSION:
+            raise ValueError(
+                f"Session version {version} is not supported")
+
+        self.path = path
+        self.shape = (height, width, channels)
+        dtype = record_dtype(self.shape)
+        count = (os.path.getsize(path) - HEADER_SIZE) // dtype.itemsize
+        if count == 0:
+            raise ValueError(f"{path} has no frames")
+        self.records = np.memmap(path, dtype=dtype, mode="r",
+                                 offset=HEADER_SIZE, shape=(count,))
+        self.images = self.records["image"]
+        self.timestamps = self.records["timestamp"]
+
+    def __len__(self):
+        return len(self.records)
+
+
+class ReplayFrameReader(FrameReader):
+    """
+    Serves the frames of a recorded session.
+
+    With a speed the frames are paced by their recorded timestamps (2.0
+    replays twice as fast) and, like a camera, a slow reader gets the latest
+    due frame. Without a speed every frame is served, one per read_next,
+    as fast as the reader asks for them, which makes runs deterministic.
+    Frame timestamps keep the recorded spacing divided by the speed.
+    """
+
+    def __init__(self, path: str, speed: Optional[float] = 1.0):
+        super().__init__()
+        self.session = Session(path)
+        self.speed = speed if speed else None
+        self.time_started = time.time()
+        self._started = time.monotonic()
+        self._index = -1
+
+    def start(self):
+        self.time_started = time.time()
+        self._started = time.monotonic()
+        return self
+
+    def stop(self):
+        ...
+
+    def has_frame(self):
+        return True
+
+    @property
+    def finished(self) -> bool:
+        return self._index >= len(self.session) - 1
+
+    def read(self):
+        return self.session.images[max(self._index, 0)]
+
+    def read_next(
+            self,
+            sequence: int,
+            timeout: Optional[float] = None
+    ) -> Optional[Frame]:
+        index = max(sequence, self._index + 1)
+        if index >= len(self.session):
+            # Like a camera that stopped delivering, so a caller retrying
+            # on timeout does not spin once the session is over.
+            if timeout is not None:
+                time.sleep(timeout)
+            return None
+
+        if self.speed is not None:
+            now = time.monotonic()
+            wait = self._frame_time(index) - now
+            if timeout is not None and wait > timeout:
+                time.sleep(timeout)
+                return None
+            if wait > 0:
+                time.sleep(wait)
+            else:
+                index = self._latest_due(index, now)
+
+        self._index = index
+        self.frames_read += 1
+        self.frames_grabbed = index + 1
+        return Frame(self.session.images[index], index + 1,
+                     self._frame_time(index))
+
+    def stream_fps(self):
+        return self.frames_grabbed / (time.time() - self.time_started)
+
+    def read_fps(self):
+        return self.frames_read / (time.time() - self.time_started)
+
+    def _frame_time(self, index):
+        offset = self.session.timestamps[index] - self.session.timestamps[0]
+        if self.speed is not None:
+            offset /= self.speed
+        return self._started + float(offset)
+
+    def _latest_due(self, index, now):
+        while index + 1 < len(self.session) and \
+                self._frame_time(index + 1) <= now:
+            index += 1
+        return index
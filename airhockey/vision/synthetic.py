@@ -0,0 +1,41 @@
+from typing import Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from airhockey.translate import WorldToFrameTranslator
+from airhockey.vision.color import ColorRange
+
+
+def color_range_bgr(color_range: ColorRange) -> Tuple[int, int, int]:
+    """
+    Returns a BGR color that falls in the middle of the color range.
+    """
+    sv = (color_range.sv_low + 255) // 2
+    hsv = np.array([[[(color_range.h_low + color_range.h_high) // 2, sv, sv]]],
+                   np.uint8)
+    b, g, r = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)[0][0]
+    return int(b), int(g), int(r)
+
+
+def render_frame(
+        video_size: Tuple[int, int],
+        translator: WorldToFrameTranslator,
+        blobs: Sequence[Tuple[ColorRange, Tuple[float, float], float]],
+        target=None
+):
+    """
+    Draws a BGR frame with a filled circle for every (color range, world
+    position, world radius) blob. When target is given the frame is drawn
+    into it instead of a new array.
+    """
+    width, height = video_size
+    if target is None:
+        target = np.zeros((height, width, 3), np.uint8)
+    target[:] = (40, 30, 30)
+    for color_range, position, radius in blobs:
+        center = translator.w2f(position)
+        edge = translator.w2f((position[0] + radius, position[1]))
+        cv2.circle(target, center, max(1, edge[0] - center[0]),
+                   color_range_bgr(color_range), -1)
+    return target
@@ -0,0 +1,57 @@
+from typing import Optional, Tuple
+
+
+class RegionTracker(object):
+    """
+    Remembers where a blob was seen on the previous frames and predicts a
+    small search window for the next one, assuming constant velocity in
+    frame coordinates.
+    """
+
+    def __init__(self, *, margin: int = 60, rescan_interval: int = 30):
+        self.margin = margin
+        self.rescan_interval = rescan_interval
+        self.position: Optional[Tuple[int, int]] = None
+        self.velocity: Tuple[int, int] = (0, 0)
+        self.frames_tracked = 0
+
+    def window(
+            self,
+            frame_shape
+    ) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Returns the (x0, y0, x1, y1) region to search in or None when the
+        whole frame has to be scanned.
+        """
+        if self.position is None:
+            return None
+        if self.rescan_interval and \
+                self.frames_tracked >= self.rescan_interval:
+            return None
+
+        height, width = frame_shape[:2]
+        vx, vy = self.velocity
+        x = self.position[0] + vx
+        y = self.position[1] + vy
+        half_size = self.margin + max(abs(vx), abs(vy))
+        x0 = max(0, x - half_size)
+        y0 = max(0, y - half_size)
+        x1 = min(width, x + half_size)
+        y1 = min(height, y + half_size)
+        if x0 >= x1 or y0 >= y1:
+            return None
+        return x0, y0, x1, y1
+
+    def update(self, position: Tuple[int, int], tracked: bool):
+        if self.position is None:
+            self.velocity = (0, 0)
+        else:
+            self.velocity = (position[0] - self.position[0],
+                             position[1] - self.position[1])
+        self.position = position
+        self.frames_tracked = self.frames_tracked + 1 if tracked else 0
+
+    def lose(self):
+        self.position = None
+        self.velocity = (0, 0)
+        self.frames_tracked = 0
@@ -1,10 +1,142 @@
 import cv2
 import time
-from threading import Thread, Lock
+from threading import Condition, Thread, current_thread, get_ident
+from typing import Dict, List, NamedTuple, Optional, TYPE_CHECKING
 import numpy as np
 from mss import mss
 import abc
 
+from airhockey.metrics import latency, GRAB
+
+if TYPE_CHECKING:
+    from airhockey.vision.session import SessionWriter
+
+
+class Frame(NamedTuple):
+    image: np.ndarray
+    sequence: int
+    # time.monotonic() at the moment the frame was grabbed
+    timestamp: float
+
+
+class FrameRing(object):
+    """
+    Preallocated frame buffers shared between a single grabbing thread and
+    any number of readers.
+
+    The grabber writes into the slot returned by acquire() and publishes it
+    with commit(). Readers get a read-only view of the latest slot together
+    with a lease on it: the slot stays pinned until the same thread reads
+    another frame or calls release(), and the grabber skips pinned slots,
+    so a slow reader never sees its frame being overwritten. Readers that
+    keep a frame for longer, or hand it to another thread, must copy it.
+    Readers can also block until a frame newer than the one they have
+    already seen is committed.
+    """
+
+    def __init__(self, slots: int = 4):
+        if slots < 2:
+            raise ValueError("Frame ring needs at least two slots")
+        self.slots = slots
+        self.sequence = 0
+        self._buffers: List[np.ndarray] = []
+        self._views: List[np.ndarray] = []
+        self._pins: List[int] = []
+        self._leases: Dict[int, int] = {}
+        self._index = 0
+        self._latest_index: Optional[int] = None
+        self._latest: Optional[Frame] = None
+        self._condition = Condition()
+
+    def acquire(self, shape, dtype=np.uint8) -> np.ndarray:
+        with self._condition:
+            if not self._buffers or self._buffers[0].shape != tuple(shape) \
+                    or self._buffers[0].dtype != dtype:
+                self._allocate(shape, dtype)
+            self._index = self._free_slot()
+            return self._buffers[self._index]
+
+    def commit(self, timestamp: Optional[float] = None) -> Frame:
+        if timestamp is None:
+            timestamp = time.monotonic()
+        with self._condition:
+            self.sequence += 1
+            frame = Frame(self._views[self._index], self.sequence, timestamp)
+            self._latest = frame
+            self._latest_index = self._index
+            self._condition.notify_all()
+        return frame
+
+    def latest(self) -> Optional[Frame]:
+        with self._condition:
+            return self._lease()
+
+    def wait_newer(
+            self,
+            sequence: int,
+            timeout: Optional[float] = None
+    ) -> Optional[Frame]:
+        """
+        Blocks until a frame with a sequence number greater than the given
+        one is committed. Returns None on timeout.
+        """
+        with self._condition:
+            if not self._condition.wait_for(
+                    lambda: self.sequence > sequence, timeout):
+                return None
+            return self._lease()
+
+    def release(self):
+        """
+        Gives up the lease of the calling thread, if it holds one.
+        """
+        with self._condition:
+            self._release(get_ident())
+
+    def _lease(self) -> Optional[Frame]:
+        reader = get_ident()
+        self._release(reader)
+        if self._latest_index is not None:
+            self._leases[reader] = self._latest_index
+            self._pins[self._latest_index] += 1
+        return self._latest
+
+    def _release(self, reader: int):
+        index = self._leases.pop(reader, None)
+        if index is not None:
+            self._pins[index] -= 1
+
+    def _free_slot(self) -> int:
+        # The slot after the last one written that is neither pinned by a
+        # reader nor holding the latest frame, which a reader may lease
+        # at any moment. When readers pin every other slot the ring grows.
+        for step in range(1, len(self._buffers) + 1):
+            index = (self._index + step) % len(self._buffers)
+            if not self._pins[index] and index != self._latest_index:
+                return index
+        self._add_slot(self._buffers[0].shape, self._buffers[0].dtype)
+        return len(self._buffers) - 1
+
+    def _allocate(self, shape, dtype):
+        # Readers holding views of the old buffers keep them alive, and as
+        # those buffers are never written again their leases are dropped.
+        self._buffers = []
+        self._views = []
+        self._pins = []
+        self._leases = {}
+        self._latest_index = None
+        for _ in range(self.slots):
+            self._add_slot(shape, dtype)
+        self._index = len(self._buffers) - 1
+
+    def _add_slot(self, shape, dtype):
+        buffer = np.zeros(shape, dtype)
+        view = buffer.view()
+        view.flags.writeable = False
+        self._buffers.append(buffer)
+        self._views.append(view)
+        self._pins.append(0)
+
 
 class FrameReader(object):
     __metaclass__ = abc.ABCMeta
@@ -16,6 +148,28 @@ class FrameReader(object):
     @abc.abstractmethod
     def read(self): raise NotImplementedError
 
+    @property
+    def finished(self) -> bool:
+        """
+        Whether the source has run out of frames. Live sources never do.
+        """
+        return False
+
+    def read_next(
+            self,
+            sequence: int,
+            timeout: Optional[float] = None
+    ) -> Optional[Frame]:
+        """
+        Returns a frame newer than the given sequence number, waiting for it
+        at most timeout seconds. Readers that do not number their frames
+        treat every read as a new frame.
+        """
+        image = self.read()
+        if image is None:
+            return None
+        return Frame(image, sequence + 1, time.monotonic())
+
     @abc.abstractmethod
     def stream_fps(self):
         ...
@@ -25,38 +179,33 @@ class FrameReader(object):
         ...
 
 
-class VideoStream(FrameReader):
-    def __init__(self, path, frame_dimensions):
-        super().__init__()
-
-        fps = 30
-        frame_width, frame_height = frame_dimensions
-        self.stream = cv2.VideoCapture(path)
-        self.stream.set(cv2.CAP_PROP_FRAME_WIDTH, frame_width)
-        self.stream.set(cv2.CAP_PROP_FRAME_HEIGHT, frame_height)
-        self.stream.set(cv2.CAP_PROP_FPS, fps)
-
-        real_frame_width = self.stream.get(cv2.CAP_PROP_FRAME_WIDTH)
-        real_frame_height = self.stream.get(cv2.CAP_PROP_FRAME_HEIGHT)
-        real_fps = int(self.stream.get(cv2.CAP_PROP_FPS))
-
-        assert real_frame_width == frame_width, \
-            f"{real_frame_width=} != {frame_width=}"
-        assert real_frame_height == frame_height, \
-            f"{real_frame_height=} != {frame_height=}"
-        assert real_fps == fps, f"{real_fps=} != {fps=}"
+class GrabbingFrameReader(FrameReader):
+    """
+    Grabs frames on a background thread into a FrameRing.
+    """
 
+    def __init__(self, ring_slots: int = 4):
+        super().__init__()
+        self.ring = FrameRing(ring_slots)
         self.stopped = False
-        self.frame = None
         self.time_started = time.time()
         self.has_grabbed_frame = False
-        self.read_lock = Lock()
-        self.has_new_frame = False
+        self.last_read_sequence = 0
+        self.recorder: Optional['SessionWriter'] = None
+        self._thread: Optional[Thread] = None
+
+    @abc.abstractmethod
+    def grab(self) -> bool:
+        """
+        Writes the next frame into self.ring.acquire(...) and returns True
+        when a frame has been grabbed.
+        """
+        raise NotImplementedError
 
     def start(self):
-        t = Thread(target=self.update, args=())
-        t.daemon = True
-        t.start()
+        self._thread = Thread(target=self.update, args=())
+        self._thread.daemon = True
+        self._thread.start()
         self.time_started = time.time()
         return self
 
@@ -65,29 +214,47 @@ class VideoStream(FrameReader):
             if self.stopped:
                 return
 
-            self.has_grabbed_frame, frame = self.stream.read()
-
-            with self.read_lock:
-                self.has_new_frame = True
-                self.frame = frame
-
-            self.frames_grabbed += 1
+            started = time.monotonic()
+            self.has_grabbed_frame = self.grab()
+            if self.has_grabbed_frame:
+                grabbed = time.monotonic()
+                frame = self.ring.commit(grabbed)
+                latency.record(GRAB, grabbed - started)
+                if self.recorder is not None:
+                    self.recorder.write(frame.image, frame.timestamp)
+                self.frames_grabbed += 1
+
+    def read_frame(self) -> Optional[Frame]:
+        return self._count_read(self.ring.latest())
+
+    def read_next(
+            self,
+            sequence: int,
+            timeout: Optional[float] = None
+    ) -> Optional[Frame]:
+        return self._count_read(self.ring.wait_newer(sequence, timeout))
 
     def read(self):
-
-        with self.read_lock:
-            if self.has_new_frame:
-                self.frames_read += 1
-            frame = self.frame.copy()
-            self.has_new_frame = False
-
-        return frame
+        frame = self.read_frame()
+        return None if frame is None else frame.image
 
     def has_frame(self):
         return self.has_grabbed_frame
 
-    def stop(self):
+    def _count_read(self, frame: Optional[Frame]) -> Optional[Frame]:
+        if frame is not None and frame.sequence > self.last_read_sequence:
+            self.last_read_sequence = frame.sequence
+            self.frames_read += 1
+        return frame
+
+    def stop(self, timeout: float = 1.0):
+        """
+        Stops grabbing and waits at most timeout seconds for the frame
+        being grabbed, so nothing is recorded after stop() returns.
+        """
         self.stopped = True
+        if self._thread is not None and self._thread is not current_thread():
+            self._thread.join(timeout)
 
     def stream_fps(self):
         return self.frames_grabbed / (time.time() - self.time_started)
@@ -96,59 +263,53 @@ class VideoStream(FrameReader):
         return self.frames_read / (time.time() - self.time_started)
 
 
-class ScreenCapture(FrameReader):
-    def __init__(self, frame_dimensions):
-        super().__init__()
-        width, height = frame_dimensions
-        self.bounding_box = {'top': 150, 'left': 100, 'width': width / 2,
-                             'height': height / 2}
-        self.sct = mss()
-        self.stopped = False
-        self.frame = None
-        self.time_started = time.time()
-        self.has_grabbed_frame = False
-        self.read_lock = Lock()
-        self.has_new_frame = False
-
-    def start(self):
-        t = Thread(target=self.update, args=())
-        t.daemon = True
-        t.start()
-        self.time_started = time.time()
-        return self
-
-    def update(self):
-        while True:
-            if self.stopped:
-                return
-            sct_img = self.sct.grab(self.bounding_box)
-            frame = np.array(sct_img)
-            self.has_grabbed_frame = True
+class VideoStream(GrabbingFrameReader):
+    def __init__(self, path, frame_dimensions, ring_slots: int = 4):
+        super().__init__(ring_slots)
 
-            with self.read_lock:
-                self.has_new_frame = True
-                self.frame = frame
-
-            self.frames_grabbed += 1
+        fps = 30
+        frame_width, frame_height = frame_dimensions
+        self.stream = cv2.VideoCapture(path)
+        self.stream.set(cv2.CAP_PROP_FRAME_WIDTH, frame_width)
+        self.stream.set(cv2.CAP_PROP_FRAME_HEIGHT, frame_height)
+        self.stream.set(cv2.CAP_PROP_FPS, fps)
 
-    def read(self):
+        real_frame_width = self.stream.get(cv2.CAP_PROP_FRAME_WIDTH)
+        real_frame_height = self.stream.get(cv2.CAP_PROP_FRAME_HEIGHT)
+        real_fps = int(self.stream.get(cv2.CAP_PROP_FPS))
 
-        with self.read_lock:
-            if self.has_new_frame:
-                self.frames_read += 1
-            frame = self.frame.copy()
-            self.has_new_frame = False
+        assert real_frame_width == frame_width, \
+            f"{real_frame_width=} != {frame_width=}"
+        assert real_frame_height == frame_height, \
+            f"{real_frame_height=} != {frame_height=}"
+        assert real_fps == fps, f"{real_fps=} != {fps=}"
 
-        return frame
+        self.frame_shape = (frame_height, frame_width, 3)
 
-    def has_frame(self):
-        return self.has_grabbed_frame
+    def grab(self) -> bool:
+        buffer = self.ring.acquire(self.frame_shape)
+        grabbed, image = self.stream.read(image=buffer)
+        if grabbed and image is not buffer:
+            # The backend has not decoded in place, e.g. the frame size
+            # differs from the requested one.
+            self.frame_shape = image.shape
+            buffer = self.ring.acquire(self.frame_shape)
+            np.copyto(buffer, image)
+        return grabbed
 
-    def stop(self):
-        self.stopped = True
 
-    def stream_fps(self):
-        return self.frames_grabbed / (time.time() - self.time_started)
+class ScreenCapture(GrabbingFrameReader):
+    def __init__(self, frame_dimensions, ring_slots: int = 4):
+        super().__init__(ring_slots)
+        width, height = frame_dimensions
+        self.bounding_box = {'top': 150, 'left': 100, 'width': width / 2,
+                             'height': height / 2}
+        self.sct = mss()
 
-    def read_fps(self):
-        return self.frames_read / (time.time() - self.time_started)
+    def grab(self) -> bool:
+        sct_img = self.sct.grab(self.bounding_box)
+        shape = (sct_img.height, sct_img.width, 4)
+        buffer = self.ring.acquire(shape)
+        np.copyto(buffer,
+                  np.frombuffer(sct_img.raw, np.uint8).reshape(shape))
+        return True
@@ -0,0 +1,25 @@
+import unittest
+
+import numpy as np
+
+from airhockey.simulator.batch import BatchSimulation, run_batch
+from airhockey.strategy import InterceptionRules
+
+
+class TestBatchSimulation(unittest.TestCase):
+    def test_defending_pusher_beats_a_frozen_one(self):
+        rules = InterceptionRules()
+        frozen = BatchSimulation(episodes=300, seed=1, pusher_speed=0) \
+            .run(rules)
+        playing = BatchSimulation(episodes=300, seed=1).run(rules)
+        self.assertGreater(frozen.goals_conceded, 0)
+        self.assertLess(playing.goals_conceded, frozen.goals_conceded)
+        self.assertGreater(playing.hit_rate, frozen.hit_rate)
+        self.assertEqual(playing.hits, len(playing.intercept_times))
+        self.assertTrue(np.all(playing.intercept_times > 0))
+
+    def test_run_batch_merges_workers(self):
+        result = run_batch(InterceptionRules(), episodes=101, workers=2,
+                           seed=2, duration=1.0)
+        self.assertEqual(101, result.episodes)
+        self.assertEqual(result.hits, len(result.intercept_times))
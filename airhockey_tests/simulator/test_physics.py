@@ -0,0 +1,77 @@
+import unittest
+
+import numpy as np
+
+from airhockey.simulator.physics import TableSimulation, bounce
+
+
+class TestTableSimulation(unittest.TestCase):
+    def setUp(self):
+        self.sim = TableSimulation(seed=1)
+        self.sim.set_pusher_target((50, 100))
+        self.sim.pusher_position = (50, 100)
+
+    def test_puck_bounces_off_rail(self):
+        self.sim.puck_position = (800, 100)
+        self.sim.puck_velocity = (0, -1000)
+        for _ in range(20):
+            self.sim.step(1 / 60)
+        self.assertGreater(self.sim.puck_velocity[1], 0)
+        self.assertGreaterEqual(self.sim.puck_position[1],
+                                self.sim.puck_radius)
+        self.assertEqual(1, self.sim.rallies)
+
+    def test_goal_is_conceded_and_puck_served_again(self):
+        self.sim.puck_position = (200, 300)
+        self.sim.puck_velocity = (-1500, 0)
+        for _ in range(20):
+            self.sim.step(1 / 60)
+        self.assertEqual(1, self.sim.goals_conceded)
+        self.assertEqual(2, self.sim.rallies)
+        self.assertLess(self.sim.puck_velocity[0], 0)
+
+    def test_pusher_hits_the_puck_back(self):
+        self.sim.set_pusher_target((200, 300))
+        self.sim.pusher_position = (200, 300)
+        self.sim.puck_position = (400, 300)
+        self.sim.puck_velocity = (-1000, 0)
+        for _ in range(20):
+            self.sim.step(1 / 60)
+        self.assertEqual(1, self.sim.hits)
+        self.assertGreater(self.sim.puck_velocity[0], 0)
+        self.assertEqual(0, self.sim.goals_conceded)
+
+    def test_pusher_stays_in_its_half(self):
+        self.sim.set_pusher_target((1000, -50))
+        for _ in range(60):
+            self.sim.step(1 / 60)
+        self.assertEqual((575, 25), self.sim.pusher_position)
+
+    def test_pusher_follows_a_timed_plan(self):
+        self.sim.puck_position = (1000, 500)
+        self.sim.puck_velocity = (0, 0)
+        self.sim.follow_plan([((150, 100), 0.5, 0.0),
+                              ((150, 400), 0.0, 600.0)])
+        for _ in range(15):
+            self.sim.step(1 / 60)
+        self.assertAlmostEqual(100, self.sim.pusher_position[0], delta=5)
+        for _ in range(15):
+            self.sim.step(1 / 60)
+        self.assertEqual((150, 100), self.sim.pusher_position)
+        for _ in range(30):
+            self.sim.step(1 / 60)
+        self.assertAlmostEqual(400, self.sim.pusher_position[1], delta=11)
+        self.assertEqual((150, 400), self.sim.pusher_target)
+
+
+class TestBounce(unittest.TestCase):
+    def test_floats_and_arrays_bounce_alike(self):
+        positions = np.array([10.0, 300.0, 590.0])
+        velocities = np.array([-100.0, 50.0, 100.0])
+        batched = bounce(positions, velocities, 25, 575, 0.9)
+        np.testing.assert_allclose([[40, 300, 560], [90, 50, -90]], batched)
+        for i in range(3):
+            single = bounce(float(positions[i]), float(velocities[i]),
+                            25, 575, 0.9)
+            np.testing.assert_allclose(single, [batched[0][i],
+                                                batched[1][i]])
@@ -0,0 +1,105 @@
+import socket
+import struct
+import unittest
+
+import cv2
+
+from airhockey.robot import Plan, Waypoint, encode_plan
+from airhockey.simulator.endpoint import SimulatorEndpoint
+from airhockey.simulator.physics import TableSimulation
+from airhockey.simulator.reader import SimulatedFrameReader
+from airhockey.translate import WorldToFrameTranslator
+from airhockey.vision.color import ColorRange, ColorDetector
+
+
+class TestSimulatedFrameReader(unittest.TestCase):
+    video_size = (640, 360)
+    table_size = (1200, 600)
+    puck = ColorRange(name="Puck", h_low=49, h_high=69, sv_low=53)
+    pusher = ColorRange(name="Pusher", h_low=20, h_high=30, sv_low=53)
+    markers = ColorRange(name="Markers", h_low=84, h_high=92, sv_low=53)
+
+    def setUp(self):
+        self.translator = WorldToFrameTranslator(self.video_size,
+                                                 self.table_size)
+        self.simulation = TableSimulation(seed=1)
+        self.endpoint = SimulatorEndpoint(self.simulation, port=0)
+        self.reader = SimulatedFrameReader(
+            self.simulation,
+            video_size=self.video_size,
+            translator=self.translator,
+            puck_color_range=self.puck,
+            pusher_color_range=self.pusher,
+            markers_color_range=self.markers,
+            markers=[(400, -15), (400, 615)],
+            fps=50,
+            endpoint=self.endpoint).start()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.settimeout(1)
+
+    def tearDown(self):
+        self.sock.close()
+        self.endpoint.stop()
+
+    def detect(self, image, color_range, count=1):
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        return [self.translator.f2w(p) for p in
+                ColorDetector(color_range=color_range).get_positions(
+                    hsv, count)]
+
+    def test_frames_follow_the_simulated_clock(self):
+        frame = self.reader.read_next(0)
+        self.assertEqual(1, frame.sequence)
+        nxt = self.reader.read_next(frame.sequence)
+        self.assertAlmostEqual(0.02, nxt.timestamp - frame.timestamp)
+
+        (x, y), = self.detect(nxt.image, self.puck)
+        px, py = self.simulation.puck_position
+        self.assertAlmostEqual(px, x, delta=10)
+        self.assertAlmostEqual(py, y, delta=10)
+        self.assertEqual(2, len(self.detect(nxt.image, self.markers, 2)))
+
+    def test_frames_are_leased_views(self):
+        frame = self.reader.read_next(0)
+        self.assertFalse(frame.image.flags.writeable)
+        nxt = self.reader.read_next(frame.sequence)
+        self.assertIsNot(frame.image.base, nxt.image.base)
+        self.assertIs(nxt.image.base, self.reader.read().base)
+
+    def test_ping_and_moves_over_udp(self):
+        self.endpoint.start()
+        self.sock.sendto(b"ping", self.endpoint.address)
+        data, _ = self.sock.recvfrom(1024)
+        self.assertEqual(b"pong airhockey", data)
+
+        self.sock.sendto(struct.pack("<ii", 300, 200), self.endpoint.address)
+        self.sock.sendto(b"ping", self.endpoint.address)
+        self.sock.recvfrom(1024)
+        self.assertEqual(1, self.endpoint.moves_received)
+
+        frame = self.reader.read_next(0)
+        for _ in range(30):
+            frame = self.reader.read_next(frame.sequence)
+        self.assertEqual((300, 200), self.simulation.pusher_position)
+        (x, y), = self.detect(frame.image, self.pusher)
+        self.assertAlmostEqual(300, x, delta=10)
+        self.assertAlmostEqual(200, y, delta=10)
+
+    def test_endpoint_serves_in_one_mode(self):
+        self.endpoint.poll()
+        self.assertRaises(AssertionError, self.endpoint.start)
+
+        endpoint = SimulatorEndpoint(self.simulation, port=0).start()
+        self.addCleanup(endpoint.stop)
+        self.assertRaises(AssertionError, endpoint.poll)
+
+    def test_stale_plans_are_dropped(self):
+        address = ("localhost", 1)
+        for sequence, target in [(5, (100, 100)), (4, (200, 200)),
+                                 (6, (300, 300)), (2000, (400, 400)),
+                                 (1, (500, 200))]:
+            self.endpoint.handle(
+                encode_plan(Plan(sequence, 0.0, [Waypoint(target)])),
+                address)
+        self.assertEqual(1, self.endpoint.stale_plans)
+        self.assertEqual((500, 200), self.simulation.pusher_target)
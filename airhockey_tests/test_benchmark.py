@@ -0,0 +1,27 @@
+import unittest
+
+import cv2
+
+from airhockey import benchmark
+from airhockey.vision.query import PositionQuery
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_synthetic_frames_are_detected(self):
+        translator, frames = benchmark.synthetic_frames((320, 180), 3)
+        hsv = cv2.cvtColor(frames[0], cv2.COLOR_BGR2HSV)
+        position = PositionQuery(benchmark.PUCK).execute(
+            hsv, translator, None)
+        expected = benchmark.puck_path(3)[0]
+        self.assertAlmostEqual(expected[0], position[0], delta=10)
+        self.assertAlmostEqual(expected[1], position[1], delta=10)
+
+    def test_report(self):
+        report = benchmark.run(resolutions=[(320, 180)], frames=5,
+                               sessions=[])
+        cases = {r["case"] for r in report["results"]}
+        self.assertIn("position_query", cases)
+        self.assertIn("trajectory", cases)
+        for result in report["results"]:
+            self.assertEqual(5, result["frames"])
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
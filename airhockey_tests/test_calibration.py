@@ -0,0 +1,185 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import airhockey
+from airhockey.calibration import Calibration, load_calibration
+from airhockey.handlers.detect_table import DetectTableHandler
+from airhockey.handlers.restore_calibration import RestoreCalibrationHandler
+from airhockey.robot import LinkStats
+from airhockey.translate import WorldToFrameTranslator
+from airhockey.vision.color import ColorRange
+from airhockey.vision.query import VerifyPositionQuery
+from airhockey_tests.helpers import init_spy_log_handler, QueryContextMock
+
+VIDEO_SIZE = (1280, 720)
+MARKERS = [(400, -15), (400, 615)]
+
+
+class TestCalibration(unittest.TestCase):
+    def setUp(self):
+        self.translator = WorldToFrameTranslator(VIDEO_SIZE, (1200, 600))
+        self.translator.set_world_to_frame([[1, 0, 10], [0, 1, 20],
+                                            [0, 0, 1]])
+        self.puck = ColorRange(name="Puck", h_low=40, h_high=60, sv_low=50)
+        self.calibration = Calibration.capture(
+            translator=self.translator, color_ranges=[self.puck],
+            markers=MARKERS, video_size=VIDEO_SIZE)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "calibration.json")
+
+    def test_saved_calibration_loads_back(self):
+        self.calibration.save(self.path)
+        self.assertEqual(self.calibration, Calibration.load(self.path))
+
+        calibration = Calibration.capture(
+            translator=self.translator, color_ranges=[self.puck],
+            markers=MARKERS, video_size=VIDEO_SIZE, latency=0.05,
+            link_stats=LinkStats(0.004, 0.001, 0.0, 0.1, 20))
+        calibration.save(self.path)
+        self.assertEqual(calibration, Calibration.load(self.path))
+
+    def test_latency_parameters_are_optional(self):
+        self.calibration.save(self.path)
+        with open(self.path) as f:
+            data = json.load(f)
+        for name in ("latency", "link_rtt", "link_jitter"):
+            del data[name]
+        with open(self.path, "w") as f:
+            json.dump(data, f)
+        self.assertEqual(self.calibration, Calibration.load(self.path))
+
+    def test_estimated_latency(self):
+        self.assertEqual(0.0, self.calibration.estimated_latency())
+        measured = self.calibration._replace(link_rtt=0.008)
+        self.assertEqual(0.004, measured.estimated_latency())
+        self.assertEqual(
+            0.05, measured._replace(latency=0.05).estimated_latency())
+
+    def test_applies_matrix_and_color_ranges(self):
+        translator = WorldToFrameTranslator(VIDEO_SIZE, (1200, 600))
+        puck = ColorRange(name="Puck", h_low=1, h_high=2, sv_low=3)
+        other = ColorRange(name="Other", h_low=1, h_high=2, sv_low=3)
+        self.calibration.apply(translator=translator,
+                               color_ranges=[puck, other])
+        np.testing.assert_array_equal(self.translator.world_to_frame,
+                                      translator.world_to_frame)
+        self.assertEqual((40, 60, 50), puck.bounds)
+        self.assertEqual((1, 2, 3), other.bounds)
+
+    def test_matches_setup(self):
+        self.assertTrue(self.calibration.matches(video_size=VIDEO_SIZE,
+                                                 markers=MARKERS))
+        self.assertFalse(self.calibration.matches(video_size=(640, 480),
+                                                  markers=MARKERS))
+        self.assertFalse(self.calibration.matches(video_size=VIDEO_SIZE,
+                                                  markers=MARKERS[:1]))
+
+    def test_unusable_files_are_ignored(self):
+        self.assertIsNone(load_calibration(self.path))
+        self.calibration.save(self.path)
+        with open(self.path) as f:
+            data = json.load(f)
+        data["version"] = 0
+        with open(self.path, "w") as f:
+            json.dump(data, f)
+        with self.assertRaises(ValueError):
+            Calibration.load(self.path)
+        self.assertIsNone(load_calibration(self.path))
+
+
+class TestRestoreCalibrationHandler(unittest.TestCase):
+    class DetectTable(DetectTableHandler):
+        def __call__(self):
+            self.called = True
+            return self.SUCCESS
+
+    def setUp(self):
+        self.log_spy = init_spy_log_handler(
+            airhockey.handlers.restore_calibration.__name__)
+        self.query_context = QueryContextMock()
+        self.translator = WorldToFrameTranslator(VIDEO_SIZE, (1200, 600))
+        self.markers_color_range = ColorRange(name="Table Markers",
+                                              h_low=84, h_high=92,
+                                              sv_low=53)
+        self.detect_table = self.DetectTable(
+            expected_markers=MARKERS, color_range=self.markers_color_range,
+            vision_query_context=self.query_context, tries=1, delay=0,
+            success_retries=1, translator=self.translator)
+        self.detect_table.called = False
+        self.cached = self.translator.world_to_frame.copy()
+        self.cached[0, 2] += 5
+        self.calibration = Calibration(
+            video_size=VIDEO_SIZE, markers=MARKERS,
+            world_to_frame=self.cached.tolist(),
+            color_ranges={"Table Markers": (80, 90, 50)})
+
+    def make_handler(self, calibration, **kwargs):
+        return RestoreCalibrationHandler(
+            calibration=calibration, path=None,
+            detect_table=self.detect_table, translator=self.translator,
+            color_ranges=[self.markers_color_range], video_size=VIDEO_SIZE,
+            **kwargs)
+
+    def test_verified_calibration_is_restored(self):
+        self.query_context.mock_query_results([VerifyPositionQuery.SUCCESS])
+        handler = self.make_handler(self.calibration)
+        self.assertEqual(RestoreCalibrationHandler.SUCCESS, handler())
+        self.assertFalse(self.detect_table.called)
+        self.assertEqual(1, self.query_context.call_count)
+        np.testing.assert_array_equal(self.cached,
+                                      self.translator.world_to_frame)
+        self.assertEqual((80, 90, 50), self.markers_color_range.bounds)
+        self.assertEqual(["Calibration restored."], self.log_spy.messages)
+
+    def test_table_detected_when_calibration_does_not_match(self):
+        default = self.translator.world_to_frame.copy()
+        self.query_context.mock_query_results(
+            [VerifyPositionQuery.OUT_OF_POSITION])
+        handler = self.make_handler(self.calibration)
+        self.assertEqual(RestoreCalibrationHandler.SUCCESS, handler())
+        self.assertTrue(self.detect_table.called)
+        np.testing.assert_array_equal(default,
+                                      self.translator.world_to_frame)
+        self.assertEqual((84, 92, 53), self.markers_color_range.bounds)
+        self.assertEqual(["Table does not match the calibration cache."],
+                         self.log_spy.messages)
+
+    def test_implausible_cache_is_not_applied(self):
+        skewed = self.translator.world_to_frame.copy()
+        skewed[0, 2] += 500
+        self.query_context.mock_query_results([])
+        handler = self.make_handler(
+            self.calibration._replace(world_to_frame=skewed.tolist()))
+        self.assertEqual(RestoreCalibrationHandler.SUCCESS, handler())
+        self.assertTrue(self.detect_table.called)
+        self.assertEqual(0, self.query_context.call_count)
+        self.assertEqual(["Calibration cache is implausible."],
+                         self.log_spy.messages)
+
+    def test_table_detected_without_cache(self):
+        self.query_context.mock_query_results([])
+        handler = self.make_handler(None)
+        self.assertEqual(RestoreCalibrationHandler.SUCCESS, handler())
+        self.assertTrue(self.detect_table.called)
+        self.assertEqual(0, self.query_context.call_count)
+
+    def test_saved_calibration_keeps_latency_parameters(self):
+        class Link(object):
+            def __init__(self, rtt):
+                self.rtt = rtt
+
+            def stats(self):
+                return LinkStats(self.rtt, self.rtt and 0.001, 0.0, 0.1, 5)
+
+        cached = self.calibration._replace(latency=0.05, link_rtt=0.01,
+                                           link_jitter=0.002)
+        handler = self.make_handler(cached, link=Link(None))
+        self.assertEqual((0.05, 0.01, 0.002), handler._capture()[-3:])
+
+        handler = self.make_handler(cached, latency=0.03, link=Link(0.004))
+        self.assertEqual((0.03, 0.004, 0.001), handler._capture()[-3:])
@@ -1,3 +1,4 @@
+import asyncio
 import socket
 import threading
 import unittest
@@ -76,3 +77,57 @@ class TestCheckNetworkHandler(unittest.TestCase):
             f"Pinging {self.robot_host}:{self.robot_port}...",
             "Ping OK.",
         ], self.log_spy.messages)
+
+
+class TestCheckNetworkHandlerWithLink(unittest.TestCase):
+    class Link(object):
+        def __init__(self, results):
+            self.results = results
+
+        def wait_healthy(self, timeout):
+            return self.results.pop(0)
+
+    def setUp(self):
+        self.log_spy = init_spy_log_handler(
+            airhockey.handlers.check_network.__name__)
+
+    def testWaitsForHealthyLink(self):
+        handler = CheckNetworkHandler(
+            host="robot", port=1, tries=3, delay=0.1,
+            link=self.Link([False, True]))
+        self.assertEqual(CheckNetworkHandler.SUCCESS, handler())
+        self.assertEqual([
+            "Pinging robot:1...",
+            "Failed.",
+            "Pinging robot:1...",
+            "Ping OK.",
+        ], self.log_spy.messages)
+
+    def testCancelledCheckStopsAfterTheTryInFlight(self):
+        class BlockingLink(object):
+            def __init__(self):
+                self.waiting = threading.Event()
+                self.release = threading.Event()
+                self.calls = 0
+
+            def wait_healthy(self, timeout):
+                self.calls += 1
+                self.waiting.set()
+                self.release.wait(5)
+                return False
+
+        link = BlockingLink()
+        handler = CheckNetworkHandler(host="robot", port=1, tries=500,
+                                      delay=5, link=link)
+
+        async def cancel_while_pinging():
+            task = asyncio.ensure_future(handler.run_async())
+            await asyncio.to_thread(link.waiting.wait, 5)
+            task.cancel()
+            link.release.set()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        # asyncio.run() waits for the worker thread of the try in flight.
+        asyncio.run(cancel_while_pinging())
+        self.assertEqual(1, link.calls)
@@ -1,6 +1,10 @@
+import asyncio
+import threading
+import time
 import unittest
 
-from airhockey.controller import Controller, RunHandlerException
+from airhockey.controller import (AsyncController, Controller,
+                                  ParallelHandler, RunHandlerException)
 
 
 def foo_handler():
@@ -45,3 +49,95 @@ class TestStateHandler(unittest.TestCase):
         c.register_handler("state", foo_handler, {"foo": "FakeState"})
         with self.assertRaises(RunHandlerException):
             c.run()
+
+
+class TestAsyncController(unittest.TestCase):
+    def test_runs_blocking_and_coroutine_handlers(self):
+        async def coroutine_handler():
+            return "foo"
+
+        class RunAsyncHandler(object):
+            def __call__(self):
+                raise AssertionError("Blocking call of an async handler")
+
+            async def run_async(self):
+                return "bar"
+
+        executed = []
+
+        def blocking_handler():
+            executed.append(True)
+
+        c = AsyncController("state", "done")
+        c.register_handler("state", coroutine_handler, {"foo": "next"})
+        c.register_handler("next", RunAsyncHandler(), {"bar": "done"})
+        c.register_handler("done", blocking_handler)
+        asyncio.run(c.run())
+        self.assertEqual("done", c.get_state())
+        self.assertEqual([True], executed)
+
+    def test_exception_raised_when_multiple_handlers_return_new_state(self):
+        c = AsyncController("state", "state")
+        c.register_handler("state", foo_handler, {"foo": "FakeState"})
+        c.register_handler("state", foo_handler, {"foo": "FakeState"})
+        with self.assertRaises(RunHandlerException):
+            asyncio.run(c.run())
+
+    def test_blocking_handler_exception_is_raised(self):
+        def failing_handler():
+            raise ValueError("boom")
+
+        c = AsyncController("state", "state")
+        c.register_handler("state", failing_handler)
+        with self.assertRaises(ValueError):
+            asyncio.run(c.run())
+
+
+def sleeping_handler(seconds, result="ok"):
+    async def handler():
+        await asyncio.sleep(seconds)
+        return result
+    return handler
+
+
+class TestParallelHandler(unittest.TestCase):
+    def test_branches_run_concurrently(self):
+        # Each stage waits for the other one, they only pass together.
+        barrier = threading.Barrier(2, timeout=5)
+
+        def meeting_handler():
+            barrier.wait()
+            return "ok"
+
+        handler = ParallelHandler([
+            [("a", meeting_handler, "ok"),
+             ("b", foo_handler, "foo")],
+            [("c", meeting_handler, "ok")],
+        ])
+        self.assertEqual(ParallelHandler.SUCCESS,
+                         asyncio.run(handler.run_async()))
+        self.assertEqual({"a", "b", "c"}, set(handler.timings))
+
+    def test_failed_stage_cancels_other_branches(self):
+        handler = ParallelHandler([
+            [("a", sleeping_handler(0, "failed"), "ok"),
+             ("b", foo_handler, "foo")],
+            [("c", sleeping_handler(10), "ok")],
+        ])
+        started = time.monotonic()
+        self.assertEqual(ParallelHandler.FAIL,
+                         asyncio.run(handler.run_async()))
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual({"a"}, set(handler.timings))
+
+    def test_controller_joins_parallel_state(self):
+        handler = ParallelHandler([[("a", foo_handler, "foo")],
+                                   [("b", foo_handler, "foo")]])
+        c = AsyncController("startup", "done")
+        c.register_handler("startup", handler,
+                           {ParallelHandler.SUCCESS: "done"})
+        c.register_handler("done", none_handler)
+        asyncio.run(c.run())
+        self.assertEqual("done", c.get_state())
+        self.assertEqual(["startup", "done"],
+                         [state for state, _ in c.timings])
@@ -0,0 +1,152 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+import cv2
+import numpy as np
+
+from airhockey.debug import (DebugWindow, MemoryDebugSink, VideoDebugSink,
+                             color_preview)
+from airhockey.translate import WorldToFrameTranslator
+from airhockey.vision.color import ColorRange
+from airhockey.vision.session import Session
+from airhockey.vision.video import FrameReader
+
+
+class CircleQuery(object):
+    def draw(self, debug_window):
+        debug_window.draw_circles([(600, 300), (0, 0)], (60, 255, 255))
+
+
+class TestDebugWindow(unittest.TestCase):
+    def setUp(self):
+        for name in ("namedWindow", "resizeWindow", "createTrackbar",
+                     "waitKey"):
+            patcher = patch("airhockey.debug.cv2." + name)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch("airhockey.debug.cv2.imshow")
+        self.imshow = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.frame_reader = FrameReader()
+        self.frame_reader.stream_fps = MagicMock(return_value=30)
+        self.frame_reader.read_fps = MagicMock(return_value=30)
+        self.frame = np.zeros((360, 640, 3), np.uint8)
+
+    def make_window(self, **kwargs):
+        window = DebugWindow(
+            name="test", log="test",
+            translator=WorldToFrameTranslator((640, 360), (1200, 600)),
+            table_size=(1200, 600), color_ranges=[], **kwargs)
+        self.addCleanup(window.close)
+        return window
+
+    def draw(self, window, times):
+        for _ in range(times):
+            window.set_frame(self.frame, None)
+            window.draw([CircleQuery()], self.frame_reader)
+
+    def test_renders_query_overlays(self):
+        window = self.make_window()
+        self.draw(window, 1)
+        self.imshow.assert_called_once()
+        canvas = self.imshow.call_args[0][1]
+        self.assertEqual((660, 940, 3), canvas.shape)
+        self.assertTrue(canvas[180, 320].any())
+        self.assertFalse(self.frame.any())
+
+    def test_rate_is_capped(self):
+        window = self.make_window(max_fps=1)
+        self.draw(window, 10)
+        self.assertEqual(1, self.imshow.call_count)
+
+    def test_threaded_rendering_uses_frame_copy(self):
+        window = self.make_window(threaded=True)
+        self.draw(window, 1)
+        self.frame[:] = 255
+        window.close()
+        self.imshow.assert_called_once()
+        self.assertFalse(self.imshow.call_args[0][1][300, 600].any())
+
+    def test_threaded_window_shows_on_caller_thread(self):
+        threads = []
+        self.imshow.side_effect = \
+            lambda *args: threads.append(threading.current_thread())
+        window = self.make_window(threaded=True)
+        self.draw(window, 20)
+        window.close()
+        self.assertTrue(threads)
+        self.assertEqual({threading.current_thread()}, set(threads))
+
+    def test_color_previews_are_cached_until_range_changes(self):
+        color_range = ColorRange(name="puck", h_low=49, h_high=69, sv_low=53)
+        window = self.make_window()
+        window.color_ranges = [color_range]
+        target = np.zeros((200, 300, 3), np.uint8)
+        with patch("airhockey.debug.color_preview",
+                   wraps=color_preview) as preview:
+            window.draw_color_previews(target, 0)
+            window.draw_color_previews(target, 0)
+            self.assertEqual(1, preview.call_count)
+            color_range.set_h_high(70)
+            window.draw_color_previews(target, 0)
+            self.assertEqual(2, preview.call_count)
+
+    def test_color_preview_matches_hsv_ramp(self):
+        r = ColorRange(name="puck", h_low=49, h_high=69, sv_low=53)
+        expected = np.zeros((50, 200, 3), np.uint8)
+        for row in range(0, 50):
+            sv = r.sv_low + (255 - r.sv_low) / 50 * row
+            for col in range(0, 200):
+                h = r.h_low + (r.h_high - r.h_low) / 200 * col
+                expected[row, col] = [h, sv, sv]
+        np.testing.assert_array_equal(
+            cv2.cvtColor(expected, cv2.COLOR_HSV2BGR),
+            color_preview(r, 200, 50))
+
+
+class TestRecordingSinks(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.frame_reader = FrameReader()
+        self.frame_reader.stream_fps = MagicMock(return_value=30)
+        self.frame_reader.read_fps = MagicMock(return_value=30)
+        self.options = dict(
+            log="test",
+            translator=WorldToFrameTranslator((320, 180), (1200, 600)),
+            table_size=(1200, 600), color_ranges=[])
+
+    def draw(self, sink, frames):
+        for i in range(frames):
+            sink.set_frame(np.full((180, 320, 3), i, np.uint8), None)
+            sink.draw([CircleQuery()], self.frame_reader)
+
+    def test_memory_sink_keeps_latest_frames(self):
+        sink = MemoryDebugSink(size=3, **self.options)
+        self.draw(sink, 5)
+        sink.close()
+        self.assertEqual([2, 3, 4],
+                         [int(f[0, 0, 0]) for f, _ in sink.frames])
+
+        path = os.path.join(self.directory, "ring.bin")
+        sink.save(path)
+        session = Session(path)
+        self.assertEqual(3, len(session))
+        self.assertEqual((180, 320, 3), session.shape)
+        self.assertEqual(4, int(session.images[2][0, 0, 0]))
+
+    def test_video_sink_encodes_frames(self):
+        path = os.path.join(self.directory, "debug.avi")
+        sink = VideoDebugSink(path=path, threaded=True, **self.options)
+        self.draw(sink, 3)
+        sink.close()
+        capture = cv2.VideoCapture(path)
+        ok, frame = capture.read()
+        capture.release()
+        self.assertTrue(ok)
+        self.assertEqual((480, 620, 3), frame.shape)
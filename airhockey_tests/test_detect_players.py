@@ -1,3 +1,4 @@
+import asyncio
 from unittest import TestCase
 
 import airhockey
@@ -99,3 +100,15 @@ class TestDetectPlayersHandler(TestCase):
             "Puck OK.",
             "Robot pusher OK."
         ], self.log_spy.messages)
+
+    def test_runs_on_event_loop(self):
+        self.handler.delay = 0.01
+        self.query_context.mock_query_results([
+            VerifyPresenceQuery.NOT_PRESENT,  # puck
+            VerifyPresenceQuery.NOT_PRESENT,  # robot pusher
+            VerifyPresenceQuery.PRESENT,  # puck
+            VerifyPresenceQuery.PRESENT,  # robot pusher
+        ])
+        handler_result = asyncio.run(self.handler.run_async())
+        self.assertEqual(DetectPlayersHandler.SUCCESS, handler_result)
+        self.assertEqual(4, self.query_context.call_count)
@@ -7,6 +7,7 @@ from airhockey.vision.video import FrameReader
 from airhockey.vision.color import ColorRange
 from airhockey.vision.query import QueryContext, VerifyPositionQuery
 from airhockey.handlers.detect_table import DetectTableHandler
+from airhockey.translate import WorldToFrameTranslator
 from airhockey_tests.helpers import init_spy_log_handler
 
 
@@ -15,7 +16,7 @@ class TestDetectTableHandler(unittest.TestCase):
         self.log_spy = init_spy_log_handler(
             airhockey.handlers.detect_table.__name__)
 
-    def make_detect_table_handler(self, *, tries, delay):
+    def make_detect_table_handler(self, *, tries, delay, translator=None):
         self.grabbed_frame = numpy.zeros((100, 100, 3), numpy.uint8)
         self.frame_reader = FrameReader()
         self.frame_reader.read = MagicMock(return_value=self.grabbed_frame)
@@ -30,7 +31,8 @@ class TestDetectTableHandler(unittest.TestCase):
             vision_query_context=self.query_context,
             tries=tries,
             delay=delay,
-            success_retries=3
+            success_retries=3,
+            translator=translator
         )
 
     def test_handler_returns_failure_when_no_markers_detected(self):
@@ -106,3 +108,29 @@ class TestDetectTableHandler(unittest.TestCase):
             ],
             self.log_spy.messages
         )
+
+    def test_calibrates_translator_when_markers_are_out_of_position(self):
+        translator = WorldToFrameTranslator((1280, 720), (1200, 600))
+        self.make_detect_table_handler(tries=1, delay=0,
+                                       translator=translator)
+
+        def detect_shifted_markers(query):
+            query.detected_frame_positions = [(660, 674), (52, 572)]
+            query.detected_positions = [
+                translator.f2w(f) for f in query.detected_frame_positions]
+            return VerifyPositionQuery.OUT_OF_POSITION
+
+        self.query_context.query = MagicMock(
+            side_effect=detect_shifted_markers)
+        self.assertEqual(DetectTableHandler.FAIL, self.detect_table_handler())
+        self.assertEqual(
+            [
+                "Detecting table...",
+                "Table markers are out of position.",
+                "Table calibrated from markers, error 0.0px.",
+            ],
+            self.log_spy.messages
+        )
+        x, y = translator.f2w((660, 674))
+        self.assertAlmostEqual(600, x, delta=0.01)
+        self.assertAlmostEqual(600, y, delta=0.01)
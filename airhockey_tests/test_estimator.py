@@ -0,0 +1,43 @@
+import unittest
+
+from airhockey.estimator import PuckStateEstimator
+
+
+class TestPuckStateEstimator(unittest.TestCase):
+    def track(self, estimator, start, velocity, frames, fps=60.0, t0=0.0):
+        for i in range(frames):
+            t = t0 + i / fps
+            estimator.update((start[0] + velocity[0] * t,
+                              start[1] + velocity[1] * t), t)
+        return t0 + (frames - 1) / fps
+
+    def test_velocity_converges(self):
+        estimator = PuckStateEstimator()
+        self.track(estimator, (1000, 100), (-600, 300), 20)
+        vx, vy = estimator.velocity
+        self.assertAlmostEqual(-600, vx, delta=5)
+        self.assertAlmostEqual(300, vy, delta=5)
+
+    def test_predict_ahead(self):
+        estimator = PuckStateEstimator()
+        t = self.track(estimator, (1000, 100), (-600, 300), 20)
+        (x, y), _ = estimator.predict(t + 0.1)
+        self.assertAlmostEqual(1000 - 600 * (t + 0.1), x, delta=2)
+        self.assertAlmostEqual(100 + 300 * (t + 0.1), y, delta=2)
+
+    def test_missing_positions_coast(self):
+        estimator = PuckStateEstimator()
+        t = self.track(estimator, (1000, 100), (-600, 0), 20)
+        estimator.update(None, t + 0.05)
+        self.assertTrue(estimator.initialized)
+        estimator.update(None, t + 1)
+        self.assertFalse(estimator.initialized)
+        self.assertIsNone(estimator.predict(t + 1))
+
+    def test_follows_bounce(self):
+        estimator = PuckStateEstimator()
+        t = self.track(estimator, (600, 300), (0, 600), 20)
+        y = 300 + 600 * t
+        for i in range(1, 6):
+            estimator.update((600, y - 600 * i / 60), t + i / 60)
+        self.assertLess(estimator.velocity[1], -400)
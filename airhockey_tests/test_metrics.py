@@ -0,0 +1,37 @@
+import unittest
+
+from airhockey.metrics import LatencyStats, DETECT, GRAB
+
+
+class TestLatencyStats(unittest.TestCase):
+    def test_no_percentiles_without_samples(self):
+        self.assertIsNone(LatencyStats().percentiles(GRAB))
+        self.assertEqual({}, LatencyStats().summary())
+
+    def test_percentiles_in_milliseconds(self):
+        stats = LatencyStats()
+        for i in range(1, 101):
+            stats.record(DETECT, i / 1000)
+        p = stats.percentiles(DETECT)
+        self.assertEqual(100, p["count"])
+        self.assertAlmostEqual(50.5, p["p50"])
+        self.assertAlmostEqual(95.05, p["p95"])
+        self.assertAlmostEqual(99.01, p["p99"])
+        self.assertAlmostEqual(100, p["max"])
+
+    def test_keeps_only_latest_samples(self):
+        stats = LatencyStats(window=10)
+        for i in range(10):
+            stats.record(GRAB, 1)
+        for i in range(10):
+            stats.record(GRAB, 0.002)
+        p = stats.percentiles(GRAB)
+        self.assertEqual(20, p["count"])
+        self.assertAlmostEqual(2, p["max"])
+
+    def test_summary_follows_pipeline_order(self):
+        stats = LatencyStats()
+        stats.record(DETECT, 0.001)
+        with stats.measure(GRAB):
+            pass
+        self.assertEqual([GRAB, DETECT], list(stats.summary().keys()))
@@ -0,0 +1,56 @@
+import itertools
+import unittest
+
+from airhockey.pipeline import LatestQueue, Pipeline, QueueClosed
+
+
+class TestLatestQueue(unittest.TestCase):
+    def test_drops_oldest(self):
+        queue = LatestQueue(2)
+        for i in range(5):
+            queue.put(i)
+        self.assertEqual(3, queue.dropped)
+        self.assertEqual(3, queue.get())
+        self.assertEqual(4, queue.get())
+        self.assertIsNone(queue.get(timeout=0.01))
+
+    def test_closed_queue_is_drained_first(self):
+        queue = LatestQueue()
+        queue.put(1)
+        queue.close()
+        self.assertEqual(1, queue.get())
+        with self.assertRaises(QueueClosed):
+            queue.get()
+        with self.assertRaises(QueueClosed):
+            queue.put(2)
+
+
+class TestPipeline(unittest.TestCase):
+    def test_stages_process_items_in_order(self):
+        results = []
+        counter = itertools.count(1)
+
+        def source():
+            i = next(counter)
+            return i if i < 10 else None
+
+        def collect(item):
+            results.append(item)
+            if item == 18:
+                pipeline.stop()
+
+        pipeline = Pipeline(source, [
+            ("double", lambda i: i * 2),
+            ("skip_tens", lambda i: None if i % 10 == 0 else i),
+            ("collect", collect),
+        ], queue_size=10)
+        pipeline.run()
+        self.assertEqual([2, 4, 6, 8, 12, 14, 16, 18], results)
+
+    def test_stage_error_is_raised(self):
+        def fail(item):
+            raise ValueError(item)
+
+        pipeline = Pipeline(lambda: 7, [("fail", fail)])
+        with self.assertRaises(ValueError):
+            pipeline.run()
@@ -0,0 +1,69 @@
+import unittest
+from typing import Optional
+
+from airhockey.handlers.play_game import PlayGameHandler
+from airhockey.robot import Robot
+from airhockey.vision.color import ColorRange
+from airhockey_tests.helpers import QueryContextMock
+
+
+class RobotSpy(Robot):
+    def __init__(self):
+        self.destinations = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def follow(
+            self,
+            waypoints,
+            frame_timestamp: Optional[float] = None,
+            frame_sequence: Optional[int] = None
+    ):
+        self.destinations.append(waypoints[-1].position)
+
+
+class EndingFrameReader(object):
+    def __init__(self, context: QueryContextMock, frames: int):
+        self.context = context
+        self.frames = frames
+
+    @property
+    def finished(self):
+        return self.context.context_enter_count >= self.frames
+
+
+class TestPlayGameHandler(unittest.TestCase):
+    def setUp(self):
+        self.robot = RobotSpy()
+        self.query_context = QueryContextMock()
+        self.query_context.frame_reader = EndingFrameReader(
+            self.query_context, 3)
+        self.query_context.frame_timestamp = None
+        self.query_context.frame_sequence = 0
+        self.query_context.mock_query_results([(600, 300), (50, 300)] * 3)
+
+    def make_handler(self, **kwargs):
+        return PlayGameHandler(
+            robot=self.robot,
+            vision_query_context=self.query_context,
+            puck_color_range=ColorRange(
+                name="puck", h_low=1, h_high=2, sv_low=3),
+            pusher_color_range=ColorRange(
+                name="pusher", h_low=4, h_high=5, sv_low=6),
+            puck_workspace=(0, 1200),
+            safe_position=(50, 300),
+            **kwargs)
+
+    def test_game_ends_with_the_video(self):
+        self.assertEqual(PlayGameHandler.SUCCESS, self.make_handler()())
+        self.assertEqual(3, self.query_context.context_enter_count)
+        self.assertEqual([(50, 300)], self.robot.destinations)
+
+    def test_pipelined_game_ends_with_the_video(self):
+        handler = self.make_handler(pipelined=True)
+        self.assertEqual(PlayGameHandler.SUCCESS, handler())
+        self.assertEqual(3, self.query_context.context_enter_count)
@@ -0,0 +1,232 @@
+import socket
+import struct
+import threading
+import time
+import unittest
+
+from airhockey.metrics import END_TO_END, latency
+from airhockey.robot import (CoalescingRobot, PLANS, Plan, Robot, RobotLink,
+                             Waypoint, decode_plan, encode_plan)
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class RobotTestCase(unittest.TestCase):
+    def setUp(self):
+        self.receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.receiver.bind(("localhost", 0))
+        self.receiver.settimeout(0.01)
+        self.address = self.receiver.getsockname()
+
+    def tearDown(self):
+        self.receiver.close()
+
+    def messages(self):
+        messages = []
+        try:
+            while True:
+                messages.append(self.receiver.recv(1024))
+        except socket.timeout:
+            return messages
+
+
+class TestPlanProtocol(RobotTestCase):
+    def test_plan_round_trip(self):
+        plan = Plan(7, 12.5, [Waypoint((100, 200)),
+                              Waypoint((300, 50), 0.25, 800.0)])
+        self.assertEqual(plan, decode_plan(encode_plan(plan)))
+
+    def test_bad_plans_are_rejected(self):
+        message = encode_plan(Plan(1, 0.0, [Waypoint((1, 2))]))
+        for bad in [message[:10], message[:-1], b"XX" + message[2:],
+                    message[:2] + b"\x09" + message[3:]]:
+            with self.assertRaises(ValueError):
+                decode_plan(bad)
+        with self.assertRaises(ValueError):
+            encode_plan(Plan(1, 0.0, []))
+
+    def test_robot_sends_numbered_plans(self):
+        robot = Robot(host=self.address[0], port=self.address[1],
+                      protocol=PLANS)
+        with robot:
+            robot.move((100, 200))
+            robot.follow([Waypoint((150, 250), 0.1),
+                          Waypoint((200, 300), 0.2)])
+        first, second = [decode_plan(m) for m in self.messages()]
+        self.assertEqual((1, [Waypoint((100, 200))]),
+                         (first.sequence, first.waypoints))
+        self.assertEqual(2, second.sequence)
+        self.assertEqual(2, len(second.waypoints))
+        self.assertGreaterEqual(second.timestamp, first.timestamp)
+        self.assertEqual((200, 300), robot.destination)
+
+    def test_legacy_robot_sends_the_first_waypoint(self):
+        with Robot(host=self.address[0], port=self.address[1]) as robot:
+            robot.follow([Waypoint((150, 250), 0.1),
+                          Waypoint((200, 300), 0.2)])
+        self.assertEqual([struct.pack("<ii", 150, 250)], self.messages())
+
+
+class TestCoalescingRobot(RobotTestCase):
+    def setUp(self):
+        super().setUp()
+        self.clock = FakeClock()
+        host, port = self.address
+        self.robot = CoalescingRobot(host=host, port=port, min_delta=5,
+                                     significant_delta=50, max_rate=10,
+                                     clock=self.clock)
+
+    def received(self):
+        return [struct.unpack("<ii", m) for m in self.messages()]
+
+    def test_small_changes_are_coalesced(self):
+        with self.robot:
+            self.robot.move((100, 100))
+            self.clock.now = 1
+            self.robot.move((102, 103))
+            self.robot.move((100, 96))
+        self.assertEqual([(100, 100)], self.received())
+        self.assertEqual(1, self.robot.sent)
+        self.assertEqual(2, self.robot.suppressed)
+
+    def test_send_rate_is_capped_unless_the_target_jumps(self):
+        with self.robot:
+            self.robot.move((100, 100))
+            self.clock.now = 0.05
+            self.robot.move((120, 100))
+            self.robot.move((200, 100))
+            self.clock.now = 0.1
+            self.robot.move((220, 100))
+            self.clock.now = 0.2
+            self.robot.move((230, 100))
+        self.assertEqual([(100, 100), (200, 100), (230, 100)],
+                         self.received())
+        self.assertEqual(2, self.robot.suppressed)
+        self.assertEqual((230, 100), self.robot.destination)
+
+    def test_flush_sends_the_held_back_target(self):
+        with self.robot:
+            self.robot.move((100, 100), frame_sequence=1)
+            self.robot.move((120, 100), frame_sequence=2)
+            self.assertEqual(1, self.robot.frame_sequence)
+            self.clock.now = 0.1
+            self.robot.flush()
+            self.robot.flush()
+        self.assertEqual([(100, 100), (120, 100)], self.received())
+        self.assertEqual(2, self.robot.sent)
+        self.assertEqual(2, self.robot.frame_sequence)
+
+    def test_flush_keeps_the_send_rate(self):
+        with self.robot:
+            self.robot.move((100, 100))
+            self.clock.now = 0.05
+            self.robot.move((120, 100))
+            self.robot.flush()
+            self.assertIsNotNone(self.robot.pending)
+            self.clock.now = 0.1
+            self.robot.flush()
+            self.assertIsNone(self.robot.pending)
+            self.robot.move((130, 100))
+            self.robot.flush(force=True)
+        self.assertEqual([(100, 100), (120, 100), (130, 100)],
+                         self.received())
+
+    def test_flushed_plans_keep_their_arrival_time(self):
+        host, port = self.address
+        robot = CoalescingRobot(host=host, port=port, protocol=PLANS,
+                                max_rate=10, clock=self.clock)
+        with robot:
+            robot.move((100, 100))
+            self.clock.now = 0.05
+            robot.follow([Waypoint((120, 100), 0.5)])
+            self.clock.now = 0.15
+            robot.flush()
+        _, flushed = [decode_plan(m) for m in self.messages()]
+        self.assertAlmostEqual(0.4, flushed.waypoints[0].time)
+
+    def test_flushed_moves_are_left_out_of_end_to_end(self):
+        with self.robot:
+            self.robot.move((100, 100), time.monotonic())
+            recorded = latency.count(END_TO_END)
+            self.robot.move((120, 100), time.monotonic())
+            self.robot.flush(force=True)
+        self.assertEqual(2, self.robot.sent)
+        self.assertEqual(recorded, latency.count(END_TO_END))
+
+
+class PongServer(object):
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("localhost", 0))
+        self.sock.settimeout(0.01)
+        self.address = self.sock.getsockname()
+        self.answering = True
+        self.moves = []
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        self.sock.close()
+
+    def _serve(self):
+        while not self._stopped.is_set():
+            try:
+                message, address = self.sock.recvfrom(1024)
+            except socket.timeout:
+                continue
+            if message != b"ping":
+                self.moves.append(message)
+            elif self.answering:
+                self.sock.sendto(b"pong airhockey", address)
+
+
+class TestRobotLink(unittest.TestCase):
+    def setUp(self):
+        self.server = PongServer()
+        host, port = self.server.address
+        self.link = RobotLink(host=host, port=port, interval=0.01,
+                              timeout=0.02, window=10, max_silence=0.1)
+        self.changes = []
+        self.link.on_change(self.changes.append)
+
+    def tearDown(self):
+        self.link.stop()
+        self.server.stop()
+
+    def test_link_health_follows_the_heartbeat(self):
+        self.link.start()
+        self.assertTrue(self.link.wait_healthy(1))
+        stats = self.link.stats()
+        self.assertEqual(0, stats.loss)
+        self.assertLess(0, stats.rtt)
+
+        self.server.answering = False
+        with self.link._health_changed:
+            self.assertTrue(self.link._health_changed.wait_for(
+                lambda: not self.link.healthy, 1))
+        self.assertLess(0, self.link.stats().loss)
+
+        self.server.answering = True
+        self.assertTrue(self.link.wait_healthy(1))
+        # Joins the heartbeat, whose callbacks run after the notification.
+        self.link.stop()
+        self.assertEqual([True, False, True], self.changes)
+
+    def test_robot_moves_through_the_link_socket(self):
+        robot = Robot(host=self.server.address[0],
+                      port=self.server.address[1], link=self.link)
+        with robot:
+            robot.move((100, 200))
+        self.assertFalse(self.link.sock._closed)
+        self.link.start()
+        self.assertTrue(self.link.wait_healthy(1))
+        self.assertEqual([struct.pack("<ii", 100, 200)], self.server.moves)
@@ -0,0 +1,123 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from airhockey.robot import Waypoint
+from airhockey.strategy import (InterceptionRules, InterceptionStrategy,
+                                InterceptionTable, LookupTableStrategy)
+from airhockey.trajectory import Trajectory, interception_points
+
+
+def moving_puck(position, velocity):
+    trajectory = Trajectory((1200, 600))
+    trajectory.position = position
+    trajectory.velocity = velocity
+    trajectory.direction = (1, 0)
+    return trajectory
+
+
+class TestInterceptionRules(unittest.TestCase):
+    def test_batched_destinations_match_single_ones(self):
+        random = np.random.default_rng(3)
+        pucks = random.uniform((300, 50), (1150, 550), (200, 2))
+        pushers = random.uniform((30, 30), (570, 570), (200, 2))
+        velocities = random.uniform(-1500, 1500, (200, 2))
+        rules = InterceptionRules(strike_distance=300, interception_index=1)
+
+        xs, ys, times = interception_points(pucks, velocities, (1200, 600))
+        batched, has = rules.destinations(pucks, pushers, xs, ys, times)
+
+        for i in range(len(pucks)):
+            trajectory = moving_puck(tuple(pucks[i]), tuple(velocities[i]))
+            single = rules.destination(
+                tuple(pucks[i]), tuple(pushers[i]),
+                trajectory.calculate_interception_points())
+            self.assertEqual(single is not None, has[i])
+            if single is not None:
+                np.testing.assert_allclose(single, batched[i])
+
+    def test_batched_waypoints_match_single_ones(self):
+        random = np.random.default_rng(4)
+        pucks = random.uniform((300, 50), (1150, 550), (200, 2))
+        pushers = random.uniform((30, 30), (570, 570), (200, 2))
+        velocities = random.uniform(-1500, 1500, (200, 2))
+        rules = InterceptionRules(strike_distance=300)
+
+        xs, ys, times = interception_points(pucks, velocities, (1200, 600))
+        _, arrivals, has = rules.waypoints(pucks, pushers, xs, ys, times,
+                                           margin=0.1)
+
+        for i in np.flatnonzero(has):
+            trajectory = moving_puck(tuple(pucks[i]), tuple(velocities[i]))
+            single = rules.waypoint(
+                tuple(pucks[i]), tuple(pushers[i]),
+                trajectory.calculate_interceptions(), 0.1)
+            self.assertAlmostEqual(single.time, arrivals[i])
+
+
+class TestInterceptionStrategy(unittest.TestCase):
+    def test_plan_arrives_ahead_of_the_puck(self):
+        strategy = InterceptionStrategy(margin=0.1)
+        trajectory = moving_puck((900, 300), (-1000, 0))
+        waypoint, = strategy.plan(trajectory, (900, 300), (50, 300))
+        self.assertEqual((100, 300), waypoint.position)
+        self.assertAlmostEqual(0.7, waypoint.time)
+
+        trajectory = moving_puck((250, 300), (-1000, 0))
+        self.assertEqual([Waypoint((400, 300))], strategy.plan(
+            trajectory, (250, 300), (200, 300)))
+
+
+class TestLookupTableStrategy(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.table = InterceptionTable.build((1200, 600),
+                                            shape=(24, 12, 32, 4))
+
+    def test_matches_solved_trajectory_at_cell_centers(self):
+        solved = InterceptionStrategy(InterceptionRules(strike_distance=0))
+        lookup = LookupTableStrategy(self.table,
+                                     InterceptionRules(strike_distance=0))
+        angle = (3 + 0.5) * 2 * np.pi / 32 - np.pi
+        speed = 100 + 0.5 * 2900 / 4
+        velocity = (speed * np.cos(angle), speed * np.sin(angle))
+        for position in [(1125, 25), (875, 325), (625, 575)]:
+            trajectory = moving_puck(position, velocity)
+            expected = solved.destination(trajectory, position, (50, 300))
+            actual = lookup.destination(trajectory, position, (50, 300))
+            self.assertIsNotNone(expected)
+            np.testing.assert_allclose(expected, actual, atol=1e-3)
+
+        away = moving_puck((875, 325), (1000, 0))
+        self.assertIsNone(lookup.destination(away, (875, 325), (50, 300)))
+
+    def test_close_puck_is_struck(self):
+        lookup = LookupTableStrategy(self.table)
+        trajectory = moving_puck((250, 300), (-1000, 0))
+        self.assertEqual((550, 300), lookup.destination(
+            trajectory, (250, 300), (150, 300)))
+
+    def test_saved_table_is_memory_mapped(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "table.lut")
+            self.table.save(path)
+            loaded = InterceptionTable.load(path, workspace=(1200, 600),
+                                            puck_radius=0)
+            self.assertIsInstance(loaded.targets, np.memmap)
+            self.assertEqual((1200, 600), loaded.workspace)
+            np.testing.assert_array_equal(self.table.targets, loaded.targets)
+            self.assertEqual(self.table.lookup((900, 200), (-800, 300)),
+                             loaded.lookup((900, 200), (-800, 300)))
+            del loaded
+
+            with self.assertRaises(ValueError):
+                InterceptionTable.load(path, workspace=(1160, 560))
+            with self.assertRaises(ValueError):
+                InterceptionTable.load(path, puck_radius=20)
+
+            with open(path, "r+b") as f:
+                f.write(b"garbage!")
+            with self.assertRaises(ValueError):
+                InterceptionTable.load(path)
@@ -1,5 +1,5 @@
 import unittest
-from typing import Tuple
+from typing import Optional
 
 import airhockey
 from airhockey.handlers.test_moves import TestMovesHandler
@@ -13,8 +13,13 @@ class RobotSpy(Robot):
     def __init__(self):
         self.destinations = []
 
-    def move(self, destination: Tuple[float, float]):
-        self.destinations.append(destination)
+    def move(
+            self,
+            dst,
+            frame_timestamp: Optional[float] = None,
+            frame_sequence: Optional[int] = None
+    ):
+        self.destinations.append(dst)
 
 
 class TestTestMovesHandler(unittest.TestCase):
@@ -0,0 +1,96 @@
+import math
+import unittest
+
+import numpy as np
+
+from airhockey.trajectory import Trajectory, bank_shot
+
+
+def moving_puck(position, vector, speed):
+    trajectory = Trajectory((1200, 600))
+    norm = math.hypot(*vector)
+    trajectory.position = position
+    trajectory.velocity = (vector[0] / norm * speed, vector[1] / norm * speed)
+    return trajectory
+
+
+class TestTrajectory(unittest.TestCase):
+    def assert_intersection(self, expected, actual):
+        e_point, e_eta = expected
+        a_point, a_eta = actual
+
+        np.testing.assert_allclose(e_point, a_point)
+        self.assertAlmostEqual(e_eta, a_eta, 3)
+
+    def test_intersect_puck_trajectory_at_x_1(self):
+        """
+            Puck moves in parallel to the table edges towards the robot
+        """
+        t = moving_puck((600, 300), (-1, 0), 100)
+        self.assert_intersection(((0.0, 300.0), 6.0),
+                                 t.intersect_puck_trajectory_at_x(0))
+        self.assert_intersection(((100.0, 300.0), 5.0),
+                                 t.intersect_puck_trajectory_at_x(100))
+
+    def test_intersect_puck_trajectory_at_x_2(self):
+        """
+            Puck moves at 45 degrees
+        """
+        t = moving_puck((600, 300), (-1, -1), 100)
+        self.assert_intersection(((0.0, 300.0), 8.485),
+                                 t.intersect_puck_trajectory_at_x(0))
+
+        t = moving_puck((600, 300), (-1, 1), 100)
+        self.assert_intersection(((0.0, 300.0), 8.485),
+                                 t.intersect_puck_trajectory_at_x(0))
+
+    def test_multiple_edge_hits(self):
+        t = moving_puck((600, 300), (-1.5, -3), 100)
+        self.assert_intersection(((0.0, 300.0), 13.416),
+                                 t.intersect_puck_trajectory_at_x(0))
+        self.assert_intersection(((150.0, 600.0), 10.062),
+                                 t.intersect_puck_trajectory_at_x(150))
+
+    def test_puck_moving_away_is_never_intercepted(self):
+        t = moving_puck((600, 300), (1, 0), 100)
+        self.assertIsNone(t.intersect_puck_trajectory_at_x(100))
+
+    def test_bank_shot_with_puck_radius(self):
+        ys, times, bounces = bank_shot((600, 300), (-300, -300),
+                                       [500, 300, 0], (20, 580))
+        np.testing.assert_allclose([200, 40, 340], ys)
+        np.testing.assert_allclose([1 / 3, 1, 2], times)
+        self.assertEqual([0, 1, 1], bounces.tolist())
+
+    def test_bank_shot_of_many_pucks(self):
+        ys, times, bounces = bank_shot([(600, 300), (600, 300), (600, 300)],
+                                       [(-300, -300), (300, 0), (0, 100)],
+                                       [500, 300, 0], (20, 580))
+        np.testing.assert_allclose([200, 40, 340], ys[0])
+        self.assertTrue(np.all(np.isnan(times[1:])))
+        self.assertEqual([[0, 1, 1], [0, 0, 0], [0, 0, 0]], bounces.tolist())
+
+    def test_stationary_puck_has_no_direction(self):
+        trajectory = Trajectory((1200, 600))
+        for i in range(10):
+            trajectory.register_position((600, 300), i / 60)
+        self.assertIsNone(trajectory.direction)
+        self.assertIsNone(trajectory.calculate_interception_points())
+
+    def test_latency_is_compensated(self):
+        trajectory = Trajectory((1200, 600), latency=0.1)
+        for i in range(20):
+            trajectory.register_position((1000 - 10 * i, 300), i / 60)
+        self.assertAlmostEqual(1000 - 10 * 19 - 60, trajectory.position[0],
+                               delta=2)
+        self.assertAlmostEqual(-1, trajectory.direction[0], places=3)
+        points = trajectory.calculate_interception_points()
+        self.assertEqual((100, 300), tuple(round(v) for v in points[0]))
+
+    def test_latency_prediction_is_reflected_off_the_wall(self):
+        trajectory = Trajectory((1200, 600), latency=0.1, puck_radius=20)
+        for i in range(20):
+            trajectory.register_position((600, 450 + 6 * i), i / 60)
+        # 564 + 360 * 0.1 = 600 goes 20 past the wall at 580.
+        self.assertAlmostEqual(560, trajectory.position[1], delta=2)
+        self.assertAlmostEqual(-360, trajectory.velocity[1], delta=5)
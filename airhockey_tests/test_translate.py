@@ -0,0 +1,84 @@
+import unittest
+
+import numpy as np
+
+from airhockey.translate import LensModel, WorldToFrameTranslator, transform
+
+
+class TestWorldToFrameTranslator(unittest.TestCase):
+    def setUp(self):
+        self.translator = WorldToFrameTranslator((1280, 720), (1200, 600))
+
+    def test_round_trip(self):
+        f = self.translator.w2f((600, 300))
+        self.assertEqual((640, 360), f)
+        np.testing.assert_allclose((600, 300), self.translator.f2w(f))
+
+    def test_batch_matches_single_points(self):
+        world = np.array([(0, 0), (1200, 600), (333.3, 17.5), (-15, 615)])
+        frame = self.translator.w2f_many(world)
+        self.assertEqual([self.translator.w2f(w) for w in world],
+                         [tuple(f) for f in frame.tolist()])
+        np.testing.assert_allclose(
+            [self.translator.f2w(f) for f in frame],
+            self.translator.f2w_many(frame))
+
+    def test_projective_matrix(self):
+        self.translator.set_world_to_frame([[2, 0, 10], [0, 2, 20],
+                                            [0.01, 0, 1]])
+        self.assertEqual((105, 110), self.translator.w2f((100, 100)))
+        self.assertEqual([[105, 110]],
+                         self.translator.w2f_many([(100, 100)]).tolist())
+        np.testing.assert_allclose(
+            (100, 100), self.translator.f2w((105, 110)))
+
+
+class TestCalibration(unittest.TestCase):
+    world = [(0, 0), (1200, 0), (1200, 600), (0, 600), (600, 300)]
+
+    def test_homography_from_four_or_more_markers(self):
+        tilted = np.array([[0.9, 0.05, 40], [-0.02, 1.0, 60],
+                           [0.0001, 0.00005, 1]])
+        frame = transform(tilted, self.world)
+        translator = WorldToFrameTranslator((1280, 720), (1200, 600))
+        error = translator.calibrate(self.world, frame)
+        self.assertLess(error, 0.01)
+        np.testing.assert_allclose(
+            self.world, translator.f2w_many(frame), atol=0.01)
+
+    def test_similarity_from_two_markers(self):
+        translator = WorldToFrameTranslator((1280, 720), (1200, 600))
+        error = translator.calibrate([(400, -15), (400, 615)],
+                                     [(420, 60), (430, 690)])
+        self.assertLess(error, 0.01)
+        x, y = translator.f2w((425, 375))
+        self.assertAlmostEqual(400, x, delta=0.01)
+        self.assertAlmostEqual(300, y, delta=0.01)
+
+    def test_implausible_fit_keeps_matrix(self):
+        translator = WorldToFrameTranslator((1280, 720), (1200, 600))
+        before = translator.world_to_frame.copy()
+        # Two small blobs of the marker color far from the markers.
+        self.assertIsNone(translator.calibrate([(400, -15), (400, 615)],
+                                               [(100, 100), (120, 140)]))
+        # Markers found upside down.
+        self.assertIsNone(translator.calibrate([(400, -15), (400, 615)],
+                                               [(437, 679), (437, 41)]))
+        np.testing.assert_array_equal(before, translator.world_to_frame)
+
+    def test_degenerate_markers_keep_matrix(self):
+        translator = WorldToFrameTranslator((1280, 720), (1200, 600))
+        before = translator.world_to_frame.copy()
+        self.assertIsNone(
+            translator.calibrate([(0, 0), (0, 0)], [(5, 5), (5, 5)]))
+        np.testing.assert_array_equal(before, translator.world_to_frame)
+
+    def test_lens_lookup_inverts_distortion(self):
+        lens = LensModel(camera_matrix=[[300, 0, 160], [0, 300, 120],
+                                        [0, 0, 1]],
+                         dist_coeffs=[-0.2, 0.05, 0, 0, 0],
+                         video_size=(320, 240))
+        points = np.array([(20, 30), (160, 120), (300, 200)])
+        distorted = lens.distort_points(points)
+        np.testing.assert_allclose(
+            points, lens.undistort_points(distorted), atol=1.0)
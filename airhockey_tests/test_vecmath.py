@@ -0,0 +1,48 @@
+import subprocess
+import sys
+import unittest
+
+from airhockey import vecmath
+
+# Imports every module airhockey.__main__ imports, without running it.
+IMPORT_CHECK = """
+import ast, importlib, os, sys, time
+import airhockey
+with open(os.path.join(airhockey.__path__[0], "__main__.py")) as f:
+    tree = ast.parse(f.read())
+modules = [a.name for n in ast.walk(tree) if isinstance(n, ast.Import)
+           for a in n.names]
+modules += [n.module for n in ast.walk(tree)
+            if isinstance(n, ast.ImportFrom)]
+started = time.perf_counter()
+for module in modules:
+    importlib.import_module(module)
+print(time.perf_counter() - started)
+print(" ".join(m for m in ("sklearn", "scipy", "joblib") if m in sys.modules))
+"""
+
+
+class TestVecmath(unittest.TestCase):
+    def test_normalize(self):
+        self.assertEqual((0.6, -0.8), vecmath.normalize((3, -4)))
+        self.assertIsNone(vecmath.normalize((0, 0)))
+
+    def test_intersect(self):
+        self.assertEqual((2.0, 2.0),
+                         vecmath.intersect((0, 0), (1, 1), (2, 0), (2, 5)))
+        self.assertIsNone(vecmath.intersect((0, 0), (1, 1), (0, 1), (1, 2)))
+
+    def test_reflect(self):
+        self.assertEqual((-3.0, -4.0), vecmath.reflect((-3, 4), (0, -2)))
+        with self.assertRaises(ValueError):
+            vecmath.reflect((1, 1), (0, 0))
+
+
+class TestStartup(unittest.TestCase):
+    def test_main_dependencies_import_fast(self):
+        output = subprocess.check_output(
+            [sys.executable, "-c", IMPORT_CHECK]).decode().splitlines()
+        # Loose on purpose so a loaded CI machine does not fail it, the
+        # imports take a fraction of a second on a developer machine.
+        self.assertLess(float(output[0]), 3.0)
+        self.assertEqual("", output[1] if len(output) > 1 else "")
@@ -1,9 +1,13 @@
 import unittest
 from typing import Tuple, List
 
+import numpy as np
+
 from airhockey.translate import WorldToFrameTranslator
 from airhockey.vision.color import ColorRange, ColorDetector
-from airhockey.vision.query import VerifyPositionQuery, VerifyPresenceQuery
+from airhockey.vision.query import (QueryContext, VerifyPositionQuery,
+                                    VerifyPresenceQuery)
+from airhockey.vision.video import Frame, FrameReader
 
 
 class FakeDetector(ColorDetector):
@@ -37,6 +41,9 @@ class AddFiftyFakeTranslator(WorldToFrameTranslator):
             f[1] + 50
         )
 
+    def f2w_many(self, f) -> np.ndarray:
+        return np.asarray(f, dtype=float) + 50
+
 
 class TestVerifyPositionQuery(unittest.TestCase):
     def test_not_detected_when_number_of_detected_points_dont_match(self):
@@ -127,3 +134,27 @@ class TestVerifyPresenceQuery(unittest.TestCase):
         query.detector = FakeDetector([(100, 100), (200, 200)])
         result = query.execute(None, AddFiftyFakeTranslator(), None)
         self.assertEqual(VerifyPresenceQuery.PRESENT, result)
+
+
+class OneFrameReader(FrameReader):
+    def __init__(self):
+        super().__init__()
+        self.frame = Frame(np.zeros((4, 4, 3), np.uint8), 1, 12.5)
+
+    def read(self):
+        return self.frame.image
+
+    def read_next(self, sequence, timeout=None):
+        return self.frame if sequence < self.frame.sequence else None
+
+
+class TestQueryContext(unittest.TestCase):
+    def test_reused_frame_has_no_capture_time(self):
+        context = QueryContext(translator=None, frame_reader=OneFrameReader(),
+                               debug_window=None, frame_timeout=0)
+        with context:
+            self.assertEqual(1, context.frame_sequence)
+            self.assertEqual(12.5, context.frame_timestamp)
+        with context:
+            self.assertEqual(1, context.frame_sequence)
+            self.assertIsNone(context.frame_timestamp)
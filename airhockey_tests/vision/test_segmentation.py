@@ -0,0 +1,59 @@
+import unittest
+
+import cv2
+import numpy as np
+
+from airhockey.vision.color import ColorRange, ColorDetector
+from airhockey.vision.segmentation import ColorSegmenter
+
+
+def make_hsv_frame():
+    hsv = np.zeros((120, 200, 3), np.uint8)
+    cv2.circle(hsv, (40, 30), 10, (60, 200, 200), -1)
+    cv2.circle(hsv, (150, 90), 15, (60, 200, 200), -1)
+    cv2.circle(hsv, (100, 60), 12, (25, 200, 200), -1)
+    cv2.circle(hsv, (20, 100), 8, (25, 30, 200), -1)
+    return hsv
+
+
+class TestColorSegmenter(unittest.TestCase):
+    def setUp(self):
+        self.puck = ColorRange(name="puck", h_low=49, h_high=69, sv_low=53)
+        self.pusher = ColorRange(name="pusher", h_low=20, h_high=30,
+                                 sv_low=53)
+        self.segmenter = ColorSegmenter([self.puck, self.pusher])
+        self.hsv = make_hsv_frame()
+
+    def test_same_positions_as_color_detector(self):
+        segmentation = self.segmenter.segment(self.hsv)
+        for color_range in [self.puck, self.pusher]:
+            detector = ColorDetector(color_range=color_range)
+            self.assertEqual(
+                detector.get_positions(self.hsv, 2),
+                detector.get_positions(segmentation, 2))
+
+    def test_largest_blob_first(self):
+        segmentation = self.segmenter.segment(self.hsv)
+        self.assertEqual([(149, 89), (39, 29)],
+                         segmentation.get_positions(self.puck, 2))
+        self.assertEqual([(149, 89)],
+                         segmentation.get_positions(self.puck, 1))
+
+    def test_lookup_table_follows_color_range_changes(self):
+        self.assertEqual(
+            [(99, 59)],
+            self.segmenter.segment(self.hsv).get_positions(self.pusher, 2))
+        self.pusher.set_sv_low(20)
+        self.assertEqual(
+            [(99, 59), (19, 99)],
+            self.segmenter.segment(self.hsv).get_positions(self.pusher, 2))
+
+    def test_unregistered_color_range(self):
+        other = ColorRange(name="other", h_low=20, h_high=30, sv_low=20)
+        segmentation = self.segmenter.segment(self.hsv)
+        self.assertEqual([(99, 59), (19, 99)],
+                         segmentation.get_positions(other, 2))
+
+    def test_too_many_color_ranges(self):
+        with self.assertRaises(ValueError):
+            ColorSegmenter([self.puck] * 9)
@@ -0,0 +1,98 @@
+import os
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from airhockey.vision.session import ReplayFrameReader, Session, SessionWriter
+
+
+class TestSession(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "session.bin")
+
+    def record(self, timestamps):
+        with SessionWriter(self.path) as writer:
+            for index, timestamp in enumerate(timestamps):
+                writer.write(np.full((4, 6, 3), index, np.uint8), timestamp)
+
+    def test_frames_are_read_back(self):
+        self.record([10.0, 10.5, 11.0])
+        session = Session(self.path)
+        self.assertEqual(3, len(session))
+        self.assertEqual((4, 6, 3), session.shape)
+        self.assertEqual([10.0, 10.5, 11.0], list(session.timestamps))
+        self.assertTrue(np.all(session.images[2] == 2))
+        self.assertFalse(session.images[2].flags.writeable)
+
+    def test_truncated_record_is_ignored(self):
+        self.record([10.0, 10.5])
+        with open(self.path, "ab") as f:
+            f.write(b"\0" * 10)
+        self.assertEqual(2, len(Session(self.path)))
+
+    def test_frame_shape_cannot_change(self):
+        with SessionWriter(self.path) as writer:
+            writer.write(np.zeros((4, 6, 3), np.uint8), 0)
+            with self.assertRaises(ValueError):
+                writer.write(np.zeros((4, 6, 4), np.uint8), 0)
+
+    def test_write_after_close_keeps_the_recording(self):
+        writer = SessionWriter(self.path)
+        for index in range(2):
+            writer.write(np.zeros((4, 6, 3), np.uint8), index)
+        writer.close()
+        with self.assertRaises(ValueError):
+            writer.write(np.zeros((4, 6, 3), np.uint8), 2)
+        self.assertEqual(2, len(Session(self.path)))
+
+    def test_not_a_session(self):
+        with open(self.path, "wb") as f:
+            f.write(b"foo" * 100)
+        with self.assertRaises(ValueError):
+            Session(self.path)
+
+    def test_unthrottled_replay_serves_every_frame(self):
+        self.record([10.0, 20.0, 30.0])
+        reader = ReplayFrameReader(self.path, speed=0).start()
+
+        sequence = 0
+        served = []
+        while True:
+            frame = reader.read_next(sequence, timeout=0.01)
+            if frame is None:
+                break
+            served.append(int(frame.image[0, 0, 0]))
+            sequence = frame.sequence
+        self.assertEqual([0, 1, 2], served)
+        self.assertTrue(reader.finished)
+        self.assertEqual(3, reader.frames_read)
+
+    def test_end_of_session_waits_for_the_timeout(self):
+        self.record([10.0])
+        reader = ReplayFrameReader(self.path, speed=0).start()
+        reader.read_next(0)
+
+        started = time.monotonic()
+        self.assertIsNone(reader.read_next(1, timeout=0.05))
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+
+    def test_replay_keeps_recorded_frame_spacing(self):
+        self.record([10.0, 10.5, 11.5])
+        reader = ReplayFrameReader(self.path, speed=0).start()
+        first = reader.read_next(0)
+        second = reader.read_next(first.sequence)
+        third = reader.read_next(second.sequence)
+        self.assertAlmostEqual(0.5, second.timestamp - first.timestamp)
+        self.assertAlmostEqual(1.0, third.timestamp - second.timestamp)
+
+    def test_paced_replay_skips_to_latest_due_frame(self):
+        self.record([0.0, 0.01, 0.02, 10.0])
+        reader = ReplayFrameReader(self.path, speed=1).start()
+        time.sleep(0.05)
+        frame = reader.read_next(0, timeout=0.01)
+        self.assertEqual(2, int(frame.image[0, 0, 0]))
+        self.assertIsNone(reader.read_next(frame.sequence, timeout=0.01))
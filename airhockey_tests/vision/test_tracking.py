@@ -0,0 +1,77 @@
+import unittest
+
+import cv2
+import numpy as np
+
+from airhockey.vision.color import ColorRange, ColorDetector
+from airhockey.vision.segmentation import ColorSegmenter
+from airhockey.vision.tracking import RegionTracker
+
+
+def make_hsv_frame(*blobs):
+    hsv = np.zeros((400, 600, 3), np.uint8)
+    for center, radius in blobs:
+        cv2.circle(hsv, center, radius, (60, 200, 200), -1)
+    return hsv
+
+
+class TestRegionTracker(unittest.TestCase):
+    def test_no_window_before_first_position(self):
+        tracker = RegionTracker(margin=10)
+        self.assertIsNone(tracker.window((400, 600, 3)))
+
+    def test_window_is_predicted_from_velocity(self):
+        tracker = RegionTracker(margin=10)
+        tracker.update((100, 100), tracked=False)
+        self.assertEqual((90, 90, 110, 110), tracker.window((400, 600, 3)))
+        tracker.update((120, 110), tracked=True)
+        self.assertEqual((110, 90, 170, 150), tracker.window((400, 600, 3)))
+
+    def test_window_is_clipped_to_frame(self):
+        tracker = RegionTracker(margin=10)
+        tracker.update((595, 5), tracked=False)
+        self.assertEqual((585, 0, 600, 15), tracker.window((400, 600, 3)))
+
+    def test_periodic_full_scan(self):
+        tracker = RegionTracker(margin=10, rescan_interval=2)
+        tracker.update((100, 100), tracked=False)
+        tracker.update((100, 100), tracked=True)
+        self.assertIsNotNone(tracker.window((400, 600, 3)))
+        tracker.update((100, 100), tracked=True)
+        self.assertIsNone(tracker.window((400, 600, 3)))
+
+
+class TestTrackingColorDetector(unittest.TestCase):
+    def setUp(self):
+        self.color_range = ColorRange(name="puck", h_low=49, h_high=69,
+                                      sv_low=53)
+        self.tracker = RegionTracker(margin=40)
+        self.detector = ColorDetector(color_range=self.color_range,
+                                      tracker=self.tracker)
+
+    def test_follows_blob_inside_window(self):
+        self.detector.get_positions(make_hsv_frame(((100, 100), 10)), 1)
+        # a bigger blob outside of the window is not looked at
+        positions = self.detector.get_positions(
+            make_hsv_frame(((120, 110), 10), ((500, 300), 30)), 1)
+        self.assertEqual([(119, 109)], positions)
+
+    def test_falls_back_to_full_frame_when_lost(self):
+        self.detector.get_positions(make_hsv_frame(((100, 100), 10)), 1)
+        positions = self.detector.get_positions(
+            make_hsv_frame(((500, 300), 10)), 1)
+        self.assertEqual([(499, 299)], positions)
+        self.assertEqual((499, 299), self.tracker.position)
+
+        self.assertEqual(
+            [], self.detector.get_positions(make_hsv_frame(), 1))
+        self.assertIsNone(self.tracker.position)
+
+    def test_tracks_on_segmented_frame(self):
+        segmenter = ColorSegmenter([self.color_range])
+        self.detector.get_positions(
+            segmenter.segment(make_hsv_frame(((100, 100), 10))), 1)
+        segmentation = segmenter.segment(
+            make_hsv_frame(((120, 110), 10), ((500, 300), 30)))
+        self.assertEqual([(119, 109)],
+                         self.detector.get_positions(segmentation, 1))
@@ -0,0 +1,177 @@
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from airhockey.vision.video import FrameRing, GrabbingFrameReader
+
+
+class CountingFrameReader(GrabbingFrameReader):
+    def __init__(self):
+        super().__init__(ring_slots=3)
+        self.counter = 0
+
+    def grab(self) -> bool:
+        self.counter += 1
+        buffer = self.ring.acquire((2, 2, 3))
+        buffer.fill(self.counter % 256)
+        return True
+
+
+class TestFrameRing(unittest.TestCase):
+    def test_no_frame_before_first_commit(self):
+        self.assertIsNone(FrameRing().latest())
+
+    def test_latest_frame_is_a_read_only_view(self):
+        ring = FrameRing(slots=2)
+        buffer = ring.acquire((2, 2, 3))
+        buffer.fill(7)
+        ring.commit(123.5)
+
+        frame = ring.latest()
+        self.assertEqual(1, frame.sequence)
+        self.assertEqual(123.5, frame.timestamp)
+        self.assertTrue(np.all(frame.image == 7))
+        self.assertIs(buffer, frame.image.base)
+        self.assertFalse(frame.image.flags.writeable)
+
+    def test_leased_slot_is_not_overwritten(self):
+        ring = FrameRing(slots=3)
+        ring.acquire((2, 2, 3)).fill(1)
+        ring.commit()
+        frame = ring.latest()
+
+        for i in range(2, 10):
+            ring.acquire((2, 2, 3)).fill(i)
+            ring.commit()
+        self.assertTrue(np.all(frame.image == 1))
+
+    def test_reading_again_releases_the_lease(self):
+        ring = FrameRing(slots=2)
+        first = ring.acquire((2, 2, 3))
+        ring.commit()
+        ring.latest()
+        ring.acquire((2, 2, 3))
+        ring.commit()
+        ring.latest()
+        self.assertIs(first, ring.acquire((2, 2, 3)))
+
+    def test_released_slot_is_reused(self):
+        ring = FrameRing(slots=2)
+        first = ring.acquire((2, 2, 3))
+        ring.commit()
+        ring.latest()
+        ring.acquire((2, 2, 3))
+        ring.commit()
+        self.assertIsNot(first, ring.acquire((2, 2, 3)))
+        ring.release()
+        ring.commit()
+        self.assertIs(first, ring.acquire((2, 2, 3)))
+
+    def test_each_reader_thread_holds_its_own_lease(self):
+        ring = FrameRing(slots=2)
+        ring.acquire((2, 2, 3)).fill(1)
+        ring.commit()
+        frames = []
+        reader = threading.Thread(target=lambda: frames.append(ring.latest()))
+        reader.start()
+        reader.join()
+        ring.acquire((2, 2, 3)).fill(2)
+        ring.commit()
+        ring.latest()
+
+        # Both slots are pinned, so the ring grows instead of overwriting.
+        ring.acquire((2, 2, 3)).fill(3)
+        ring.commit()
+        self.assertTrue(np.all(frames[0].image == 1))
+        self.assertEqual(3, len(ring._buffers))
+
+    def test_slots_are_reused(self):
+        ring = FrameRing(slots=2)
+        first = ring.acquire((2, 2, 3))
+        ring.commit()
+        second = ring.acquire((2, 2, 3))
+        ring.commit()
+        self.assertIsNot(first, second)
+        self.assertIs(first, ring.acquire((2, 2, 3)))
+        ring.commit()
+        self.assertEqual(3, ring.latest().sequence)
+
+    def test_reallocates_when_frame_shape_changes(self):
+        ring = FrameRing(slots=2)
+        ring.acquire((2, 2, 3))
+        self.assertEqual((4, 4, 3), ring.acquire((4, 4, 3)).shape)
+
+    def test_wait_newer_times_out(self):
+        ring = FrameRing()
+        ring.acquire((2, 2, 3))
+        ring.commit()
+        self.assertIsNone(ring.wait_newer(1, timeout=0.01))
+        self.assertEqual(1, ring.wait_newer(0, timeout=0.01).sequence)
+
+    def test_wait_newer_wakes_up_on_commit(self):
+        ring = FrameRing()
+        ring.acquire((2, 2, 3))
+
+        def grab():
+            ring.acquire((2, 2, 3)).fill(5)
+            ring.commit()
+
+        timer = threading.Timer(0.05, grab)
+        timer.start()
+        frame = ring.wait_newer(0, timeout=5)
+        timer.join()
+        self.assertEqual(1, frame.sequence)
+        self.assertTrue(np.all(frame.image == 5))
+
+    def test_needs_two_slots(self):
+        with self.assertRaises(ValueError):
+            FrameRing(slots=1)
+
+
+class TestGrabbingFrameReader(unittest.TestCase):
+    def test_failed_grab_clears_has_frame(self):
+        reader = CountingFrameReader()
+        results = [True, False]
+        grab_frame = reader.grab
+
+        def grab():
+            reader.stopped = len(results) == 1
+            return grab_frame() if results.pop(0) else False
+
+        reader.grab = grab
+        reader.update()
+        self.assertFalse(reader.has_frame())
+        self.assertEqual(1, reader.frames_grabbed)
+
+    def test_counts_only_new_frames_as_read(self):
+        reader = CountingFrameReader()
+        self.assertIsNone(reader.read())
+
+        for i in range(2):
+            if reader.grab():
+                reader.ring.commit()
+
+        self.assertTrue(np.all(reader.read() == 2))
+        self.assertTrue(np.all(reader.read() == 2))
+        self.assertEqual(1, reader.frames_read)
+        self.assertEqual(2, reader.read_frame().sequence)
+
+    def test_read_next_skips_already_read_frames(self):
+        reader = CountingFrameReader()
+        reader.grab()
+        reader.ring.commit()
+
+        frame = reader.read_next(0, timeout=0.01)
+        self.assertEqual(1, frame.sequence)
+        self.assertIsNone(reader.read_next(frame.sequence, timeout=0.01))
+        self.assertEqual(1, reader.frames_read)
+
+    def test_stop_waits_for_the_grab_thread(self):
+        reader = CountingFrameReader().start()
+        self.assertIsNotNone(reader.read_next(0, timeout=1))
+        reader.stop()
+        grabbed = reader.frames_grabbed
+        time.sleep(0.01)
+        self.assertEqual(grabbed, reader.frames_grabbed)
@@ -1,8 +1,13 @@
 const WebSocket = require('ws');
 const dgram = require('dgram');
+const { decodePlan, PlanFollower } = require('./plan');
 
 const WS_PORT = 1122
 const UDP_PORT = 1133
+// Rate at which plan targets are streamed to the simulated pusher.
+const ACTUATOR_HZ = 200
+// World units per second, as the Python table simulation.
+const PUSHER_SPEED = 3000
 
 const wss = new WebSocket.Server({ port: WS_PORT });
 let m = 0;
@@ -14,6 +19,20 @@ wss.on('connection', function connection(ws) {
   console.log(`Created websocket server`)
 
   const udp = dgram.createSocket('udp4');
+  const width = 12.0, height = 6.00;
+  const toSimulator = (p) => ({ x: -width/2 + p.x / 100, y: height/2 - p.y / 100 });
+  const follower = new PlanFollower({ x: 400, y: 300 }, PUSHER_SPEED);
+
+  const actuator = setInterval(() => {
+    if (follower.moving) {
+      const now = process.hrtime.bigint();
+      ws.send(JSON.stringify(toSimulator(follower.step(Number(now) / 1e9, 1 / ACTUATOR_HZ))));
+    }
+  }, 1000 / ACTUATOR_HZ);
+  ws.on('close', () => {
+    clearInterval(actuator);
+    udp.close();
+  });
 
   udp.on('error', (err) => {
     console.log(`UDP server error:\n${err.stack}`);
@@ -43,10 +62,31 @@ wss.on('connection', function connection(ws) {
       return;
     }
 
-    let view = new Int32Array(buffer.buffer);
-    const width = 12.0, height = 6.00;
-    const x = -width/2 + view[0] / 100;
-    const y = height/2 - view[1] / 100;
+    let plan;
+    try {
+      plan = decodePlan(buffer);
+    } catch (error) {
+      console.log(`Bad plan from ${rinfo.address}:${rinfo.port}: ${error.message}`);
+      return;
+    }
+    if (plan) {
+      const now = Number(process.hrtime.bigint()) / 1e9;
+      if (follower.accept(plan, now)) {
+        console.log(`[${m++}] UDP server got plan ${plan.sequence} with ${plan.waypoints.length} waypoints`);
+      } else {
+        console.log(`Dropped stale plan ${plan.sequence}, ${follower.stale} so far`);
+      }
+      return;
+    }
+
+    // Legacy single point move: two int32 world coordinates. The datagram
+    // may sit at any offset of a pooled buffer, so no typed array view.
+    if (buffer.length !== 8) {
+      console.log(`Unknown message from ${rinfo.address}:${rinfo.port}`);
+      return;
+    }
+    follower.jumpTo({ x: buffer.readInt32LE(0), y: buffer.readInt32LE(4) });
+    const { x, y } = toSimulator(follower.position);
     console.log(`[${m++}] UDP server got: x:${x} y:${y} from ${rinfo.address}:${rinfo.port}`);
     ws.send(JSON.stringify({x, y}));
   });
@@ -0,0 +1,106 @@
+// Motion plans sent by airhockey.robot with the "plans" protocol: an 18
+// byte little-endian header (magic "AH", version, padding, uint32 sequence,
+// float64 send timestamp, uint16 waypoint count) followed by 16 byte
+// waypoints (int32 x, int32 y in world units, float32 seconds to arrive,
+// float32 speed limit in world units per second, 0 for none).
+
+const PLAN_MAGIC = 'AH';
+const PLAN_VERSION = 1;
+const HEADER_SIZE = 18;
+const WAYPOINT_SIZE = 16;
+// Plans this many sequence numbers behind the newest one are stale, ones
+// further behind come from a restarted sender.
+const STALE_WINDOW = 1024;
+
+function decodePlan(buffer) {
+  if (buffer.length < HEADER_SIZE || buffer.toString('latin1', 0, 2) !== PLAN_MAGIC) {
+    return null;
+  }
+  const version = buffer.readUInt8(2);
+  if (version !== PLAN_VERSION) {
+    throw new Error(`Plan version ${version} is not supported`);
+  }
+  const count = buffer.readUInt16LE(16);
+  if (buffer.length !== HEADER_SIZE + count * WAYPOINT_SIZE) {
+    throw new Error('Plan length does not match its waypoints');
+  }
+  const waypoints = [];
+  for (let i = 0; i < count; i++) {
+    const offset = HEADER_SIZE + i * WAYPOINT_SIZE;
+    waypoints.push({
+      x: buffer.readInt32LE(offset),
+      y: buffer.readInt32LE(offset + 4),
+      time: buffer.readFloatLE(offset + 8),
+      maxSpeed: buffer.readFloatLE(offset + 12),
+    });
+  }
+  return {
+    sequence: buffer.readUInt32LE(4),
+    timestamp: buffer.readDoubleLE(8),
+    waypoints,
+  };
+}
+
+// Moves a target point through the waypoints of the latest plan, stepped at
+// the actuator rate. Times are in seconds, positions in world units.
+class PlanFollower {
+  constructor(position, maxSpeed) {
+    this.position = position;
+    this.maxSpeed = maxSpeed;
+    this.waypoints = [];
+    this.lastSequence = null;
+    this.stale = 0;
+  }
+
+  accept(plan, now) {
+    if (this.lastSequence !== null) {
+      const behind = this.lastSequence - plan.sequence;
+      if (behind >= 0 && behind < STALE_WINDOW) {
+        this.stale++;
+        return false;
+      }
+    }
+    this.lastSequence = plan.sequence;
+    this.waypoints = plan.waypoints.map((w) => ({
+      x: w.x, y: w.y, arriveAt: now + w.time, maxSpeed: w.maxSpeed,
+    }));
+    return true;
+  }
+
+  jumpTo(position) {
+    this.position = position;
+    this.waypoints = [];
+  }
+
+  get moving() {
+    return this.waypoints.length > 0;
+  }
+
+  step(now, dt) {
+    const target = this.waypoints[0];
+    if (!target) {
+      return this.position;
+    }
+    const dx = target.x - this.position.x;
+    const dy = target.y - this.position.y;
+    const distance = Math.hypot(dx, dy);
+    let speed = target.maxSpeed ? Math.min(this.maxSpeed, target.maxSpeed) : this.maxSpeed;
+    const left = target.arriveAt - now;
+    if (left > dt) {
+      speed = Math.min(speed, distance / left);
+    }
+    const reach = speed * dt;
+    if (distance <= reach + 1e-6) {
+      this.position = { x: target.x, y: target.y };
+      this.waypoints.shift();
+    } else {
+      this.position = {
+        x: this.position.x + dx / distance * reach,
+        y: this.position.y + dy / distance * reach,
+      };
+    }
+    return this.position;
+  }
+}
+
+module.exports = { decodePlan, PlanFollower };